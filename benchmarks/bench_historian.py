@@ -0,0 +1,57 @@
+"""Benchmark: sustained historian ingest (rows/s) and range query latency.
+
+Frames are decoded once, then pushed into the Historian as fast as the
+ingest sink allows; the time includes the final flush, so it measures what
+the writer thread can sustain to disk. Target: >= 10k rows/s.
+
+Run from the repository root:
+    python -m benchmarks.bench_historian [db directory]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_telemetry_codec import make_frame
+from historian import Historian
+from telemetry_codec import decode_frame
+
+TARGET_ROWS_PER_SECOND = 10000
+
+
+def run(directory, num_tunnels, num_frames, batch_size):
+    path = os.path.join(directory, f"bench_{num_tunnels}_{batch_size}.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    records = decode_frame(make_frame(num_tunnels)).records
+    historian = Historian(path, batch_size=batch_size, flush_interval=1.0)
+    historian.start()
+
+    t0 = 1_700_000_000.0
+    start = time.perf_counter()
+    for i in range(num_frames):
+        historian.append_records(records, t0 + i)
+    historian.stop()
+    elapsed = time.perf_counter() - start
+    rows = historian.rows_written
+
+    start = time.perf_counter()
+    hour = historian.query(1, t0, t0 + 3600)
+    query_ms = (time.perf_counter() - start) * 1000
+    return rows, rows / elapsed, historian.batches_written, len(hour), query_ms
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp(prefix="historian_bench_")
+    print(f"Database directory: {directory}")
+    print(f"{'tunnels':>8} {'batch':>6} {'rows':>8} {'rows/s':>10} {'commits':>8} {'1h query':>14}")
+    for num_tunnels, num_frames, batch_size in ((12, 10000, 1000), (12, 10000, 100), (200, 1000, 1000)):
+        rows, rate, batches, hour_rows, query_ms = run(directory, num_tunnels, num_frames, batch_size)
+        verdict = "ok" if rate >= TARGET_ROWS_PER_SECOND else "BELOW TARGET"
+        print(f"{num_tunnels:>8} {batch_size:>6} {rows:>8} {rate:>10.0f} {batches:>8} "
+              f"{hour_rows:>5} in {query_ms:5.1f} ms  {verdict}")
+
+
+if __name__ == '__main__':
+    main()
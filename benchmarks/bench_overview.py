@@ -0,0 +1,103 @@
+"""Benchmark: one TunnelWidget per tunnel vs the model/view overview, for 12, 60 and 500 tunnels (offscreen QPA).
+
+Each (view, size) pair runs in a fresh process. The view is shown in a
+panel-sized window (1024x600), then every tunnel receives new temperatures
+for a number of rounds; each round is flushed through the state model the
+way the refresh scheduler does it and painted. Reported:
+
+- build: creating and first showing the view
+- RSS: resident memory added by the view (Linux /proc)
+- update: mean time of one round (all tunnels changed), apply and paint
+
+Run from the repository root:
+    python -m benchmarks.bench_overview [sizes...]
+"""
+import os
+import subprocess
+import sys
+import time
+
+SIZES = (12, 60, 500)
+VIEWS = ('widgets', 'overview')
+ROUNDS = 20
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def child(view, num_tunnels):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout, QScrollArea
+    import main
+    from mqtt_client import MQTTClient
+    from overview_view import TunnelOverview
+    from tunnel_state import TunnelStateModel
+
+    app = QApplication(sys.argv)
+    main.apply_theme(app)
+    client = MQTTClient()
+    model = TunnelStateModel(num_tunnels)
+
+    # Warm up one-time costs (icon fonts, style plugin) outside the measurement
+    warmup = main.TunnelWidget(1, client, model)
+    warmup.show()
+    app.processEvents()
+    warmup.close()
+    app.processEvents()
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    if view == 'widgets':
+        container = QWidget()
+        grid = QGridLayout(container)
+        widgets = {}
+        for index in range(num_tunnels):
+            widgets[index + 1] = main.TunnelWidget(index + 1, client, model)
+            grid.addWidget(widgets[index + 1], index // 10, index % 10)
+        panel = QScrollArea()
+        panel.setWidget(container)
+
+        def apply(tunnel_id, state, fields):
+            widgets[tunnel_id].apply_state(state, fields)
+    else:
+        panel = TunnelOverview(model)
+        apply = lambda tunnel_id, state, fields: panel.tunnel_changed(tunnel_id, fields)
+    panel.resize(1024, 600)
+    panel.show()
+    app.processEvents()
+    built = time.perf_counter()
+    rss_after = rss_bytes()
+
+    elapsed = 0.0
+    for round_index in range(ROUNDS):
+        value = 10.0 + round_index * 0.5
+        for tunnel_id in range(1, num_tunnels + 1):
+            model.update(tunnel_id, output_temp=value, external_temp=value + 1, internal_temp=value + 2)
+        start_round = time.perf_counter()
+        for tunnel_id, fields in model.take_dirty().items():
+            apply(tunnel_id, model[tunnel_id], fields)
+        app.processEvents()
+        elapsed += time.perf_counter() - start_round
+    print(f"{(built - start) * 1000:.1f} {(rss_after - rss_before) / 2**20:.1f} {elapsed / ROUNDS * 1000:.2f}")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f"{'view':>9} {'tunnels':>8} {'build ms':>9} {'RSS MB':>8} {'update ms':>10}")
+    for view in VIEWS:
+        for num_tunnels in sizes:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_overview', '--child', view, str(num_tunnels)],
+                                    capture_output=True, text=True, timeout=600).stdout
+            build, rss, update = output.strip().splitlines()[-1].split()
+            print(f"{view:>9} {num_tunnels:>8} {float(build):>9.0f} {float(rss):>8.1f} {float(update):>10.2f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
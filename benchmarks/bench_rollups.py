@@ -0,0 +1,77 @@
+"""Benchmark: long-range query latency, raw scan vs minute/hour rollups.
+
+Fills a historian with N days of 1 Hz telemetry (rollups maintained at
+ingest), then answers the same question three ways: per-hour
+min/max/mean of one tunnel's internal temperature over the whole range.
+
+Run from the repository root:
+    python -m benchmarks.bench_rollups [days] [tunnels]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_telemetry_codec import make_frame
+from historian import Historian
+from telemetry_codec import decode_frame
+
+T0 = 1_700_000_000.0
+
+
+def fill(path, days, num_tunnels):
+    historian = Historian(path, batch_size=5000)
+    historian.start()
+    # A small pool of decoded frames is enough; values only need to vary
+    frames = [decode_frame(make_frame(num_tunnels)).records for _ in range(64)]
+    start = time.perf_counter()
+    for second in range(days * 24 * 3600):
+        historian.append_records(frames[second % len(frames)], T0 + second)
+    historian.stop()
+    return historian, time.perf_counter() - start
+
+
+def timed(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    num_tunnels = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    path = os.path.join(tempfile.mkdtemp(prefix="rollup_bench_"), "rollups.db")
+    historian, fill_seconds = fill(path, days, num_tunnels)
+    print(f"{historian.rows_written} rows ({days} days x {num_tunnels} tunnels) "
+          f"written in {fill_seconds:.1f} s ({historian.rows_written / fill_seconds:.0f} rows/s, rollups included)")
+
+    t1 = T0 + days * 24 * 3600
+    connection = sqlite3.connect(path)
+
+    def raw_scan():
+        return connection.execute(
+            "SELECT CAST(ts / 3600 AS INTEGER) * 3600 AS hour, min(temp_internal), max(temp_internal), "
+            "avg(temp_internal) FROM telemetry WHERE tunnel_id = ? AND ts >= ? AND ts < ? "
+            "GROUP BY hour ORDER BY hour", (1, T0, t1)).fetchall()
+
+    def minute_tier():
+        return historian.query_rollup(1, 'internal_temp', T0, t1, tier='minute')
+
+    def hour_tier():
+        return historian.query_rollup(1, 'internal_temp', T0, t1, tier='hour')
+
+    print(f"{'query':>14} {'rows out':>9} {'best ms':>9}")
+    baseline = None
+    for name, function in (("raw scan", raw_scan), ("minute tier", minute_tier), ("hour tier", hour_tier)):
+        result, ms = timed(function)
+        baseline = baseline or ms
+        print(f"{name:>14} {len(result):>9} {ms:>9.2f}  ({baseline / ms:.0f}x)")
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
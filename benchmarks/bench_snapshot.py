@@ -0,0 +1,91 @@
+"""Benchmark: warm start from the state snapshot vs rebuilding the state from the historian.
+
+The state model is filled from one decoded frame and saved as a snapshot;
+the historian holds ``hours`` of one-second frames for the same tunnels.
+Reported per tunnel count:
+
+- save: StateSnapshot.save of the whole model (what the panel timer pays)
+- restore: StateSnapshot.restore into the model (one read of the whole file)
+- historian: the same restore from the newest row of every tunnel queried
+  from the historian, i.e. a warm start without a snapshot
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshot [hours]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_telemetry_codec import make_frame
+from hmi_core import event_updates
+from historian import Historian, connect
+from state_snapshot import StateSnapshot
+from telemetry_codec import TelemetryEvent, decode_frame
+from tunnel_state import TunnelStateModel
+
+REPEATS = 20
+
+
+def median_ms(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def run(directory, num_tunnels, hours):
+    records = decode_frame(make_frame(num_tunnels)).records
+    model = TunnelStateModel(num_tunnels)
+    for tunnel_id, fields in event_updates([TelemetryEvent(records)]):
+        model.update(tunnel_id, **fields)
+
+    snapshot = StateSnapshot(os.path.join(directory, f"snapshot_{num_tunnels}.npy"))
+
+    def save():
+        snapshot.saved_changes = None  # force the write
+        snapshot.save(model)
+
+    save_ms = median_ms(save)
+    restored = TunnelStateModel(num_tunnels)
+    restore_ms = median_ms(lambda: snapshot.restore(restored))
+    size = os.path.getsize(snapshot.path)
+
+    path = os.path.join(directory, f"historian_{num_tunnels}.db")
+    historian = Historian(path, batch_size=10000, rollups=False)
+    historian.start()
+    t0 = 1_700_000_000.0
+    for i in range(hours * 3600):
+        historian.append_records(records, t0 + i)
+    historian.stop()
+    connection = connect(path)
+
+    def latest_rows():
+        for tunnel_id in range(1, num_tunnels + 1):
+            ts, _, output_temp, external_temp, internal_temp, tunnel_setpoint, fruit_setpoint, pid, fan = \
+                connection.execute("SELECT * FROM telemetry WHERE tunnel_id = ? ORDER BY ts DESC LIMIT 1",
+                                   (tunnel_id,)).fetchone()
+            restored.restore(tunnel_id, ts, output_temp=output_temp, external_temp=external_temp,
+                             internal_temp=internal_temp, tunnel_setpoint=tunnel_setpoint,
+                             fruit_setpoint=fruit_setpoint, running=pid, defrosting=not pid and fan)
+
+    historian_ms = median_ms(latest_rows)
+    connection.close()
+    return save_ms, restore_ms, size, historian_ms
+
+
+def main():
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    directory = tempfile.mkdtemp(prefix="snapshot_bench_")
+    print(f"Historian with {hours} h of 1 Hz frames; median of {REPEATS} runs")
+    print(f"{'tunnels':>8} {'save ms':>8} {'restore ms':>11} {'bytes':>7} {'historian ms':>13}")
+    for num_tunnels in (12, 200, 1000):
+        save_ms, restore_ms, size, historian_ms = run(directory, num_tunnels, hours)
+        print(f"{num_tunnels:>8} {save_ms:>8.2f} {restore_ms:>11.2f} {size:>7} {historian_ms:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: cold start of the panel, eager vs lazy startup (offscreen QPA).
+
+Each run is a fresh interpreter, so imports and icon fonts are really cold.
+The broker is a closed local port (the connection is refused at once) and
+one telemetry frame is injected as soon as connect() is called, like a
+retained message arriving on connection. Reported per run:
+
+- import: importing main (PyQt, widgets, qtawesome, ...)
+- first paint: process start until the main window is first painted
+- first telemetry: process start until that frame is shown by tunnel 1
+- complete: process start until the deferred construction is finished
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+START = time.perf_counter()
+
+FRAME = b"T01,1.5,2.5,3.5,4.0,5.0,1,1,T02,3.1,1.2,1.3,1.0,1.5,1,1"
+
+
+def child(lazy):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    import yaml
+
+    directory = tempfile.mkdtemp(prefix="startup_bench_")
+    with open('config.yaml') as f:
+        config = yaml.safe_load(f)
+    config['mqtt']['broker'] = '127.0.0.1'
+    config['mqtt']['port'] = 1
+    config.setdefault('ui', {})['lazy_startup'] = lazy
+    config['historian'] = dict(config.get('historian', {}), path=os.path.join(directory, 'historian.db'))
+    with open(os.path.join(directory, 'config.yaml'), 'w') as f:
+        yaml.dump(config, f)
+    os.chdir(directory)
+
+    import main
+    imported = time.perf_counter()
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    from mqtt_transport import MQTTTransport
+
+    # The connection refused dialog is modal
+    QMessageBox.warning = QMessageBox.critical = staticmethod(lambda *args, **kwargs: None)
+    marks = {}
+
+    class Message:
+        topic = config['mqtt']['topics']['receive']
+        payload = FRAME
+
+    connect = MQTTTransport.connect
+
+    def connect_and_receive(self):
+        connect(self)
+        self.on_message(None, None, Message)
+
+    MQTTTransport.connect = connect_and_receive
+
+    app = QApplication(sys.argv)
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'paint' not in marks:
+                marks['paint'] = time.perf_counter()
+            return False
+
+    watcher = PaintWatcher()
+    app.installEventFilter(watcher)
+
+    window = main.MainWindow()
+    apply_tunnel_state = window.apply_tunnel_state
+
+    def watch_apply(tunnel_id, state, fields):
+        apply_tunnel_state(tunnel_id, state, fields)
+        if tunnel_id == 1 and 'telemetry' not in marks:
+            marks['telemetry'] = time.perf_counter()
+
+    window.refresh_scheduler.apply_callback = watch_apply
+    window.show()
+
+    def check():
+        if 'paint' in marks and 'telemetry' in marks and not window.deferred_steps:
+            marks['complete'] = time.perf_counter()
+            app.quit()
+
+    poll = QTimer()
+    poll.timeout.connect(check)
+    poll.start(1)
+    QTimer.singleShot(20000, app.quit)
+    app.exec_()
+    marks['import'] = imported
+    print(' '.join(f"{(marks[name] - START) * 1000:.1f}" for name in ('import', 'paint', 'telemetry', 'complete')))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'mode':>6} {'import':>8} {'first paint':>12} {'first telemetry':>16} {'complete':>9}  (median ms of {runs})")
+    for lazy in (False, True):
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', '--child', str(int(lazy))],
+                                    capture_output=True, text=True, timeout=60).stdout
+            results.append([float(value) for value in output.strip().splitlines()[-1].split()])
+        medians = [statistics.median(column) for column in zip(*results)]
+        print(f"{'lazy' if lazy else 'eager':>6} {medians[0]:>8.0f} {medians[1]:>12.0f} {medians[2]:>16.0f} {medians[3]:>9.0f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        child(bool(int(sys.argv[2])))
+    else:
+        main()
@@ -0,0 +1,64 @@
+"""Micro-benchmark: vectorized TXX frame decoder vs the original per-group loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_telemetry_codec
+"""
+import random
+import timeit
+
+from telemetry_codec import decode_frame
+
+
+def legacy_decode(payload):
+    """The per-group parser that used to live in MainWindow.on_mqtt_message"""
+    decoded = []
+    values = payload.split(',')
+    for i in range(0, len(values), 8):
+        if i + 7 < len(values):
+            try:
+                tunnel_identifier = values[i].strip()
+                if tunnel_identifier.startswith('T') and len(tunnel_identifier) >= 3:
+                    tunnel_id = int(tunnel_identifier[1:])
+                    output_temp = float(values[i+1])
+                    external_temp = float(values[i+2])
+                    internal_temp = float(values[i+3])
+                    tunnel_setpoint = float(values[i+4])
+                    fruit_setpoint = float(values[i+5])
+                    pid_status = values[i+6].strip().lower() in ('true', '1', 't', 'y', 'yes')
+                    fan_status = values[i+7].strip().lower() in ('true', '1', 't', 'y', 'yes')
+                    decoded.append((tunnel_id, output_temp, external_temp, internal_temp,
+                                    tunnel_setpoint, fruit_setpoint, pid_status, fan_status))
+            except (ValueError, IndexError):
+                pass
+    return decoded
+
+
+def make_frame(num_tunnels, malformed_every=0):
+    groups = []
+    for tunnel_id in range(1, num_tunnels + 1):
+        group = [f"T{tunnel_id:02d}"]
+        group += [f"{random.uniform(-2, 12):.1f}" for _ in range(3)]
+        group += [f"{random.uniform(-1, 4):.1f}", f"{random.uniform(-1, 4):.2f}"]
+        group += [random.choice('01'), random.choice('01')]
+        if malformed_every and tunnel_id % malformed_every == 0:
+            group[2] = "ERR"
+        groups.append(','.join(group))
+    return ','.join(groups)
+
+
+def main():
+    random.seed(0)
+    print(f"{'tunnels':>8} {'malformed':>10} {'legacy us':>10} {'codec us':>10} {'speedup':>8}")
+    for num_tunnels in (12, 60, 200, 1000):
+        for malformed_every in (0, 10):
+            payload = make_frame(num_tunnels, malformed_every)
+            assert len(legacy_decode(payload)) == len(decode_frame(payload).records)
+            number = max(20, 20000 // num_tunnels)
+            legacy = min(timeit.repeat(lambda: legacy_decode(payload), number=number, repeat=5)) / number
+            codec = min(timeit.repeat(lambda: decode_frame(payload), number=number, repeat=5)) / number
+            label = f"1/{malformed_every}" if malformed_every else "none"
+            print(f"{num_tunnels:>8} {label:>10} {legacy * 1e6:>10.1f} {codec * 1e6:>10.1f} {legacy / codec:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
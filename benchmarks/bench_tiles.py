@@ -0,0 +1,114 @@
+"""Benchmark: label-based TunnelWidget vs painted TunnelTile, side by side (offscreen QPA).
+
+Each (class, size) pair runs in a fresh process. N tunnels are built in a
+grid inside a panel-sized scroll area (1024x600) and shown, then every
+tunnel receives new temperatures, setpoints and status for a number of
+rounds; each round is applied through apply_state and painted. Reported:
+
+- objects: QObjects per tunnel (widgets, layouts, ...)
+- build: construction and first show
+- RSS: resident memory added by the N tunnels (Linux /proc)
+- update: mean time of one round (all tunnels changed), apply and paint
+- layouts: layout requests per round
+
+Run from the repository root:
+    python -m benchmarks.bench_tiles [sizes...]
+"""
+import os
+import subprocess
+import sys
+import time
+
+SIZES = (12, 48)
+CLASSES = ('TunnelWidget', 'TunnelTile')
+ROUNDS = 20
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def child(class_name, num_tunnels):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5.QtCore import QObject, QEvent
+    from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout, QScrollArea
+    import main
+    from mqtt_client import MQTTClient
+    from tunnel_state import TunnelStateModel
+
+    app = QApplication(sys.argv)
+    main.apply_theme(app)
+    client = MQTTClient()
+    model = TunnelStateModel(num_tunnels)
+    tunnel_class = getattr(main, class_name)
+
+    # Warm up one-time costs (icon fonts, style plugin) outside the measurement
+    warmup = tunnel_class(1, client, model)
+    warmup.show()
+    app.processEvents()
+    objects = len(warmup.findChildren(QObject)) + 1
+    warmup.close()
+    app.processEvents()
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    container = QWidget()
+    grid = QGridLayout(container)
+    tunnels = {}
+    for index in range(num_tunnels):
+        tunnels[index + 1] = tunnel_class(index + 1, client, model)
+        grid.addWidget(tunnels[index + 1], index // 6, index % 6)
+    panel = QScrollArea()
+    panel.setWidget(container)
+    panel.resize(1024, 600)
+    panel.show()
+    app.processEvents()
+    built = time.perf_counter()
+    rss_after = rss_bytes()
+
+    class LayoutCounter(QObject):
+        count = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.LayoutRequest:
+                LayoutCounter.count += 1
+            return False
+
+    counter = LayoutCounter()
+    app.installEventFilter(counter)
+    elapsed = 0.0
+    for round_index in range(ROUNDS):
+        value = 10.0 + round_index * 0.5
+        for tunnel_id in range(1, num_tunnels + 1):
+            model.update(tunnel_id, output_temp=value, external_temp=value + 1, internal_temp=value + 2,
+                         tunnel_setpoint=value - 5, fruit_setpoint=value - 6,
+                         running=round_index % 2, defrosting=round_index % 4 == 0)
+        start_round = time.perf_counter()
+        for tunnel_id, fields in model.take_dirty().items():
+            tunnels[tunnel_id].apply_state(model[tunnel_id], fields)
+        app.processEvents()
+        elapsed += time.perf_counter() - start_round
+    print(f"{objects} {(built - start) * 1000:.1f} {(rss_after - rss_before) / 2**20:.1f} "
+          f"{elapsed / ROUNDS * 1000:.2f} {LayoutCounter.count / ROUNDS:.1f}")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f"{'class':>13} {'tunnels':>8} {'objects':>8} {'build ms':>9} {'RSS MB':>7} {'update ms':>10} {'layouts':>8}")
+    for num_tunnels in sizes:
+        for class_name in CLASSES:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_tiles', '--child', class_name,
+                                     str(num_tunnels)], capture_output=True, text=True, timeout=600).stdout
+            objects, build, rss, update, layouts = output.strip().splitlines()[-1].split()
+            print(f"{class_name:>13} {num_tunnels:>8} {int(objects):>8} {float(build):>9.0f} {float(rss):>7.1f} "
+                  f"{float(update):>10.2f} {float(layouts):>8.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
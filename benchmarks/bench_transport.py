@@ -0,0 +1,147 @@
+"""Benchmark: message latency of the threaded, asyncio and embedded MQTT transports under Qt (offscreen QPA).
+
+For the thread and asyncio rows the panel's broker (mqtt_broker.MQTTBroker)
+runs in its own process with an in-process publisher (LocalClient) that, once
+the client has subscribed, publishes numbered 12-tunnel telemetry frames at
+a fixed rate, stamping each with time.monotonic() (system-wide on Linux);
+the broker forwards them over TCP. The client process runs the panel's
+MQTTClient in a QApplication: the threaded transport with its paho and
+ingest threads and queued signals, or the asyncio transport on a qasync
+loop. The embedded row is the zero-network baseline: the same broker
+(mqtt.embedded_broker) and publisher run in the client process, and frames
+reach the transport by direct calls, without a socket. The receive time is taken in the events_pending slot, i.e.
+when the GUI thread could first show the frame. Reported: latency
+percentiles and the number of threads in the client process.
+
+Run from the repository root (the asyncio mode needs qasync):
+    python -m benchmarks.bench_transport [frames] [rate_hz]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+TOPIC = 'A_ENVIAR'
+
+
+def frame(sequence):
+    """12-tunnel frame; the frame number travels as tunnel 1's output temperature"""
+    groups = [f"T01,{sequence},2.5,3.5,4.0,5.0,1,1"]
+    groups += [f"T{tunnel_id:02d},1.5,2.5,3.5,4.0,5.0,1,1" for tunnel_id in range(2, 13)]
+    return ','.join(groups).encode()
+
+
+def publish_frames(publisher, frames, rate, sent):
+    """Publish the numbered frames at a fixed rate, recording in sent the time.monotonic() of each"""
+    time.sleep(0.5)
+    for sequence in range(1, frames + 1):
+        sent[sequence] = time.monotonic()
+        publisher.publish(TOPIC, frame(sequence))
+        time.sleep(1 / rate)
+
+
+def run_broker(frames, rate):
+    """Broker process of the thread and asyncio rows: the panel's MQTTBroker plus an in-process publisher"""
+    from mqtt_broker import MQTTBroker, LocalClient
+
+    broker = MQTTBroker('127.0.0.1', 0).start()
+    print(broker.port, flush=True)
+    publisher = LocalClient(broker, 'bench')
+    publisher.connect()
+    while True:
+        with broker.lock:
+            if any(session.granted_qos(TOPIC) is not None for session in broker.sessions):
+                break
+        time.sleep(0.01)
+    sent = {}
+    publish_frames(publisher, frames, rate, sent)
+    time.sleep(1.0)
+    broker.stop()
+    print(json.dumps(sent), flush=True)
+
+
+def run_client(mode, port, frames, rate):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from mqtt_client import MQTTClient
+    from mqtt_async import create_transport, create_qt_event_loop
+    from mqtt_broker import LocalClient
+    from telemetry_codec import TelemetryEvent
+
+    app = QApplication(sys.argv)
+    config = {'broker': '127.0.0.1', 'port': port, 'transport': mode, 'embedded_broker': mode == 'embedded'}
+    loop = create_qt_event_loop(app) if mode == 'asyncio' else None
+    if mode == 'asyncio' and loop is None:
+        print(json.dumps({'error': 'qasync is not installed'}), flush=True)
+        os._exit(0)
+    client = MQTTClient(create_transport(config, loop))
+    client.configure(config)
+    received = {}
+    threads = []
+
+    def on_events_pending():
+        now = time.monotonic()
+        for event in client.take_events():
+            if isinstance(event, TelemetryEvent) and event.records['tunnel_id'][0] == 1:
+                received[int(event.records['temp_output'][0])] = now
+        threads.append(threading.active_count())
+        if frames in received:
+            app.quit()
+
+    client.events_pending.connect(on_events_pending)
+    sent = {}
+    if mode == 'embedded':
+        publisher = LocalClient(client.transport.broker, 'bench')
+        publisher.connect()
+
+        client.connection_status.connect(
+            lambda connected: connected and threading.Thread(target=publish_frames, args=(publisher, frames, rate, sent),
+                                                             daemon=True).start())
+    client.connect()
+    QTimer.singleShot(60000, app.quit)
+    if loop is not None:
+        with loop:
+            loop.run_forever()
+    else:
+        app.exec_()
+    print(json.dumps({'received': received, 'threads': max(threads, default=0), 'sent': sent}), flush=True)
+    os._exit(0)
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"{frames} frames at {rate:g} Hz, latency publish -> GUI slot")
+    print(f"{'transport':>10} {'received':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'threads':>8}")
+    for mode in ('thread', 'asyncio', 'embedded'):
+        broker, port = None, '0'
+        if mode != 'embedded':
+            broker = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_transport', '--broker',
+                                       str(frames), str(rate)], stdout=subprocess.PIPE, text=True)
+            port = broker.stdout.readline().strip()
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_transport', '--client', mode, port,
+                                 str(frames), str(rate)], capture_output=True, text=True, timeout=120).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if broker is not None:
+            result['sent'] = json.loads(broker.communicate(timeout=120)[0].strip().splitlines()[-1])
+        if 'error' in result:
+            print(f"{mode:>10}  skipped: {result['error']}")
+            continue
+        sent = result['sent']
+        latency = np.array([received - sent[sequence] for sequence, received in result['received'].items()]) * 1000
+        p50, p95, p99 = np.percentile(latency, (50, 95, 99))
+        print(f"{mode:>10} {len(latency):>9} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f} {latency.max():>7.2f} {result['threads']:>8}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--broker':
+        run_broker(int(sys.argv[2]), float(sys.argv[3]))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--client':
+        run_client(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5]))
+    else:
+        main()
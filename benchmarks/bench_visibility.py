@@ -0,0 +1,73 @@
+"""Benchmark: GUI thread cost of a refresh with every tunnel changing, all widgets vs visible page only (offscreen QPA).
+
+Builds the main window (eager startup, broker on a closed local port) with
+every carousel page constructed, then runs rounds in which all tunnels get
+new values and the refresh scheduler flushes them. Reported per mode: mean
+time of a flush plus the resulting paint, and the number of widget updates
+applied vs deferred. "all" forces the previous behaviour (every widget is
+updated whatever page is shown).
+
+Run from the repository root:
+    python -m benchmarks.bench_visibility [num_tunnels] [rounds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    num_tunnels = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    import yaml
+
+    directory = tempfile.mkdtemp(prefix="visibility_bench_")
+    with open('config.yaml') as f:
+        config = yaml.safe_load(f)
+    config['mqtt']['broker'] = '127.0.0.1'
+    config['mqtt']['port'] = 1
+    config['tunnels'] = {'count': num_tunnels}
+    config.setdefault('ui', {}).update(lazy_startup=False, prebuild_pages=(num_tunnels + 2) // 3)
+    config['historian'] = dict(config.get('historian', {}), enabled=False)
+    with open(os.path.join(directory, 'config.yaml'), 'w') as f:
+        yaml.dump(config, f)
+    sys.path.insert(0, os.getcwd())
+    os.chdir(directory)
+
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    import main as hmi
+
+    QMessageBox.warning = QMessageBox.critical = staticmethod(lambda *args, **kwargs: None)
+    app = QApplication(sys.argv)
+    hmi.apply_theme(app)
+    window = hmi.MainWindow()
+    window.show()
+    app.processEvents()
+
+    print(f"{num_tunnels} tunnels, {len(window.tunnel_widgets)} widgets, {rounds} rounds")
+    print(f"{'mode':>8} {'flush ms':>9} {'applied':>8} {'deferred':>9}")
+    visible_only = window.tunnel_visible
+    for mode in ('all', 'visible'):
+        window.tunnel_visible = (lambda tunnel_widget: True) if mode == 'all' else visible_only
+        applied_before = window.refresh_scheduler.applied_count - window.deferred_updates
+        deferred_before = window.deferred_updates
+        elapsed = 0.0
+        for round_index in range(rounds):
+            value = 10.0 + round_index * 0.5
+            for tunnel_id in range(1, num_tunnels + 1):
+                window.state_model.update(tunnel_id, output_temp=value, external_temp=value + 1,
+                                          internal_temp=value + 2, running=round_index % 2)
+            start = time.perf_counter()
+            window.refresh_scheduler.flush()
+            app.processEvents()
+            elapsed += time.perf_counter() - start
+        applied = window.refresh_scheduler.applied_count - window.deferred_updates - applied_before
+        deferred = window.deferred_updates - deferred_before
+        print(f"{mode:>8} {elapsed / rounds * 1000:>9.2f} {applied:>8} {deferred:>9}")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
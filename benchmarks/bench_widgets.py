@@ -0,0 +1,80 @@
+"""Benchmark: TunnelWidget construction time and memory for 12, 48 and 200 tunnels (offscreen QPA).
+
+Each size runs in a fresh process. One widget is built first to warm up
+one-time costs (icon fonts, style plugin), then N widgets are built in a
+grid inside a panel-sized scroll area (so every widget is polished but the
+window backing store stays small) and shown. Reported:
+
+- construct: creating the N widgets
+- show: first show (stylesheet polish, layout and paint)
+- RSS: resident memory added by the N widgets (Linux /proc)
+
+Run from the repository root:
+    python -m benchmarks.bench_widgets [sizes...]
+"""
+import os
+import subprocess
+import sys
+import time
+
+SIZES = (12, 48, 200)
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def child(num_tunnels):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout, QScrollArea
+    import main
+    from mqtt_client import MQTTClient
+    from tunnel_state import TunnelStateModel
+
+    app = QApplication(sys.argv)
+    if hasattr(main, 'apply_theme'):
+        main.apply_theme(app)
+    client = MQTTClient()
+    model = TunnelStateModel(num_tunnels)
+
+    warmup = main.TunnelWidget(1, client, model)
+    warmup.show()
+    app.processEvents()
+    warmup.close()
+    app.processEvents()
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    container = QWidget()
+    grid = QGridLayout(container)
+    for index in range(num_tunnels):
+        grid.addWidget(main.TunnelWidget(index + 1, client, model), index // 10, index % 10)
+    constructed = time.perf_counter()
+    panel = QScrollArea()
+    panel.setWidget(container)
+    panel.resize(1024, 600)
+    panel.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    rss_after = rss_bytes()
+    print(f"{(constructed - start) * 1000:.1f} {(shown - constructed) * 1000:.1f} {(rss_after - rss_before) / 2**20:.1f}")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f"{'tunnels':>8} {'construct ms':>13} {'show ms':>9} {'RSS MB':>8}")
+    for num_tunnels in sizes:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_widgets', '--child', str(num_tunnels)],
+                                capture_output=True, text=True, timeout=300).stdout
+        construct, show, rss = output.strip().splitlines()[-1].split()
+        print(f"{num_tunnels:>8} {float(construct):>13.0f} {float(show):>9.0f} {float(rss):>8.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        child(int(sys.argv[2]))
+    else:
+        main()
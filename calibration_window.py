@@ -4,21 +4,48 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QComboBox, QFrame, QMessageBox, QGroupBox, QSplitter)
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QColor, QPalette, QIcon
-import qtawesome as qta
+from ui_cache import icon, styles
+from command_tracker import HELD, PENDING, QUEUED, CONFIRMED, CANCELLED
+
+# Result variants of the calibration status label, shared by every sensor widget
+STATUS_SUCCESS_STYLE = """
+                color: #2e7d32;
+                background-color: #e8f5e9;
+                border-radius: 8px;
+                padding: 8px;
+                font-weight: bold;
+            """
+STATUS_ERROR_STYLE = """
+                color: #c62828;
+                background-color: #ffebee;
+                border-radius: 8px;
+                padding: 8px;
+                font-weight: bold;
+            """
+STATUS_PENDING_STYLE = """
+                color: #e65100;
+                background-color: #fff3e0;
+                border-radius: 8px;
+                padding: 8px;
+                font-weight: bold;
+            """
 
 class SensorCalibrationWidget(QFrame):
     """Widget for calibrating a single sensor type"""
     
-    def __init__(self, sensor_type, sensor_name, color_scheme, mqtt_client, parent=None):
+    def __init__(self, sensor_type, sensor_name, color_scheme, mqtt_client, num_tunnels=12, parent=None):
         super().__init__(parent)
         self.sensor_type = sensor_type  # 'A', 'E', or 'I'
         self.sensor_name = sensor_name  # Display name
         self.color_scheme = color_scheme  # Dictionary with colors
         self.mqtt_client = mqtt_client
-        self.calibration_values = [0.0] * 12  # One value per tunnel
+        self.calibration_values = [0.0] * num_tunnels  # One value per tunnel
         self.current_tunnel = 1
+        # Last calibration sent from this widget: (command, tunnel, value), followed through command_status
+        self.last_calibration = None
         
         self.setup_ui()
+        self.mqtt_client.command_status.connect(self.on_command_status)
     
     def setup_ui(self):
         # Set frame style
@@ -88,7 +115,7 @@ class SensorCalibrationWidget(QFrame):
         value_layout.addWidget(self.value_spinbox)
         
         # Apply button
-        self.apply_button = QPushButton(qta.icon('fa5s.check'), "Aplicar")
+        self.apply_button = QPushButton(icon('fa5s.check'), "Aplicar")
         self.apply_button.setFont(QFont('Arial', 11))
         self.apply_button.setStyleSheet(f"""
             QPushButton {{
@@ -152,33 +179,49 @@ class SensorCalibrationWidget(QFrame):
         # Construct the full message
         message = f"{self.sensor_type}{tunnel_str},{value_str}"
         
-        # Send the message via MQTT
+        # Send the message via MQTT; the label follows the command until it is acknowledged
         try:
-            self.mqtt_client.send_command(self.current_tunnel, 'calibration', message)
-            self.status_label.setText(f"Calibración de {value:+.1f}°C aplicada al túnel {self.current_tunnel}")
-            self.status_label.setStyleSheet("""
-                color: #2e7d32;
-                background-color: #e8f5e9;
-                border-radius: 8px;
-                padding: 8px;
-                font-weight: bold;
-            """)
+            command = self.mqtt_client.send_command(self.current_tunnel, 'calibration', message)
+            if not command:
+                self.last_calibration = None
+                self.status_label.setText(f"Sin conexión: calibración del túnel {self.current_tunnel} no enviada")
+                styles.apply(self.status_label, STATUS_ERROR_STYLE)
+                return
+            self.last_calibration = (command, self.current_tunnel, value)
+            # Also covers a command already acknowledged inside send_command (embedded broker)
+            self.on_command_status(command)
         except Exception as e:
             self.status_label.setText(f"Error: {str(e)}")
-            self.status_label.setStyleSheet("""
-                color: #c62828;
-                background-color: #ffebee;
-                border-radius: 8px;
-                padding: 8px;
-                font-weight: bold;
-            """)
+            styles.apply(self.status_label, STATUS_ERROR_STYLE)
+
+    def on_command_status(self, command):
+        """Show the state of the last calibration sent from this widget (other commands are ignored)"""
+        if self.last_calibration is None or command is not self.last_calibration[0]:
+            return
+        _, tunnel_id, value = self.last_calibration
+        if command.state in (HELD, PENDING):
+            text, style = f"Enviando calibración de {value:+.1f}°C al túnel {tunnel_id}...", STATUS_PENDING_STYLE
+        elif command.state == QUEUED:
+            text, style = (f"Sin conexión: calibración de {value:+.1f}°C del túnel {tunnel_id} en cola",
+                           STATUS_PENDING_STYLE)
+        elif command.state == CONFIRMED:
+            text, style = (f"Calibración de {value:+.1f}°C enviada al túnel {tunnel_id} "
+                           f"(confirmada por el broker en {command.latency * 1000:.0f} ms)", STATUS_SUCCESS_STYLE)
+        elif command.state == CANCELLED:
+            text, style = f"Calibración del túnel {tunnel_id} sin cambios (no enviada)", STATUS_PENDING_STYLE
+        else:  # FAILED
+            text, style = (f"Calibración del túnel {tunnel_id} sin confirmación del broker "
+                           f"tras {command.attempts} intentos", STATUS_ERROR_STYLE)
+        self.status_label.setText(text)
+        styles.apply(self.status_label, style)
 
 class CalibrationWindow(QMainWindow):
     """Window for calibrating temperature sensors"""
     
-    def __init__(self, mqtt_client, parent=None):
+    def __init__(self, mqtt_client, num_tunnels=12, parent=None):
         super().__init__(parent)
         self.mqtt_client = mqtt_client
+        self.num_tunnels = num_tunnels
         self.setWindowTitle("Calibración de Sensores")
         
         # Cross-platform fullscreen handling
@@ -284,7 +327,7 @@ class CalibrationWindow(QMainWindow):
         """)
         
         # Add tunnels to selector
-        for i in range(1, 13):
+        for i in range(1, self.num_tunnels + 1):
             self.tunnel_selector.addItem(f"Túnel {i}", i)
         
         tunnel_layout.addWidget(self.tunnel_selector)
@@ -301,7 +344,8 @@ class CalibrationWindow(QMainWindow):
             'A', 
             'Salida del Evaporador', 
             self.color_schemes['A'],
-            self.mqtt_client
+            self.mqtt_client,
+            self.num_tunnels
         )
         sensors_layout.addWidget(self.sensor_a_widget)
         
@@ -310,7 +354,8 @@ class CalibrationWindow(QMainWindow):
             'E', 
             'Externo de Caja', 
             self.color_schemes['E'],
-            self.mqtt_client
+            self.mqtt_client,
+            self.num_tunnels
         )
         sensors_layout.addWidget(self.sensor_e_widget)
         
@@ -319,7 +364,8 @@ class CalibrationWindow(QMainWindow):
             'I', 
             'Interno de Caja', 
             self.color_schemes['I'],
-            self.mqtt_client
+            self.mqtt_client,
+            self.num_tunnels
         )
         sensors_layout.addWidget(self.sensor_i_widget)
         
@@ -389,7 +435,7 @@ class CalibrationWindow(QMainWindow):
         button_layout = QHBoxLayout()
         button_layout.addStretch()
         
-        back_button = QPushButton(qta.icon('fa5s.arrow-left'), "Volver")
+        back_button = QPushButton(icon('fa5s.arrow-left'), "Volver")
         back_button.setFont(QFont('Arial', 12))
         back_button.setStyleSheet("""
             QPushButton {
@@ -422,7 +468,7 @@ class CalibrationWindow(QMainWindow):
     def update_tunnel(self, index):
         """Update all sensor widgets with the selected tunnel"""
         tunnel_id = self.tunnel_selector.currentData()
-        if tunnel_id and 1 <= tunnel_id <= 12:
+        if tunnel_id and 1 <= tunnel_id <= self.num_tunnels:
             self.sensor_a_widget.update_tunnel(tunnel_id)
             self.sensor_e_widget.update_tunnel(tunnel_id)
             self.sensor_i_widget.update_tunnel(tunnel_id)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from command_queue import command_key
+from command_tracker import TrackedCommand, HELD, CANCELLED
+
+# A burst of actions is never held longer than this many windows from its first action
+MAX_HOLD_WINDOWS = 5
+
+
+class CommandCoalescer:
+    """Operator commands held for a short window and merged into one net command per setting.
+
+    ``submit`` does not publish: the command waits ``window`` seconds, and an
+    action on the same setting (command_queue.command_key: the mode of a
+    tunnel, i.e. start, stop and defrost, which all write its XX,fan,pid
+    value; each setpoint; each calibration sensor) arriving
+    meanwhile replaces its payload and restarts the wait, up to
+    MAX_HOLD_WINDOWS windows after the first action. A burst of clicks thus
+    costs one retained rewrite of A_RECIBIR instead of one per click. When
+    the window closes the command is handed to ``send(command)``, unless its
+    payload is the one the setting had when the burst started (``previous``
+    given by the first action, e.g. the state the PLC reported): a double
+    toggle is cancelled and nothing is sent. The baseline lives only as long
+    as the burst; without ``previous`` the net command is always sent.
+
+    Like CommandTracker it is driven by its owner: ``flush_due()`` must be
+    called again at the time it returns (e.g. by a single-shot timer on the
+    GUI thread). Each state change of a held command (sent, cancelled) is
+    reported through ``on_change(command)``.
+    """
+
+    def __init__(self, send, window=0.4, on_change=None, clock=time.monotonic):
+        """
+        Args:
+            send (callable): send(command) publishes (or queues) a TrackedCommand once its window closed
+            window (float): Seconds to wait for further actions on the same setting; 0 sends at once
+            on_change (callable): Called as on_change(command) when a held command is sent or cancelled
+        """
+        self.send = send
+        self.window = window
+        self.on_change = on_change
+        self.clock = clock
+        self.lock = threading.Lock()
+        # command_key -> [command, payload when the burst started, first action time, deadline]
+        self.held = {}
+        self.action_count = 0
+        self.sent_count = 0
+        self.cancelled_count = 0
+
+    def submit(self, tunnel_id, kind, topic, payload, previous=None):
+        """Hold a command, merging it with the held one for the same setting
+
+        Args:
+            previous (str): Payload of the state this command changes (e.g. defrost OFF for defrost ON);
+                only the first action of a burst sets it, and a burst ending on it sends nothing
+
+        Returns:
+            TrackedCommand: The held command (state 'held'); the same object for every action of a burst
+        """
+        key = command_key(tunnel_id, kind, payload)
+        now = self.clock()
+        with self.lock:
+            self.action_count += 1
+            entry = self.held.get(key)
+            if entry is None:
+                command = TrackedCommand(tunnel_id, kind, topic, payload, 1, True)
+                command.state = HELD
+                self.held[key] = [command, previous, now, now + self.window]
+                return command
+            command = entry[0]
+            # Start, stop and defrost share a key: the newest action decides the kind as well
+            command.kind = kind
+            command.payload = payload
+            entry[3] = min(now + self.window, entry[2] + self.window * MAX_HOLD_WINDOWS)
+            return command
+
+    def flush_due(self, force=False):
+        """Send or cancel the held commands whose window closed
+
+        Args:
+            force (bool): Close every window now (e.g. before disconnecting)
+
+        Returns:
+            float: Seconds until the next window closes, or None if nothing is held
+        """
+        now = self.clock()
+        with self.lock:
+            due = [key for key, entry in self.held.items() if force or entry[3] <= now]
+            entries = [self.held.pop(key) for key in due]
+            next_deadline = min((entry[3] for entry in self.held.values()), default=None)
+        for command, baseline, _, _ in entries:
+            if baseline is not None and command.payload == baseline:
+                command.state = CANCELLED
+                command.future.cancel()
+                with self.lock:
+                    self.cancelled_count += 1
+            else:
+                with self.lock:
+                    self.sent_count += 1
+                self.send(command)
+            if self.on_change is not None:
+                self.on_change(command)
+        return None if next_deadline is None else max(0.0, next_deadline - now)
+
+    def stats(self):
+        """Operator actions vs commands actually sent; 'coalesced' counts the actions merged away"""
+        with self.lock:
+            held = len(self.held)
+            return {
+                'actions': self.action_count,
+                'sent': self.sent_count,
+                'coalesced': self.action_count - self.sent_count - held,
+                'cancelled': self.cancelled_count,
+                'held': held,
+            }
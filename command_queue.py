@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+from command_tracker import TrackedCommand, QUEUED
+
+# Replay order after a reconnection: tunnel mode first, calibration last. Start, stop
+# and defrost share a priority (and a command_key): they replay in the order queued
+COMMAND_PRIORITY = {
+    'start': 0,
+    'stop': 0,
+    'defrost': 0,
+    'tunnel_setpoint': 2,
+    'fruit_setpoint': 2,
+    'calibration': 3,
+}
+
+
+def command_key(tunnel_id, kind, payload):
+    """Commands with the same key replace each other: only the newest one is worth sending"""
+    if kind in ('start', 'stop', 'defrost'):
+        # All three write the same XX,fan,pid setting of the tunnel: the last one decides
+        return (tunnel_id, 'mode')
+    if kind == 'calibration':
+        # One offset per sensor; the payload starts with the sensor letter (e.g. S03,+01.5)
+        return (tunnel_id, kind, payload[:1])
+    return (tunnel_id, kind)
+
+
+class OfflineCommandQueue:
+    """Commands accepted while the broker is unreachable, kept until the PLC side acknowledges them.
+
+    The queue is an append-only JSON-lines file next to the panel: a "put"
+    line per queued command, fsynced before put() returns so a restart of
+    the panel loses nothing, and a "done" line once it is acknowledged or
+    replaced. "done" lines are only flushed: they are written on the network
+    thread during a replay, and losing one to a crash merely sends that
+    latest value once more. In memory only the newest command per
+    command_key (tunnel and setting; start, stop and defrost are one
+    setting) is kept: after a long outage the replay is one message per
+    setting, never the history of obsolete setpoints. The
+    file is rewritten with the live commands only (write to a temporary file,
+    then os.replace) once it holds ``compact_ratio`` times more lines than
+    that.
+
+    Thread safe: commands are put from the GUI thread and acknowledged from
+    the MQTT network thread.
+    """
+
+    def __init__(self, path='offline_commands.jsonl', compact_ratio=4):
+        """
+        Args:
+            path (str): Queue file, created if missing
+            compact_ratio (int): Rewrite the file when it has this many lines per live command
+        """
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.lock = threading.Lock()
+        self.entries = {}  # command_key -> (seq, TrackedCommand)
+        self.next_seq = 1
+        self.lines = 0
+        self.file = None
+        self.queued_count = 0
+        self.replaced_count = 0
+        self._load()
+        self._rewrite()
+
+    def _load(self):
+        """Rebuild the live commands from the file (a torn last line from a crash is skipped)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                seq = record['seq']
+                self.next_seq = max(self.next_seq, seq + 1)
+                if record['op'] == 'put':
+                    command = TrackedCommand(record['tunnel_id'], record['kind'], record['topic'],
+                                             record['payload'], record.get('qos', 1), record.get('retain', True))
+                    command.state = QUEUED
+                    self.entries[command_key(command.tunnel_id, command.kind, command.payload)] = (seq, command)
+                else:
+                    key = tuple(record['key'])
+                    if key[1:] in (('running',), ('defrost',)):
+                        # Written before start/stop and defrost shared the 'mode' key
+                        key = (key[0], 'mode')
+                    if key in self.entries and self.entries[key][0] == seq:
+                        del self.entries[key]
+
+    def _put_record(self, seq, command):
+        return {'op': 'put', 'seq': seq, 'tunnel_id': command.tunnel_id, 'kind': command.kind,
+                'topic': command.topic, 'payload': command.payload, 'qos': command.qos,
+                'retain': command.retain}
+
+    def _append(self, record, sync=True):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.lines += 1
+
+    def _rewrite(self):
+        """Replace the file by one line per live command"""
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for seq, command in sorted(self.entries.values(), key=lambda entry: entry[0]):
+                f.write(json.dumps(self._put_record(seq, command)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.lines = len(self.entries)
+
+    def put(self, command):
+        """Queue a command, replacing the queued one with the same key
+
+        Args:
+            command (TrackedCommand): Command that could not be published; its state becomes 'queued'
+        """
+        key = command_key(command.tunnel_id, command.kind, command.payload)
+        command.state = QUEUED
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            if key in self.entries:
+                self.replaced_count += 1
+            self.entries[key] = (seq, command)
+            self.queued_count += 1
+            self._append(self._put_record(seq, command))
+            if self.lines > self.compact_ratio * max(len(self.entries), 16):
+                self._rewrite()
+
+    def done(self, command):
+        """Remove a command once acknowledged; ignored if a newer command replaced it meanwhile"""
+        self._remove(command_key(command.tunnel_id, command.kind, command.payload), command)
+
+    def discard(self, tunnel_id, kind, payload):
+        """Drop the queued command a newer one, sent directly, makes obsolete"""
+        self._remove(command_key(tunnel_id, kind, payload), None)
+
+    def _remove(self, key, command):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (command is not None and entry[1] is not command):
+                return
+            del self.entries[key]
+            self._append({'op': 'done', 'seq': entry[0], 'key': list(key)}, sync=False)
+
+    def pending(self):
+        """Queued commands in replay order: by priority of their kind, then oldest first"""
+        with self.lock:
+            entries = list(self.entries.values())
+        entries.sort(key=lambda entry: (COMMAND_PRIORITY.get(entry[1].kind, len(COMMAND_PRIORITY)), entry[0]))
+        return [command for _, command in entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {'queued': len(self.entries), 'accepted': self.queued_count, 'replaced': self.replaced_count,
+                'file_lines': self.lines}
+
+    def close(self):
+        with self.lock:
+            self.file.close()
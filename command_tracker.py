@@ -0,0 +1,310 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# States of a tracked command
+HELD = 'held'  # waiting for further operator actions (command_coalescer.CommandCoalescer)
+CANCELLED = 'cancelled'  # undone by a later action before being sent
+QUEUED = 'queued'  # waiting for the broker connection (command_queue.OfflineCommandQueue)
+PENDING = 'pending'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+
+class CommandTimeout(Exception):
+    """Set on the future of a command that was never acknowledged"""
+
+
+class TrackedCommand:
+    """A QoS 1 command published to the PLC, waiting for or done with its PUBACK"""
+
+    __slots__ = ('tunnel_id', 'kind', 'topic', 'payload', 'qos', 'retain', 'mid', 'state',
+                 'attempts', 'submitted_at', 'sent_at', 'deadline', 'latency', 'future')
+
+    def __init__(self, tunnel_id, kind, topic, payload, qos, retain):
+        self.tunnel_id = tunnel_id
+        self.kind = kind
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = None
+        self.state = PENDING
+        self.attempts = 0
+        self.submitted_at = None
+        self.sent_at = None
+        self.deadline = None
+        self.latency = None  # seconds from submission to acknowledgement
+        self.future = Future()
+
+    def __repr__(self):
+        return (f"TrackedCommand(tunnel={self.tunnel_id}, kind={self.kind!r}, payload={self.payload!r}, "
+                f"state={self.state}, attempts={self.attempts})")
+
+
+class CommandTracker:
+    """In-flight QoS 1 commands keyed by paho message id.
+
+    ``submit`` publishes and returns at once with a TrackedCommand whose state
+    is 'pending'; the PUBACK (paho's on_publish, on the network thread) moves
+    it to 'confirmed'. A command without acknowledgement is published again
+    after ``timeout`` seconds, the wait growing by ``backoff`` each attempt,
+    and is 'failed' once ``max_retries`` retries timed out. ``check_timeouts``
+    must be called periodically by the owner (e.g. a timer on the GUI thread).
+
+    Each change is reported through ``on_change(command)`` and, on
+    completion, through the command's concurrent.futures.Future (result: the
+    acknowledgement latency; exception: CommandTimeout). Both are called
+    without the lock held, on the thread that saw the change.
+    """
+
+    def __init__(self, publish, timeout=5.0, max_retries=2, backoff=2.0, on_change=None, clock=time.monotonic):
+        """
+        Args:
+            publish (callable): publish(topic, payload, qos, retain) -> mid, or None if it could not be sent
+            timeout (float): Seconds to wait for the first acknowledgement
+            max_retries (int): Publications after the first one before giving up
+            backoff (float): Factor applied to the wait after every retry
+            on_change (callable): Called as on_change(command) on every state change and retry
+        """
+        self.publish = publish
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_change = on_change
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.in_flight = {}  # mid -> TrackedCommand
+        self.unsent = []  # commands whose publication failed, retried by check_timeouts
+        # Acknowledgements that arrived before publish() returned the mid (mid -> time)
+        self.early_acks = {}
+        self.latencies = deque(maxlen=1000)
+        self.submitted_count = 0
+        self.confirmed_count = 0
+        self.failed_count = 0
+        self.retried_count = 0
+
+    def submit(self, tunnel_id, kind, topic, payload, qos=1, retain=True):
+        """Publish a command without waiting for it to be acknowledged
+
+        Returns:
+            TrackedCommand: The command, in state 'pending'
+        """
+        return self.resume(TrackedCommand(tunnel_id, kind, topic, payload, qos, retain))
+
+    def resume(self, command):
+        """Publish a command created earlier (a batch item, a command queued while offline)"""
+        if command.future.done():
+            # Given up on an earlier connection and replayed again
+            command.future = Future()
+        command.state = PENDING
+        command.attempts = 0
+        command.submitted_at = self.clock()
+        with self.lock:
+            self.submitted_count += 1
+        self._send(command)
+        return command
+
+    def _send(self, command):
+        """Publish (or publish again) a command and register its mid; never called with the lock held"""
+        command.attempts += 1
+        command.sent_at = self.clock()
+        command.deadline = command.sent_at + self.timeout * self.backoff ** (command.attempts - 1)
+        mid = self.publish(command.topic, command.payload, command.qos, command.retain)
+        with self.lock:
+            command.mid = mid
+            if mid is None:
+                self.unsent.append(command)
+                return
+            acked_at = self.early_acks.pop(mid, None)
+            if acked_at is None:
+                self.in_flight[mid] = command
+                return
+        self._complete(command, acked_at)
+
+    def acknowledge(self, mid):
+        """PUBACK received for a message id (paho on_publish), possibly before submit() registered it"""
+        now = self.clock()
+        with self.lock:
+            command = self.in_flight.pop(mid, None)
+            if command is None:
+                self.early_acks[mid] = now
+                return
+        self._complete(command, now)
+
+    def _complete(self, command, acked_at):
+        command.state = CONFIRMED
+        command.latency = acked_at - command.submitted_at
+        with self.lock:
+            self.confirmed_count += 1
+            self.latencies.append(command.latency)
+        command.future.set_result(command.latency)
+        self._changed(command)
+
+    def check_timeouts(self):
+        """Retry or fail the commands whose acknowledgement is overdue
+
+        Returns:
+            int: Number of commands still in flight
+        """
+        now = self.clock()
+        with self.lock:
+            overdue = [command for command in self.in_flight.values() if command.deadline <= now]
+            for command in overdue:
+                del self.in_flight[command.mid]
+            overdue += [command for command in self.unsent if command.deadline <= now]
+            self.unsent = [command for command in self.unsent if command.deadline > now]
+            # Acknowledgements nobody claimed (e.g. QoS 0 publications) are forgotten after a while
+            self.early_acks = {mid: at for mid, at in self.early_acks.items() if now - at < self.timeout}
+        for command in overdue:
+            if command.attempts > self.max_retries:
+                command.state = FAILED
+                with self.lock:
+                    self.failed_count += 1
+                command.future.set_exception(CommandTimeout(
+                    f"{command.kind} for tunnel {command.tunnel_id} not acknowledged after {command.attempts} attempts"))
+            else:
+                with self.lock:
+                    self.retried_count += 1
+                self._send(command)
+            self._changed(command)
+        return self.pending_count()
+
+    def pending_count(self):
+        with self.lock:
+            return len(self.in_flight) + len(self.unsent)
+
+    def _changed(self, command):
+        if self.on_change is not None:
+            self.on_change(command)
+
+    def stats(self):
+        """In-flight count, outcome counters and acknowledgement latency percentiles (ms)"""
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            stats = {
+                'in_flight': len(self.in_flight) + len(self.unsent),
+                'submitted': self.submitted_count,
+                'confirmed': self.confirmed_count,
+                'failed': self.failed_count,
+                'retried': self.retried_count,
+            }
+        if len(latencies):
+            stats.update(zip(('p50_ms', 'p95_ms', 'p99_ms'), np.percentile(latencies, (50, 95, 99)).tolist()))
+            stats['max_ms'] = float(latencies.max())
+        return stats
+
+
+class CommandBatch:
+    """Commands published as one pipeline, with at most ``window`` awaiting acknowledgement.
+
+    The first ``window`` commands go out at once; every acknowledgement (or
+    give-up) of one sends the next, so a batch takes about
+    len(commands) / window round trips instead of one per command. ``future``
+    resolves with the batch when every command is confirmed or failed, and
+    ``on_done(batch)`` is called at the same moment, on the thread that
+    completed the last command.
+
+    Acknowledgements may arrive inside ``tracker.resume`` (an in-process
+    broker acknowledges before publish returns): the next commands are then
+    sent by the loop already running in ``_submit``, not by a nested call,
+    so the stack does not grow with the size of the batch.
+    """
+
+    def __init__(self, tracker, commands, window=20, on_done=None):
+        """
+        Args:
+            tracker (CommandTracker): Tracker that publishes the commands
+            commands (list): TrackedCommands not sent yet, in sending order
+            window (int): Maximum number of commands awaiting acknowledgement
+            on_done (callable): Called as on_done(batch) once every command completed
+        """
+        self.tracker = tracker
+        self.commands = list(commands)
+        self.window = max(1, window)
+        self.on_done = on_done
+        self.future = Future()
+        self.lock = threading.Lock()
+        self.next_index = 0
+        self.ready = 0  # free window slots not used yet by _submit
+        self.submitting = False  # a _submit loop is running (on this or another thread)
+        self.remaining = len(self.commands)
+        self.started_at = None
+        self.elapsed = None
+
+    def start(self):
+        """Send the first window of commands; returns the batch"""
+        self.started_at = self.tracker.clock()
+        if not self.commands:
+            self._finish()
+            return self
+        self._submit(min(self.window, len(self.commands)))
+        return self
+
+    def _submit(self, count):
+        """Send up to count more commands, or leave them to the loop already sending"""
+        with self.lock:
+            self.ready += count
+            if self.submitting:
+                return
+            self.submitting = True
+        while True:
+            with self.lock:
+                if not self.ready or self.next_index >= len(self.commands):
+                    self.submitting = False
+                    return
+                self.ready -= 1
+                command = self.commands[self.next_index]
+                self.next_index += 1
+            self.tracker.resume(command)
+            command.future.add_done_callback(self._command_done)
+
+    def _command_done(self, future):
+        with self.lock:
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            self._finish()
+        else:
+            self._submit(1)
+
+    def _finish(self):
+        self.elapsed = self.tracker.clock() - self.started_at
+        self.future.set_result(self)
+        if self.on_done is not None:
+            self.on_done(self)
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def queued(self):
+        """True if the commands were queued for the next connection instead of sent"""
+        return any(command.state == QUEUED for command in self.commands)
+
+    @property
+    def confirmed(self):
+        """Commands acknowledged so far"""
+        return [command for command in self.commands if command.state == CONFIRMED]
+
+    @property
+    def failed(self):
+        """Commands given up after their retries"""
+        return [command for command in self.commands if command.state == FAILED]
+
+
+def format_command_stats(stats):
+    line = (f"Commands: {stats['submitted']} sent, {stats['confirmed']} confirmed, {stats['failed']} failed, "
+            f"{stats['retried']} retries, {stats['in_flight']} in flight")
+    if 'offline_queued' in stats:
+        line += f", {stats['offline_queued']} queued offline"
+    if stats.get('operator_actions'):
+        line += (f", {stats['operator_actions']} operator actions ({stats['coalesced']} coalesced, "
+                 f"{stats['cancelled']} net-zero bursts cancelled)")
+    if 'p50_ms' in stats:
+        line += f", ack p50 {stats['p50_ms']:.1f} ms p95 {stats['p95_ms']:.1f} ms p99 {stats['p99_ms']:.1f} ms"
+    return line
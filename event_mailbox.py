@@ -0,0 +1,78 @@
+import threading
+from collections import deque
+
+
+class LatestWinsMailbox:
+    """Bounded hand-off of decoded events from the ingest thread to the GUI thread.
+
+    Telemetry-like events are stored under a key such as (kind, tunnel_id):
+    a newer event replaces the pending one and the stale one is counted as
+    dropped, so the backlog can never exceed one event per key however long
+    the GUI stalls. Events that must not be lost (status edges, commands) go
+    through ``put_ordered`` and are delivered in FIFO order before the
+    latest-wins values.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.ordered = deque()
+        self.dropped_count = 0
+        self.delivered_count = 0
+        self.max_depth = 0
+
+    def put(self, key, event):
+        """Store an event, replacing any pending event with the same key.
+
+        Returns:
+            bool: True if the mailbox was empty, i.e. the consumer must be notified
+        """
+        with self.lock:
+            was_empty = not self.latest and not self.ordered
+            if self.latest.pop(key, None) is not None:
+                self.dropped_count += 1
+            # Re-insert so that drain() returns values in arrival order
+            self.latest[key] = event
+            self._track_depth()
+            return was_empty
+
+    def put_ordered(self, event):
+        """Store an event that must never be dropped.
+
+        Returns:
+            bool: True if the mailbox was empty, i.e. the consumer must be notified
+        """
+        with self.lock:
+            was_empty = not self.latest and not self.ordered
+            self.ordered.append(event)
+            self._track_depth()
+            return was_empty
+
+    def drain(self):
+        """Return every pending event (ordered ones first) and empty the mailbox"""
+        with self.lock:
+            events = list(self.ordered)
+            events.extend(self.latest.values())
+            self.ordered.clear()
+            self.latest.clear()
+            self.delivered_count += len(events)
+            return events
+
+    def depth(self):
+        """Number of pending events"""
+        with self.lock:
+            return len(self.latest) + len(self.ordered)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'depth': len(self.latest) + len(self.ordered),
+                'max_depth': self.max_depth,
+                'dropped': self.dropped_count,
+                'delivered': self.delivered_count,
+            }
+
+    def _track_depth(self):
+        depth = len(self.latest) + len(self.ordered)
+        if depth > self.max_depth:
+            self.max_depth = depth
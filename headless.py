@@ -0,0 +1,120 @@
+"""Headless ingest service: MQTT connection, decoding, state model, history and historian without Qt.
+
+Runs next to the broker (server, gateway) with the same config.yaml as the panel:
+
+    python headless.py [--config config.yaml] [--stats-interval 10] [--embedded-broker]
+"""
+import argparse
+import asyncio
+import signal
+import threading
+import time
+
+import yaml
+
+from mqtt_async import AsyncMQTTTransport, create_transport
+from hmi_core import TelemetryCore
+
+
+def format_stats(core, transport):
+    model = core.state_model.stats()
+    ingest = transport.ingest_stats()
+    line = (f"received={model['received']} changed={model['changed']} skipped={model['skipped']} "
+            f"decoded={ingest['decoded']} dropped={ingest['dropped']} errors={ingest['errors']}")
+    if ingest['raw_dropped']:
+        line += f" raw_dropped={ingest['raw_dropped']}"
+    connection = transport.reconnect_stats()
+    line += (f" mqtt={connection['state']} reconnects={connection['reconnects']}"
+             f" downtime={connection['downtime_s']:.1f}s")
+    if core.historian is not None:
+        historian = core.historian.stats()
+        line += f" historian_rows={historian['rows_written']} historian_queued={historian['queued']}"
+        if historian['rows_dropped']:
+            line += f" historian_dropped={historian['rows_dropped']}"
+        if historian['write_errors']:
+            line += (f" historian_errors={historian['write_errors']} historian_backlog={historian['backlog_rows']}"
+                     f" last_error={historian['last_error']!r}")
+    return line
+
+
+def run_asyncio(transport, core, stats_interval):
+    """Single-threaded variant (mqtt.transport: asyncio): events are applied as soon as they are decoded"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    transport.loop = loop
+    transport.on_events_pending = lambda: core.apply_events(transport.take_events())
+    transport.on_connection_status = lambda connected: print(f"MQTT {'connected' if connected else 'disconnected'}")
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, loop.stop)
+
+    def print_stats():
+        print(format_stats(core, transport))
+        loop.call_later(stats_interval, print_stats)
+
+    if stats_interval:
+        loop.call_later(stats_interval, print_stats)
+    transport.connect()
+    try:
+        loop.run_forever()
+    finally:
+        transport.disconnect()
+        core.close()
+        loop.close()
+        print(format_stats(core, transport))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de adquisición de túneles sin interfaz gráfica")
+    parser.add_argument('--config', default='config.yaml', help="Archivo de configuración (el mismo del panel)")
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help="Segundos entre líneas de estadísticas (0 para desactivar)")
+    parser.add_argument('--embedded-broker', action='store_true',
+                        help="Iniciar un broker MQTT en este proceso en mqtt.broker:port (como mqtt.embedded_broker)")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    if args.embedded_broker:
+        config['mqtt']['embedded_broker'] = True
+
+    transport = create_transport(config['mqtt'])
+    # The service sends no commands: the panel's offline command queue is left to the panel
+    transport.configure(dict(config['mqtt'], offline_queue=None))
+    core = TelemetryCore(config)
+    core.attach(transport.ingest)
+    if isinstance(transport, AsyncMQTTTransport):
+        run_asyncio(transport, core, args.stats_interval)
+        return
+
+    # The ingest thread only flags pending events; they are applied on this thread
+    pending = threading.Event()
+    stopping = threading.Event()
+    transport.on_events_pending = pending.set
+    transport.on_connection_status = lambda connected: print(f"MQTT {'connected' if connected else 'disconnected'}")
+
+    def request_stop(signum, frame):
+        stopping.set()
+        pending.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    transport.connect()
+    next_stats = time.monotonic() + args.stats_interval
+    try:
+        while not stopping.is_set():
+            timeout = max(0.0, next_stats - time.monotonic()) if args.stats_interval else None
+            if pending.wait(timeout):
+                pending.clear()
+                core.apply_events(transport.take_events())
+            if args.stats_interval and time.monotonic() >= next_stats:
+                print(format_stats(core, transport))
+                next_stats = time.monotonic() + args.stats_interval
+    finally:
+        transport.disconnect()
+        core.close()
+        print(format_stats(core, transport))
+
+
+if __name__ == '__main__':
+    main()
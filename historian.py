@@ -0,0 +1,263 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from rollups import SCHEMA as ROLLUP_SCHEMA, ROLLUP_FIELDS, update_rollups, query_rollup, tier_for_span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    ts REAL NOT NULL,
+    tunnel_id INTEGER NOT NULL,
+    temp_output REAL,
+    temp_external REAL,
+    temp_internal REAL,
+    tunnel_setpoint REAL,
+    fruit_setpoint REAL,
+    pid INTEGER,
+    fan INTEGER
+);
+CREATE INDEX IF NOT EXISTS telemetry_tunnel_ts ON telemetry (tunnel_id, ts);
+"""
+
+COLUMNS = ('ts', 'tunnel_id', 'temp_output', 'temp_external', 'temp_internal',
+           'tunnel_setpoint', 'fruit_setpoint', 'pid', 'fan')
+
+_INSERT = f"INSERT INTO telemetry ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def connect(path):
+    """Open a connection to the historian database in WAL mode"""
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only syncs at checkpoints: a crash loses at most the last
+    # batches, never corrupts the file
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class Historian:
+    """Persistent telemetry record (audit trail of the fruit cooling lots).
+
+    Decoded frames are queued by ``append_records`` (an ingest sink) and written
+    by a background thread in batches: every batch is one transaction, so the
+    cost of the commit is paid once per ``batch_size`` rows or once per
+    ``flush_interval`` seconds, and neither the ingest nor the GUI thread ever
+    waits on the disk.
+
+    Minute and hour rollups (see rollups.py) are merged in the same
+    transaction as the raw rows, so long-range queries never rescan raw data.
+
+    A batch whose transaction fails (disk full, database locked, ...) is kept
+    and written again together with the next one. The backlog is bounded by
+    ``max_backlog_rows``: past it the oldest frames are discarded. The input
+    queue has the same bound, so frames that keep arriving while the writer is
+    stalled on the disk do not grow memory either: ``append_records`` discards
+    the oldest queued frames instead. Failures, the backlog and the discarded
+    rows are reported by ``stats()`` so the panel can show them.
+    """
+
+    def __init__(self, path='historian.db', batch_size=1000, flush_interval=1.0, rollups=True,
+                 max_backlog_rows=100000, sample_period=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rollups = rollups
+        self.max_backlog_rows = max_backlog_rows
+        self.sample_period = sample_period
+        self.queue = queue.Queue()
+        self.queued_rows = 0  # rows in the input queue, bounded by max_backlog_rows
+        self.lock = threading.Lock()  # guards queued_rows and rows_dropped (ingest and writer threads)
+        self.thread = None
+        self.backlog = []  # frames of the failed batches, written again with the next batch
+        self.backlog_rows = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.last_commit_ms = 0.0
+        self.write_errors = 0
+        self.rows_dropped = 0
+        self.last_error = None
+
+    def start(self):
+        """Create the schema and start the writer thread"""
+        if self.thread is not None:
+            return
+        connection = connect(self.path)
+        connection.executescript(SCHEMA + ROLLUP_SCHEMA)
+        connection.close()
+        self.thread = threading.Thread(target=self._run, name="historian", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Write everything still queued and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def append_records(self, records, timestamp):
+        """Queue a decoded telemetry frame (TELEMETRY_DTYPE records) for writing.
+
+        Past ``max_backlog_rows`` queued rows the oldest queued frames are discarded.
+        """
+        with self.lock:
+            self.queue.put((records, timestamp))
+            self.queued_rows += len(records)
+            while self.queued_rows > self.max_backlog_rows:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Stop requested: keep the sentinel at the end
+                    self.queue.put(None)
+                    break
+                self.queued_rows -= len(item[0])
+                self.rows_dropped += len(item[0])
+
+    def query(self, tunnel_id, t0=None, t1=None):
+        """Rows of a tunnel with t0 <= ts < t1, oldest first.
+
+        Uses its own connection, so it can run on any thread while the writer is active.
+        """
+        sql = f"SELECT {', '.join(COLUMNS)} FROM telemetry WHERE tunnel_id = ?"
+        params = [tunnel_id]
+        if t0 is not None:
+            sql += " AND ts >= ?"
+            params.append(t0)
+        if t1 is not None:
+            sql += " AND ts < ?"
+            params.append(t1)
+        sql += " ORDER BY ts"
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def query_rollup(self, tunnel_id, channel, t0=None, t1=None, tier='minute'):
+        """Per-minute or per-hour aggregates of a channel, see rollups.query_rollup"""
+        connection = sqlite3.connect(self.path)
+        try:
+            return query_rollup(connection, tier, tunnel_id, channel, t0, t1)
+        finally:
+            connection.close()
+
+    def query_series(self, tunnel_id, channel, t0, t1, max_points=2000):
+        """Series of a channel over [t0, t1) read from the cheapest sufficient tier.
+
+        The raw row count of the span is estimated from ``sample_period``.
+
+        Returns:
+            list: (timestamp, min, max, mean, last) tuples; for raw rows all four values are the sample
+        """
+        tier = tier_for_span(t1 - t0, max_points, self.sample_period)
+        if tier is not None:
+            return self.query_rollup(tunnel_id, channel, t0, t1, tier)
+        column = ROLLUP_FIELDS[channel]
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(
+                f"SELECT ts, {column}, {column}, {column}, {column} FROM telemetry "
+                "WHERE tunnel_id = ? AND ts >= ? AND ts < ? ORDER BY ts", (tunnel_id, t0, t1)).fetchall()
+        finally:
+            connection.close()
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'queued_rows': self.queued_rows,
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written,
+            'last_commit_ms': self.last_commit_ms,
+            'write_errors': self.write_errors,
+            'backlog_rows': self.backlog_rows,
+            'rows_dropped': self.rows_dropped,
+            'last_error': self.last_error,
+        }
+
+    def _run(self):
+        connection = connect(self.path)
+        try:
+            running = True
+            while running:
+                frames, running = self._collect_batch()
+                if self.backlog:
+                    frames = self.backlog + frames
+                    self.backlog = []
+                if frames:
+                    self._write(connection, frames)
+        finally:
+            connection.close()
+
+    def _collect_batch(self):
+        """Block for the first frame, then gather more until the batch is full or the interval elapses.
+
+        With a failed batch pending it waits at most one interval, so the retry
+        does not depend on new telemetry arriving.
+        """
+        frames = []
+        num_rows = 0
+        try:
+            item = self._get(self.flush_interval if self.backlog else None)
+        except queue.Empty:
+            return frames, True
+        deadline = time.monotonic() + self.flush_interval
+        while item is not None:
+            frames.append(item)
+            num_rows += len(item[0])
+            if num_rows >= self.batch_size:
+                return frames, True
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return frames, True
+            try:
+                item = self._get(timeout)
+            except queue.Empty:
+                return frames, True
+        return frames, False
+
+    def _get(self, timeout):
+        """Take the next queued frame (or the stop sentinel) off the input queue"""
+        item = self.queue.get(timeout=timeout)
+        if item is not None:
+            with self.lock:
+                self.queued_rows -= len(item[0])
+        return item
+
+    def _write(self, connection, frames):
+        start = time.perf_counter()
+        records = np.concatenate([frame for frame, _ in frames])
+        timestamps = np.repeat([timestamp for _, timestamp in frames], [len(frame) for frame, _ in frames])
+        rows = list(zip(timestamps.tolist(), *(records[name].tolist() for name in COLUMNS[1:])))
+        try:
+            with connection:
+                connection.executemany(_INSERT, rows)
+                if self.rollups:
+                    update_rollups(connection, records, timestamps)
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            self.last_error = str(e)
+            self._keep_for_retry(frames)
+            return
+        self.backlog_rows = 0
+        self.last_commit_ms = (time.perf_counter() - start) * 1000
+        self.rows_written += len(rows)
+        self.batches_written += 1
+
+    def _keep_for_retry(self, frames):
+        """Keep a failed batch for the next write, discarding the oldest frames past max_backlog_rows"""
+        num_rows = sum(len(frame) for frame, _ in frames)
+        first = 0
+        dropped = 0
+        while num_rows > self.max_backlog_rows:
+            num_rows -= len(frames[first][0])
+            dropped += len(frames[first][0])
+            first += 1
+        with self.lock:
+            self.rows_dropped += dropped
+        self.backlog = frames[first:]
+        self.backlog_rows = num_rows
@@ -0,0 +1,147 @@
+import threading
+
+import numpy as np
+
+# Channels stored per tunnel, in column order
+CHANNELS = ('output_temp', 'external_temp', 'internal_temp', 'tunnel_setpoint', 'fruit_setpoint', 'pid', 'fan')
+CHANNEL_INDEX = {name: i for i, name in enumerate(CHANNELS)}
+
+# Record fields (telemetry_codec.TELEMETRY_DTYPE) feeding each channel
+_RECORD_FIELDS = ('temp_output', 'temp_external', 'temp_internal', 'tunnel_setpoint', 'fruit_setpoint', 'pid', 'fan')
+
+# Bytes per stored sample: float64 timestamp plus one float32 per channel
+SAMPLE_BYTES = 8 + 4 * len(CHANNELS)
+
+
+class RingBuffer:
+    """Fixed-capacity time series: one timestamp column plus one column per channel.
+
+    Storage is allocated once (contiguous NumPy arrays); once full, the oldest
+    sample is overwritten, so memory stays constant however long the panel runs.
+    Reads return views into the storage, never copies: a buffer written on
+    another thread must be read through HistoryStore, which locks and copies.
+    """
+
+    def __init__(self, capacity, num_channels=len(CHANNELS)):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, num_channels), np.nan, dtype=np.float32)
+        self.head = 0  # next write position
+        self.count = 0
+        self.version = 0  # incremented on every append, lets readers skip unchanged buffers
+
+    def append(self, timestamp, row):
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.version += 1
+
+    def segments(self):
+        """Index ranges (start, stop) of the stored samples, oldest first (at most two)"""
+        head, count = self.head, self.count
+        if count < self.capacity:
+            return [(0, count)] if count else []
+        return [(head, self.capacity), (0, head)] if head else [(0, self.capacity)]
+
+    def range(self, t0=None, t1=None, channel=None):
+        """Samples with t0 <= timestamp < t1, as views.
+
+        Args:
+            t0, t1 (float, optional): Time bounds (epoch seconds), open if None
+            channel (str, optional): Return only this channel instead of all columns
+
+        Returns:
+            list: Up to two (timestamps, values) view pairs, oldest first. The ring
+            may wrap inside the requested range, hence the two segments.
+        """
+        result = []
+        for start, stop in self.segments():
+            timestamps = self.timestamps[start:stop]
+            lo = 0 if t0 is None else np.searchsorted(timestamps, t0, side='left')
+            hi = len(timestamps) if t1 is None else np.searchsorted(timestamps, t1, side='left')
+            if hi <= lo:
+                continue
+            values = self.values[start + lo:start + hi]
+            if channel is not None:
+                values = values[:, CHANNEL_INDEX[channel]]
+            result.append((timestamps[lo:hi], values))
+        return result
+
+    def latest(self):
+        """Return (timestamp, values row) of the newest sample, or None"""
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return self.timestamps[index], self.values[index]
+
+
+class HistoryStore:
+    """In-memory history of the configured tunnels: one RingBuffer per tunnel, one column per channel.
+
+    The default capacity keeps 24 h at one sample per second (about 3.1 MB
+    per tunnel). Buffers are created the first time a tunnel reports, with
+    their full capacity, and only for the configured tunnel ids: a frame
+    naming other tunnels does not grow the store. On large sites the
+    capacity is reduced so that all buffers fit in ``max_bytes``.
+
+    Frames are appended on the ingest thread while the GUI reads: both hold
+    ``lock``, and ``range`` returns copies, so a reader never sees a row
+    being written or overwritten.
+    """
+
+    def __init__(self, capacity=24 * 3600, tunnel_ids=None, max_bytes=None):
+        """
+        Args:
+            capacity (int): Samples kept per tunnel
+            tunnel_ids (iterable): Tunnels to keep a history of; any tunnel if None
+            max_bytes (int): Memory budget of all buffers together (needs tunnel_ids); unbounded if None
+        """
+        self.tunnel_ids = frozenset(tunnel_ids) if tunnel_ids is not None else None
+        if max_bytes and self.tunnel_ids:
+            budget = max_bytes // (SAMPLE_BYTES * len(self.tunnel_ids))
+            if budget < capacity:
+                print(f"History: {len(self.tunnel_ids)} tunnels, keeping {budget} samples per tunnel "
+                      f"instead of {capacity} to stay within {max_bytes / 2 ** 20:.0f} MB")
+                capacity = max(budget, 1)
+        self.capacity = capacity
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self.ignored_count = 0  # records of tunnels outside tunnel_ids
+
+    def buffer(self, tunnel_id):
+        """Buffer of a tunnel, created on first use; None for a tunnel that is not configured"""
+        buffer = self.buffers.get(tunnel_id)
+        if buffer is None:
+            if self.tunnel_ids is not None and tunnel_id not in self.tunnel_ids:
+                return None
+            buffer = self.buffers[tunnel_id] = RingBuffer(self.capacity)
+        return buffer
+
+    def append_records(self, records, timestamp):
+        """Append a decoded telemetry frame (TELEMETRY_DTYPE records) sampled at timestamp"""
+        rows = np.column_stack([records[field] for field in _RECORD_FIELDS]).astype(np.float32)
+        with self.lock:
+            for tunnel_id, row in zip(records['tunnel_id'].tolist(), rows):
+                buffer = self.buffer(tunnel_id)
+                if buffer is None:
+                    self.ignored_count += 1
+                    continue
+                buffer.append(timestamp, row)
+
+    def range(self, tunnel_id, t0=None, t1=None, channel=None):
+        """Samples of a tunnel within [t0, t1), see RingBuffer.range; copies, safe to keep while frames arrive"""
+        buffer = self.buffers.get(tunnel_id)
+        if buffer is None:
+            return []
+        with self.lock:
+            return [(timestamps.copy(), values.copy()) for timestamps, values in buffer.range(t0, t1, channel)]
+
+    def version(self, tunnel_id):
+        buffer = self.buffers.get(tunnel_id)
+        return buffer.version if buffer is not None else 0
+
+    def memory_bytes(self):
+        """Bytes reserved by all buffers (constant once every tunnel has reported)"""
+        return sum(b.timestamps.nbytes + b.values.nbytes for b in self.buffers.values())
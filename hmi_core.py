@@ -0,0 +1,128 @@
+from telemetry_codec import TelemetryEvent, SetpointEvent, TemperatureEvent, StatusEvent, defrost_mask
+from tunnel_state import TunnelStateModel
+from history import HistoryStore
+from historian import Historian
+from state_snapshot import StateSnapshot
+
+# Tunnels of the original site; other sites set "tunnels: count" in config.yaml
+DEFAULT_TUNNEL_COUNT = 12
+
+
+def tunnel_count(config):
+    """Number of tunnels configured for the site (``tunnels: count``, 12 by default)"""
+    return int((config.get('tunnels') or {}).get('count', DEFAULT_TUNNEL_COUNT))
+
+
+def event_updates(events):
+    """Translate decoded MQTT events into state model updates.
+
+    Args:
+        events (list): Events from the ingest mailbox (see telemetry_codec)
+
+    Yields:
+        tuple: (tunnel_id, fields) where fields is a dict of TunnelState field values
+    """
+    for event in events:
+        if isinstance(event, TelemetryEvent):
+            records = event.records
+            # Defrost status: PID off (0) and fan on (1)
+            defrosting = defrost_mask(records)
+            for record, is_defrosting in zip(records.tolist(), defrosting.tolist()):
+                tunnel_id, output_temp, external_temp, internal_temp, tunnel_setpoint, fruit_setpoint, pid_status, _ = record
+                yield tunnel_id, {
+                    'output_temp': output_temp,
+                    'external_temp': external_temp,
+                    'internal_temp': internal_temp,
+                    'tunnel_setpoint': tunnel_setpoint,
+                    'fruit_setpoint': fruit_setpoint,
+                    'running': pid_status,
+                    'defrosting': is_defrosting,
+                }
+        elif isinstance(event, SetpointEvent):
+            # Setpoint echo (SXX,+/-XX.XX or FXX,+/-XX.XX)
+            field = 'tunnel_setpoint' if event.kind == 'tunnel' else 'fruit_setpoint'
+            yield event.tunnel_id, {field: event.value}
+        elif isinstance(event, TemperatureEvent):
+            yield event.tunnel_id, {
+                'output_temp': event.output_temp,
+                'external_temp': event.external_temp,
+                'internal_temp': event.internal_temp,
+            }
+        elif isinstance(event, StatusEvent):
+            yield event.tunnel_id, {event.field: event.value}
+
+
+class TelemetryCore:
+    """Everything the panel keeps about the tunnels, without any Qt dependency.
+
+    Builds the state model, the in-memory history and the on-disk historian
+    from the same config.yaml sections the GUI uses, and feeds them from an
+    IngestPipeline. The GUI uses it for the stores; the headless service
+    (headless.py) also applies the events with ``apply_events``.
+    """
+
+    def __init__(self, config, num_tunnels=None):
+        self.num_tunnels = num_tunnels if num_tunnels is not None else tunnel_count(config)
+        self.state_model = TunnelStateModel(self.num_tunnels)
+
+        # Fixed-size in-memory history of every frame, filled on the ingest thread
+        history_config = config.get('history', {})
+        self.history = HistoryStore(history_config.get('capacity', 24 * 3600), range(1, self.num_tunnels + 1),
+                                    history_config.get('max_mb', 512) * 2 ** 20)
+
+        # Persistent record of every frame (audit trail), written in batches on its own thread
+        historian_config = config.get('historian', {})
+        self.historian = None
+        if historian_config.get('enabled', True):
+            self.historian = Historian(historian_config.get('path', 'historian.db'),
+                                       historian_config.get('batch_size', 1000),
+                                       historian_config.get('flush_interval', 1.0),
+                                       historian_config.get('rollups', True),
+                                       historian_config.get('max_backlog_rows', 100000),
+                                       historian_config.get('sample_period', 1.0))
+
+        # Latest state of every tunnel on disk, shown (as stale) at the next start until the PLC reports
+        snapshot_config = config.get('snapshot', {})
+        self.snapshot = None
+        if snapshot_config.get('enabled', True):
+            self.snapshot = StateSnapshot(snapshot_config.get('path', 'state_snapshot.npy'),
+                                          snapshot_config.get('interval', 10.0))
+
+    def attach(self, ingest):
+        """Start the historian and register the stores as sinks of an IngestPipeline"""
+        ingest.add_sink(self.history.append_records)
+        if self.historian is not None:
+            self.historian.start()
+            ingest.add_sink(self.historian.append_records)
+
+    def apply_events(self, events):
+        """Apply decoded events to the state model; returns the number of tunnels changed"""
+        changed = 0
+        for tunnel_id, fields in event_updates(events):
+            if 1 <= tunnel_id <= self.num_tunnels:
+                changed += self.state_model.update(tunnel_id, **fields)
+        return changed
+
+    def restore_snapshot(self):
+        """Load the last saved state into the model; returns the number of tunnels restored"""
+        if self.snapshot is None:
+            return 0
+        return self.snapshot.restore(self.state_model)
+
+    def save_snapshot(self):
+        """Save the state model if it changed since the last save"""
+        if self.snapshot is not None:
+            self.snapshot.save(self.state_model)
+
+    def close(self):
+        """Write the frames still queued for the historian"""
+        if self.historian is not None:
+            self.historian.stop()
+
+    def stats(self):
+        stats = {'model': self.state_model.stats(), 'history_bytes': self.history.memory_bytes()}
+        if self.historian is not None:
+            stats['historian'] = self.historian.stats()
+        if self.snapshot is not None:
+            stats['snapshot'] = self.snapshot.stats()
+        return stats
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+
+from telemetry_codec import (TelemetryEvent, SetpointEvent, TemperatureEvent, StatusEvent,
+                             decode_message, defrost_mask)
+
+
+class IngestPipeline:
+    """Decodes incoming MQTT payloads on a dedicated worker thread.
+
+    The paho network thread only enqueues the raw payload bytes; the worker
+    decodes each message exactly once into typed events (see telemetry_codec)
+    and posts them to a LatestWinsMailbox:
+
+    - telemetry, temperatures and setpoints are keyed per tunnel, so only the
+      newest value of each is kept while the GUI is busy;
+    - running/defrost transitions are posted as ordered StatusEvents and are
+      never dropped, even if the frame that carried them is superseded.
+
+    ``notify`` is called only when the mailbox goes from empty to non-empty,
+    so at most one notification is ever queued to the GUI thread.
+
+    Sinks (history, historian, ...) receive every telemetry frame on the
+    worker thread, before the mailbox drops anything.
+
+    The raw queue in front of the worker holds at most ``max_queue`` payloads:
+    when a burst outruns the decoder, the oldest queued telemetry frame is
+    dropped (counted in ``raw_dropped``), so the backlog stays bounded like
+    the mailbox behind it. Setpoint echoes and JSON messages are only dropped
+    when the queue holds nothing else. A dropped frame never reaches the sinks,
+    and a status that flips and flips back within the dropped frames is not
+    reported.
+    """
+
+    def __init__(self, mailbox, notify, max_queue=1000):
+        """
+        Args:
+            mailbox (LatestWinsMailbox): Destination of the decoded events
+            notify (callable): Called from the worker thread when new events are pending
+            max_queue (int): Raw payloads waiting for the worker at most
+        """
+        self.mailbox = mailbox
+        self.notify = notify
+        self.max_queue = max_queue
+        self.queue = deque()  # (payload, is telemetry) waiting for the worker
+        self.queued_telemetry = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.raw_dropped = 0
+        self.thread = None
+        self.status = {}  # tunnel_id -> (running, defrosting) last seen by the worker
+        self.sinks = []
+        self.decoded_count = 0
+        self.error_count = 0
+
+    def start(self):
+        """Start the worker thread (no-op if already running)"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the worker thread after the queued messages are processed"""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        self.stopping = False
+
+    def add_sink(self, sink):
+        """Register sink(records, timestamp), called on the worker thread for every telemetry frame"""
+        self.sinks.append(sink)
+
+    def submit(self, payload):
+        """Queue a raw payload for decoding (safe to call from any thread)"""
+        telemetry = _is_telemetry(payload)
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                self._drop_oldest()
+            self.queue.append((payload, telemetry))
+            self.queued_telemetry += telemetry
+            self.condition.notify()
+
+    def stats(self):
+        """Raw queue depth plus mailbox depth/drop counters"""
+        stats = self.mailbox.stats()
+        stats.update({
+            'raw_queue': len(self.queue),
+            'raw_dropped': self.raw_dropped,
+            'decoded': self.decoded_count,
+            'errors': self.error_count,
+        })
+        return stats
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopping:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                payload, telemetry = self.queue.popleft()
+                self.queued_telemetry -= telemetry
+            self.process(payload)
+
+    def _drop_oldest(self):
+        """Drop the oldest queued telemetry frame, or the oldest payload if there is none"""
+        index = 0
+        if self.queued_telemetry:
+            index = next(i for i, (_, telemetry) in enumerate(self.queue) if telemetry)
+        _, telemetry = self.queue[index]
+        del self.queue[index]
+        self.queued_telemetry -= telemetry
+        self.raw_dropped += 1
+
+    def process(self, payload):
+        """Decode one payload, feed the sinks and post the events, on the calling thread.
+
+        The worker thread runs this for every queued payload; the single-threaded
+        asyncio transport (mqtt_async) calls it directly instead of ``submit``.
+        """
+        try:
+            events, malformed = decode_message(payload)
+        except ValueError as e:
+            self._report(f"Error decoding MQTT message {payload[:64]!r}: {e}")
+            return
+        if malformed:
+            self._report(f"Error parsing tunnel data in groups: {malformed}")
+        if events:
+            self.decoded_count += 1
+            self._feed_sinks(events, time.time())
+            self.post(events)
+
+    def _feed_sinks(self, events, timestamp):
+        for event in events:
+            if not isinstance(event, TelemetryEvent):
+                continue
+            for sink in self.sinks:
+                try:
+                    sink(event.records, timestamp)
+                except Exception as e:
+                    self._report(f"Error in telemetry sink {sink!r}: {e}")
+
+    def post(self, events):
+        """Post decoded events to the mailbox and notify the consumer if needed"""
+        wake = False
+        for event in events:
+            if isinstance(event, TelemetryEvent):
+                wake |= self._post_telemetry(event.records)
+            elif isinstance(event, SetpointEvent):
+                wake |= self.mailbox.put(('setpoint', event.kind, event.tunnel_id), event)
+            elif isinstance(event, TemperatureEvent):
+                wake |= self.mailbox.put(('temperature', event.tunnel_id), event)
+            else:
+                wake |= self.mailbox.put_ordered(event)
+        if wake:
+            self.notify()
+
+    def _post_telemetry(self, records):
+        wake = False
+        defrosting = defrost_mask(records).tolist()
+        for i, (tunnel_id, running) in enumerate(zip(records['tunnel_id'].tolist(), records['pid'].tolist())):
+            status = (running, defrosting[i])
+            previous = self.status.get(tunnel_id)
+            if previous != status:
+                self.status[tunnel_id] = status
+                if previous is not None:
+                    # Status edge: deliver it even if this frame gets superseded
+                    if previous[0] != running:
+                        wake |= self.mailbox.put_ordered(StatusEvent(tunnel_id, 'running', running))
+                    if previous[1] != defrosting[i]:
+                        wake |= self.mailbox.put_ordered(StatusEvent(tunnel_id, 'defrosting', defrosting[i]))
+            wake |= self.mailbox.put(('telemetry', tunnel_id), TelemetryEvent(records[i:i + 1]))
+        return wake
+
+    def _report(self, error_msg):
+        self.error_count += 1
+        print(error_msg)
+
+
+def _is_telemetry(payload):
+    """Tell telemetry frames from JSON messages and setpoint echoes by their first byte (see decode_message)"""
+    return not payload.startswith((b'{', b'S', b'F'))
@@ -1,172 +1,182 @@
 import sys
+import time
+from functools import partial
 import yaml
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout,
                              QPushButton, QLabel, QDoubleSpinBox, QVBoxLayout,
                              QHBoxLayout, QFrame, QTabWidget, QMessageBox,
-                             QLineEdit, QFormLayout, QStackedWidget)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QPalette, QColor
-import qtawesome as qta
+                             QLineEdit, QFormLayout, QStackedWidget, QSpacerItem, QSizePolicy)
+from PyQt5.QtCore import Qt, QTimer, QEvent, QRect, QRectF, QPointF
+from PyQt5.QtGui import QFont, QColor, QPainter, QStaticText, QTransform
 from mqtt_client import MQTTClient
-from setpoint_window import SetpointWindow
-# Add this import at the top of the file with the other imports
-from calibration_window import CalibrationWindow
+from mqtt_async import create_transport, create_qt_event_loop
+from refresh_scheduler import RefreshScheduler
+from hmi_core import TelemetryCore, event_updates, DEFAULT_TUNNEL_COUNT
+from ui_cache import icon, styles, format_cache_stats
+from theme import apply_theme
+from overview_view import TunnelOverview
+from tunnel_state import DISPLAY_DECIMALS
+from command_tracker import HELD, CANCELLED, QUEUED, PENDING, CONFIRMED, format_command_stats
+from reconnect import format_reconnect_stats
+
+# Connection status label, formatted once per variant through the shared style cache
+CONNECTION_STATUS_STYLE = """
+            QLabel {{
+                color: {color};
+                font-weight: bold;
+                padding: 8px;
+                border-radius: 4px;
+                background-color: {background};
+            }}
+        """
+
+
+def set_status_property(label, active, name='active'):
+    """Switch a status label between its stylesheet variants and re-polish it"""
+    if label.property(name) == active:
+        return
+    label.setProperty(name, active)
+    label.style().unpolish(label)
+    label.style().polish(label)
+
 
 class TunnelWidget(QFrame):
-    def __init__(self, tunnel_id, mqtt_client, parent=None):
+    def __init__(self, tunnel_id, mqtt_client, state_model=None, parent=None, defer_icons=False):
         super().__init__(parent)
         self.tunnel_id = tunnel_id
         self.mqtt_client = mqtt_client
+        self.state_model = state_model
         self.running = False
         self.defrosting = False
+        self.last_command = None
         self.setup_ui()
         self.connect_signals()
+        # Loading the icon fonts is slow: at startup the first page is shown without icons
+        if not defer_icons:
+            self.load_icons()
         
         # Ensure MQTT client is properly initialized
         if not hasattr(self.mqtt_client, 'client'):
             self.mqtt_client = MQTTClient()
-            self.mqtt_client.temperature_updated.connect(self.update_temperature)
-            self.mqtt_client.defrost_status_updated.connect(self.update_defrost_status)
-            self.mqtt_client.tunnel_status_updated.connect(self.update_running_status)
             self.mqtt_client.connection_status.connect(self.handle_connection_status)
             self.mqtt_client.connect()
 
     def toggle_running(self):
         """Toggle the running state of the tunnel"""
+        previous = self.mode_payload()
         self.running = not self.running
         
         # Update button text and icon
         if self.running:
             self.start_button.setText("Iniciar")
-            self.start_button.setIcon(qta.icon('fa5s.play'))
+            self.start_button.setIcon(icon('fa5s.play'))
             self.start_button.setEnabled(False)
             self.stop_button.setText("Detener")
-            self.stop_button.setIcon(qta.icon('fa5s.stop'))
+            self.stop_button.setIcon(icon('fa5s.stop'))
             self.stop_button.setEnabled(True)
             self.running_status.setText("Estado: Encendido")
         else:
             self.start_button.setText("Iniciar")
-            self.start_button.setIcon(qta.icon('fa5s.play'))
+            self.start_button.setIcon(icon('fa5s.play'))
             self.start_button.setEnabled(True)
             self.stop_button.setText("Detener")
-            self.stop_button.setIcon(qta.icon('fa5s.stop'))
+            self.stop_button.setIcon(icon('fa5s.stop'))
             self.stop_button.setEnabled(False)
             self.running_status.setText("Estado: Apagado")
+        self.invalidate_state('running')
         
         # Send command to MQTT
         command_type = 'start' if self.running else 'stop'
-        self.mqtt_client.send_command(self.tunnel_id, command_type)
+        self.show_command(self.mqtt_client.send_command(self.tunnel_id, command_type, previous=previous))
 
     def toggle_defrost(self):
         """Toggle the defrost state of the tunnel"""
+        previous = self.mode_payload()
         self.defrosting = not self.defrosting
         
         # Update button text and icon
         if self.defrosting:
             self.defrost_button.setText("Descongelar ON")
-            self.defrost_button.setIcon(qta.icon('fa5s.snowflake'))
+            self.defrost_button.setIcon(icon('fa5s.snowflake'))
             self.defrost_status.setText("Descongelamiento: Encendido")
             # Format tunnel number as two digits (XX) and set the command to XX,1,0 format for ON
             message = f"{self.tunnel_id:02d},1,0"
         else:
             self.defrost_button.setText("Descongelar OFF")
-            self.defrost_button.setIcon(qta.icon('fa5s.snowflake'))
+            self.defrost_button.setIcon(icon('fa5s.snowflake'))
             self.defrost_status.setText("Descongelamiento: Apagado")
             # Format tunnel number as two digits (XX) and set the command to XX,0,0 format for OFF
             message = f"{self.tunnel_id:02d},0,0"
         
         # Update button state
         self.defrost_button.setChecked(self.defrosting)
+        self.invalidate_state('defrosting')
         
-        # Send command to MQTT
+        # Send command to MQTT; a double tap within the coalescing window sends nothing
         command_type = 'defrost'
-        self.mqtt_client.send_command(self.tunnel_id, command_type, message)
+        self.show_command(self.mqtt_client.send_command(self.tunnel_id, command_type, message, previous))
+
+    def show_command(self, command):
+        """Follow a command just sent: pending until the broker acknowledges it"""
+        self.last_command = command
+        if command:
+            self.update_command_status(command)
+        else:
+            self.command_status.setText("Comando: sin conexión")
+            set_status_property(self.command_status, 'failed', 'command')
+
+    def update_command_status(self, command):
+        """Show the acknowledgement state of the last command sent from this tunnel
+
+        Args:
+            command (TrackedCommand): Command whose state changed; older commands are ignored
+        """
+        if command is not self.last_command:
+            return
+        if command.state == CONFIRMED:
+            text = f"Comando: confirmado ({command.latency * 1000:.0f} ms)"
+        elif command.state == PENDING:
+            text = "Comando: pendiente" if command.attempts == 1 else f"Comando: reintento {command.attempts - 1}"
+        elif command.state == QUEUED:
+            text = "Comando: en cola (sin conexión)"
+        elif command.state == HELD:
+            text = "Comando: en espera"
+        elif command.state == CANCELLED:
+            text = "Comando: sin cambios (no enviado)"
+        elif command.attempts == 0:
+            text = "Comando: sin conexión"
+        else:
+            text = "Comando: sin confirmación"
+        self.command_status.setText(text)
+        set_status_property(self.command_status, command.state, 'command')
+
+    def mode_payload(self):
+        """XX,fan,pid value the tunnel has now (start, stop and defrost all write it): as the
+        PLC last reported it, or as the buttons left it while the model waits for the PLC"""
+        running, defrosting = self.running, self.defrosting
+        if self.state_model is not None:
+            state = self.state_model[self.tunnel_id]
+            running = state.get('running', running)
+            defrosting = state.get('defrosting', defrosting)
+        fan, pid = (1, 1) if running else (1, 0) if defrosting else (0, 0)
+        return f"{self.tunnel_id:02d},{fan},{pid}"
+
+    def invalidate_state(self, *fields):
+        """A label was changed locally: make sure the next PLC value is shown again"""
+        if self.state_model is not None:
+            self.state_model.invalidate(self.tunnel_id, *fields)
+
+    @property
+    def num_tunnels(self):
+        """Number of tunnels of the site, for the setpoint and calibration windows"""
+        return len(self.state_model) if self.state_model is not None else DEFAULT_TUNNEL_COUNT
 
     def setup_ui(self):
         self.setFrameStyle(QFrame.Box | QFrame.Raised)
         self.setAutoFillBackground(True)
         
-        # Set widget style
-        self.setStyleSheet('''
-TunnelWidget {
-    background-color: #ffffff;
-    border-radius: 20px;
-    padding: 20px;
-    box-shadow: 0 3px 6px rgba(0, 0, 0, 0.05);
-}
-QPushButton {
-    background-color: #4caf50;
-    border: none;
-    border-radius: 12px;
-    padding: 12px 25px;
-    color: white;
-    font-weight: 600;
-    min-width: 180px;
-    margin: 10px;
-    font-size: 14px;
-    text-transform: uppercase;
-    letter-spacing: 0.4px;
-    transition: all 0.2s ease;
-}
-QPushButton:hover {
-    background-color: #43a047;
-    transform: translateY(-1px);
-}
-QPushButton:disabled {
-    background-color: #a5d6a7;
-    color: rgba(255, 255, 255, 0.7);
-}
-QPushButton:checked {
-    background-color: #388e3c;
-}
-QPushButton#defrostButton {
-    background-color: #81c784;
-}
-QPushButton#defrostButton:checked {
-    background-color: #7cb342;
-}
-QLabel {
-    padding: 10px;
-    font-size: 18px;
-    color: #212121;
-    font-weight: 600;
-    margin: 8px;
-}
-QLabel[temperature="true"] {
-    font-size: 38px;
-    font-weight: bold;
-    color: #388e3c;
-    margin: 12px 0;
-    min-width: 140px;
-    min-height: 55px;
-}
-QDoubleSpinBox {
-    border: none;
-    border-radius: 10px;
-    padding: 12px;
-    font-size: 16px;
-    background-color: #ffffff;
-    color: #212121;
-    min-width: 180px;
-    box-shadow: inset 0 1px 2px rgba(0, 0, 0, 0.05);
-}
-QDoubleSpinBox:hover {
-    box-shadow: inset 0 1px 2px rgba(0, 0, 0, 0.1);
-}
-QDoubleSpinBox:focus {
-    box-shadow: inset 0 1px 2px rgba(0, 0, 0, 0.15);
-}
-QFrame {
-    border: none;
-    border-radius: 15px;
-    background-color: #ffffff;
-    padding: 20px;
-    margin: 15px;
-}
-QFrame:hover {
-    box-shadow: 0 2px 6px rgba(0, 0, 0, 0.05);
-}
-''')
+        # Styling comes from the application stylesheet (theme.APP_STYLESHEET):
+        # children are matched by object name, status colors by dynamic property
 
         # Create main layout
         layout = QVBoxLayout()
@@ -176,7 +186,7 @@ QFrame:hover {
         # Title
         title = QLabel(f"Túnel {self.tunnel_id}")
         title.setFont(QFont('Arial', 100, QFont.Bold))
-        title.setStyleSheet('font-size: 60px; font-weight: bold;')
+        title.setObjectName("tunnelTitle")
         title.setAlignment(Qt.AlignCenter)
         layout.addWidget(title)
         layout.addSpacing(2)
@@ -190,33 +200,13 @@ QFrame:hover {
         # Tunnel setpoint label
         self.tunnel_setpoint_label = QLabel("Túnel: --.-°C")
         self.tunnel_setpoint_label.setAlignment(Qt.AlignCenter)
-        self.tunnel_setpoint_label.setStyleSheet("""
-            QLabel {
-                color: #1B5E20;
-                font-size: 16px;
-                font-weight: bold;
-                background-color: #E8F5E9;
-                border-radius: 8px;
-                padding: 8px 12px;
-                margin: 5px;
-            }
-        """)
+        self.tunnel_setpoint_label.setObjectName("tunnelSetpoint")
         setpoint_layout.addWidget(self.tunnel_setpoint_label)
         
         # Fruit setpoint label
         self.fruit_setpoint_label = QLabel("Fruta: --.-°C")
         self.fruit_setpoint_label.setAlignment(Qt.AlignCenter)
-        self.fruit_setpoint_label.setStyleSheet("""
-            QLabel {
-                color: #6A1B9A;
-                font-size: 16px;
-                font-weight: bold;
-                background-color: #F3E5F5;
-                border-radius: 8px;
-                padding: 8px 12px;
-                margin: 5px;
-            }
-        """)
+        self.fruit_setpoint_label.setObjectName("fruitSetpoint")
         setpoint_layout.addWidget(self.fruit_setpoint_label)
         
         layout.addWidget(setpoint_container)
@@ -244,30 +234,16 @@ QFrame:hover {
         
         # Running status
         self.running_status = QLabel("Estado: Apagado")
-        self.running_status.setStyleSheet('''
-            color: #d32f2f;
-            font-weight: bold;
-            padding: 12px;
-            border-radius: 8px;
-            background-color: #ffebee;
-            font-size: 16px;
-            margin: 5px;
-        ''')
+        self.running_status.setObjectName("runningStatus")
+        self.running_status.setProperty("active", False)
         self.running_status.setFixedHeight(50)
         self.running_status.setAlignment(Qt.AlignCenter)
         status_layout.addWidget(self.running_status)
         
         # Defrost status
         self.defrost_status = QLabel("Descongelamiento: Inactivo")
-        self.defrost_status.setStyleSheet('''
-            color: #d32f2f;
-            font-weight: bold;
-            padding: 12px;
-            border-radius: 8px;
-            background-color: #ffebee;
-            font-size: 16px;
-            margin: 5px;
-        ''')
+        self.defrost_status.setObjectName("defrostStatus")
+        self.defrost_status.setProperty("active", False)
         self.defrost_status.setFixedHeight(50)
         self.defrost_status.setAlignment(Qt.AlignCenter)
         status_layout.addWidget(self.defrost_status)
@@ -285,26 +261,12 @@ QFrame:hover {
         output_layout.setAlignment(Qt.AlignVCenter)
         
         output_label = QLabel("T. Salida:")
-        output_label.setStyleSheet('''
-            color: #388e3c;
-            font-weight: bold;
-            font-size: 18px;
-            padding: 0px 6px;
-            min-height: 40px;
-            align-self: center;
-        ''')
+        output_label.setObjectName("outputName")
         output_layout.addWidget(output_label)
         
         self.temp_output = QLabel("--.-°C")
         self.temp_output.setProperty("temperature", "true")
-        self.temp_output.setStyleSheet('''
-            font-size: 32px;
-            font-weight: bold;
-            color: #388e3c;
-            padding: 0px 8px;
-            min-width: 110px;
-            min-height: 40px;
-        ''')
+        self.temp_output.setObjectName("outputTemp")
         output_layout.addWidget(self.temp_output)
         
         # External Temperature
@@ -314,26 +276,12 @@ QFrame:hover {
         external_layout.setAlignment(Qt.AlignVCenter)
         
         external_label = QLabel("T. Externa:")
-        external_label.setStyleSheet('''
-            color: #7cb342;
-            font-weight: bold;
-            font-size: 18px;
-            padding: 0px 6px;
-            min-height: 40px;
-            align-self: center;
-        ''')
+        external_label.setObjectName("externalName")
         external_layout.addWidget(external_label)
         
         self.temp_external = QLabel("--.-°C")
         self.temp_external.setProperty("temperature", "true")
-        self.temp_external.setStyleSheet('''
-            font-size: 32px;
-            font-weight: bold;
-            color: #7cb342;
-            padding: 0px 8px;
-            min-width: 110px;
-            min-height: 40px;
-        ''')
+        self.temp_external.setObjectName("externalTemp")
         external_layout.addWidget(self.temp_external)
         
         # Internal Temperature
@@ -343,26 +291,12 @@ QFrame:hover {
         internal_layout.setAlignment(Qt.AlignVCenter)
         
         internal_label = QLabel("T. Interna:")
-        internal_label.setStyleSheet('''
-            color: #43a047;
-            font-weight: bold;
-            font-size: 18px;
-            padding: 0px 6px;
-            min-height: 40px;
-            align-self: center;
-        ''')
+        internal_label.setObjectName("internalName")
         internal_layout.addWidget(internal_label)
         
         self.temp_internal = QLabel("--.-°C")
         self.temp_internal.setProperty("temperature", "true")
-        self.temp_internal.setStyleSheet('''
-            font-size: 32px;
-            font-weight: bold;
-            color: #43a047;
-            padding: 0px 8px;
-            min-width: 110px;
-            min-height: 40px;
-        ''')
+        self.temp_internal.setObjectName("internalTemp")
         internal_layout.addWidget(self.temp_internal)
         
         temp_grid.addLayout(output_layout, 0, 0)
@@ -370,30 +304,17 @@ QFrame:hover {
         temp_grid.addLayout(internal_layout, 2, 0)
         layout.addLayout(temp_grid)
         
+        self.create_buttons(layout)
+        
+        self.setLayout(layout)
+
+    def create_buttons(self, layout):
+        """Add the setpoint and control buttons to the tunnel layout"""
         # Setpoint Button
-        setpoint_button = QPushButton(qta.icon('fa5s.cog', color='#4caf50'), "Configurar Setpoint")
-        setpoint_button.setStyleSheet("""
-            QPushButton {
-                background-color: #e8f5e9;
-                border: none;
-                border-radius: 10px;
-                padding: 12px 24px;
-                color: #212121;
-                font-weight: 600;
-                min-width: 180px;
-                font-size: 16px;
-                transition: all 0.2s ease;
-            }
-            QPushButton:hover {
-                background-color: #c8e6c9;
-            }
-            QPushButton:pressed {
-                background-color: #4caf50;
-                color: white;
-            }
-        """)
-        setpoint_button.clicked.connect(lambda: self.open_setpoint_window(self.tunnel_id))
-        layout.addWidget(setpoint_button)
+        self.setpoint_button = QPushButton("Configurar Setpoint")
+        self.setpoint_button.setObjectName("setpointButton")
+        self.setpoint_button.clicked.connect(lambda: self.open_setpoint_window(self.tunnel_id))
+        layout.addWidget(self.setpoint_button)
         
         # Control Buttons
         button_layout = QVBoxLayout()
@@ -402,14 +323,14 @@ QFrame:hover {
         button_layout.setAlignment(Qt.AlignCenter)
         
         # Start Button
-        self.start_button = QPushButton(qta.icon('fa5s.play'), "Iniciar")
+        self.start_button = QPushButton("Iniciar")
         self.start_button.setObjectName("startButton")
         self.start_button.setFixedHeight(70)
         self.start_button.setFixedWidth(200)
         button_layout.addWidget(self.start_button)
         
         # Stop Button
-        self.stop_button = QPushButton(qta.icon('fa5s.stop'), "Detener")
+        self.stop_button = QPushButton("Detener")
         self.stop_button.setObjectName("stopButton")
         self.stop_button.setFixedHeight(70)
         self.stop_button.setFixedWidth(200)
@@ -417,16 +338,34 @@ QFrame:hover {
         button_layout.addWidget(self.stop_button)
         
         # Defrost Button
-        self.defrost_button = QPushButton(qta.icon('fa5s.snowflake'), "Descongelar OFF")
+        self.defrost_button = QPushButton("Descongelar OFF")
         self.defrost_button.setObjectName("defrostButton")
         self.defrost_button.setFixedHeight(70)
         self.defrost_button.setFixedWidth(200)
         button_layout.addWidget(self.defrost_button)
         
         layout.addLayout(button_layout)
-        
-        self.setLayout(layout)
+
+        # Age of the values restored at startup, hidden once the PLC reports
+        self.stale_status = QLabel("")
+        self.stale_status.setObjectName("staleStatus")
+        self.stale_status.setAlignment(Qt.AlignCenter)
+        self.stale_status.setVisible(False)
+        layout.addWidget(self.stale_status)
+
+        # Acknowledgement of the last command sent (pending / confirmed / failed)
+        self.command_status = QLabel("")
+        self.command_status.setObjectName("commandStatus")
+        self.command_status.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.command_status)
     
+    def load_icons(self):
+        """Set the button icons (loads the qtawesome fonts on first use)"""
+        self.setpoint_button.setIcon(icon('fa5s.cog', color='#4caf50'))
+        self.start_button.setIcon(icon('fa5s.play'))
+        self.stop_button.setIcon(icon('fa5s.stop'))
+        self.defrost_button.setIcon(icon('fa5s.snowflake'))
+
     def connect_signals(self):
         # Connect signals only once
         self.start_button.clicked.connect(self.toggle_running)
@@ -437,7 +376,7 @@ QFrame:hover {
         """Start the tunnel operation"""
         self.running = True
         self.start_button.setText("Detener")
-        self.start_button.setIcon(qta.icon('fa5s.stop'))
+        self.start_button.setIcon(icon('fa5s.stop'))
         self.running_status.setText("Estado: Encendido")
         self.start_button.setChecked(True)
         
@@ -449,7 +388,7 @@ QFrame:hover {
         """Stop the tunnel operation"""
         self.running = False
         self.start_button.setText("Iniciar")
-        self.start_button.setIcon(qta.icon('fa5s.play'))
+        self.start_button.setIcon(icon('fa5s.play'))
         self.running_status.setText("Estado: Apagado")
         self.start_button.setChecked(False)
         
@@ -470,8 +409,9 @@ QFrame:hover {
                 self.setpoint_window.close()
                 self.setpoint_window = None
             
-            # Create and show new setpoint window
-            self.setpoint_window = SetpointWindow(self.mqtt_client)
+            # Create and show new setpoint window (imported on first use to keep startup short)
+            from setpoint_window import SetpointWindow
+            self.setpoint_window = SetpointWindow(self.mqtt_client, self.num_tunnels)
             self.setpoint_window.showFullScreen()
             
             # Connect signals for cleanup
@@ -491,8 +431,9 @@ QFrame:hover {
                 self.calibration_window.close()
                 self.calibration_window = None
             
-            # Create and show new calibration window
-            self.calibration_window = CalibrationWindow(self.mqtt_client)
+            # Create and show new calibration window (imported on first use to keep startup short)
+            from calibration_window import CalibrationWindow
+            self.calibration_window = CalibrationWindow(self.mqtt_client, self.num_tunnels)
             self.calibration_window.showFullScreen()
             
             # Connect signals for cleanup
@@ -512,33 +453,13 @@ QFrame:hover {
 
     def update_running_status(self, is_running):
         status_text = "Estado: Encendido" if is_running else "Estado: Apagado"
-        status_color = "#2e7d32" if is_running else "#d32f2f"
-        status_bg = "#e8f5e9" if is_running else "#ffebee"
         self.running_status.setText(status_text)
-        self.running_status.setStyleSheet(f"""
-            color: {status_color}; 
-            font-weight: bold; 
-            padding: 12px; 
-            background: {status_bg}; 
-            border-radius: 8px; 
-            font-size: 16px;
-            margin: 5px;
-        """)
+        set_status_property(self.running_status, bool(is_running))
 
     def update_defrost_status(self, is_defrosting):
         status_text = "Descongelamiento: Activo" if is_defrosting else "Descongelamiento: Inactivo"
-        status_color = "#1565c0" if is_defrosting else "#d32f2f"
-        status_bg = "#e3f2fd" if is_defrosting else "#ffebee"
         self.defrost_status.setText(status_text)
-        self.defrost_status.setStyleSheet(f"""
-            color: {status_color}; 
-            font-weight: bold; 
-            padding: 12px; 
-            background: {status_bg}; 
-            border-radius: 8px; 
-            font-size: 16px;
-            margin: 5px;
-        """)
+        set_status_property(self.defrost_status, bool(is_defrosting))
 
     def update_tunnel_setpoint(self, setpoint_value):
         """Update the tunnel setpoint display"""
@@ -548,10 +469,255 @@ QFrame:hover {
         """Update the fruit setpoint display"""
         self.fruit_setpoint_label.setText(f"Fruta: {setpoint_value:.2f}°C")
 
+    def apply_state(self, state, fields):
+        """Refresh only the labels whose displayed value changed
+
+        Args:
+            state (TunnelState): Latest values of this tunnel
+            fields (set): Names of the fields that changed since the last refresh
+        """
+        if 'output_temp' in fields:
+            self.temp_output.setText(f"{state.output_temp:.1f}°C")
+        if 'external_temp' in fields:
+            self.temp_external.setText(f"{state.external_temp:.1f}°C")
+        if 'internal_temp' in fields:
+            self.temp_internal.setText(f"{state.internal_temp:.1f}°C")
+        if 'tunnel_setpoint' in fields:
+            self.update_tunnel_setpoint(state.tunnel_setpoint)
+        if 'fruit_setpoint' in fields:
+            self.update_fruit_setpoint(state.fruit_setpoint)
+        if 'running' in fields:
+            self.update_running_status(state.running)
+        if 'defrosting' in fields:
+            self.update_defrost_status(state.defrosting)
+        if 'stale' in fields:
+            self.update_stale_status(state.stale, state.last_seen)
+
+    def update_stale_status(self, stale, last_seen):
+        """Grey out values restored from the snapshot and say when they were received"""
+        for label in (self.temp_output, self.temp_external, self.temp_internal,
+                      self.tunnel_setpoint_label, self.fruit_setpoint_label):
+            set_status_property(label, stale, 'stale')
+        self.update_stale_label(stale, last_seen)
+
+    def update_stale_label(self, stale, last_seen):
+        self.stale_status.setText(f"Último dato: {time.strftime('%d/%m %H:%M', time.localtime(last_seen))}"
+                                  if stale else "")
+        self.stale_status.setVisible(stale)
+
+class PaintedText:
+    """A line of text painted by a TunnelTile: the text()/setText() part of QLabel, without a widget"""
+
+    __slots__ = ('tile', 'static_text', 'rect')
+
+    def __init__(self, tile, text):
+        self.tile = tile
+        self.static_text = QStaticText(text)
+        self.static_text.setTextFormat(Qt.PlainText)
+        self.rect = QRect()
+
+    def text(self):
+        return self.static_text.text()
+
+    def setText(self, text):
+        """Change the text and repaint only its area of the tile"""
+        if text == self.static_text.text():
+            return
+        self.static_text.setText(text)
+        self.tile.update(self.rect)
+
+
+# Painted part of a TunnelTile at the reference width, top to bottom:
+# (item, height, gap after it); the values follow the TunnelWidget stylesheet
+TILE_ROWS = (
+    ('title', 100, 6),
+    ('setpoints', 40, 10),
+    ('running_status', 50, 8),
+    ('defrost_status', 50, 12),
+    ('output', 56, 0),
+    ('external', 56, 0),
+    ('internal', 56, 0),
+)
+TILE_REFERENCE_WIDTH = 300
+# Font pixel size and weight of each kind of text at the reference width
+TILE_FONTS = {
+    'title': (60, QFont.Bold),
+    'pill': (16, QFont.Bold),
+    'name': (18, QFont.Bold),
+    'temperature': (32, QFont.Bold),
+}
+# (text color, background or None) of each painted text, created once
+TILE_COLORS = {
+    'title': (QColor('#212121'), None),
+    'tunnel_setpoint': (QColor('#1B5E20'), QColor('#E8F5E9')),
+    'fruit_setpoint': (QColor('#6A1B9A'), QColor('#F3E5F5')),
+    'status_off': (QColor('#d32f2f'), QColor('#ffebee')),
+    'running_on': (QColor('#2e7d32'), QColor('#e8f5e9')),
+    'defrost_on': (QColor('#1565c0'), QColor('#e3f2fd')),
+    'output': (QColor('#388e3c'), None),
+    'external': (QColor('#7cb342'), None),
+    'internal': (QColor('#43a047'), None),
+    # Values restored from the state snapshot, until the PLC reports
+    'stale': (QColor('#9e9e9e'), None),
+    'stale_pill': (QColor('#757575'), QColor('#f5f5f5')),
+}
+
+
+class TunnelTile(TunnelWidget):
+    """Lightweight TunnelWidget that paints its read-only values itself.
+
+    Title, setpoints, status and temperatures are drawn in a single
+    paintEvent from cached QStaticText and fonts instead of a dozen QLabels
+    in nested layouts; only the four buttons are real widgets. A value
+    change repaints the area of that value and never triggers a layout pass.
+    Behaviour (commands, setpoint and calibration windows) is TunnelWidget's.
+    """
+
+    def setup_ui(self):
+        self.setFrameStyle(QFrame.Box | QFrame.Raised)
+        self.setAutoFillBackground(True)
+
+        # Same names as the TunnelWidget labels, so the inherited methods update them
+        self.title = PaintedText(self, f"Túnel {self.tunnel_id}")
+        self.tunnel_setpoint_label = PaintedText(self, "Túnel: --.-°C")
+        self.fruit_setpoint_label = PaintedText(self, "Fruta: --.-°C")
+        self.running_status = PaintedText(self, "Estado: Apagado")
+        self.defrost_status = PaintedText(self, "Descongelamiento: Inactivo")
+        self.output_name = PaintedText(self, "T. Salida:")
+        self.temp_output = PaintedText(self, "--.-°C")
+        self.external_name = PaintedText(self, "T. Externa:")
+        self.temp_external = PaintedText(self, "--.-°C")
+        self.internal_name = PaintedText(self, "T. Interna:")
+        self.temp_internal = PaintedText(self, "--.-°C")
+        self.running_active = False
+        self.defrost_active = False
+        self.stale = False
+        self.fonts = {}
+        self.scale = None
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(3)
+        layout.setContentsMargins(10, 10, 10, 10)
+        # Room for the painted values above the buttons, resized with the tile
+        self.painted_area = QSpacerItem(0, sum(height + gap for _, height, gap in TILE_ROWS),
+                                        QSizePolicy.Minimum, QSizePolicy.Fixed)
+        layout.addItem(self.painted_area)
+        self.create_buttons(layout)
+
+    def painted_items(self):
+        """(text, font, color key) of every painted text"""
+        stale = self.stale
+        return (
+            (self.title, 'title', 'title'),
+            (self.tunnel_setpoint_label, 'pill', 'stale_pill' if stale else 'tunnel_setpoint'),
+            (self.fruit_setpoint_label, 'pill', 'stale_pill' if stale else 'fruit_setpoint'),
+            (self.running_status, 'pill', 'running_on' if self.running_active else 'status_off'),
+            (self.defrost_status, 'pill', 'defrost_on' if self.defrost_active else 'status_off'),
+            (self.output_name, 'name', 'output'),
+            (self.temp_output, 'temperature', 'stale' if stale else 'output'),
+            (self.external_name, 'name', 'external'),
+            (self.temp_external, 'temperature', 'stale' if stale else 'external'),
+            (self.internal_name, 'name', 'internal'),
+            (self.temp_internal, 'temperature', 'stale' if stale else 'internal'),
+        )
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.layout_painted_items()
+
+    def layout_painted_items(self):
+        """Place the painted texts for the current width; fonts are rebuilt only when the scale changes"""
+        # Inside the frame (stylesheet margin and padding) and the layout margins
+        area = self.contentsRect().marginsRemoved(self.layout().contentsMargins())
+        scale = min(1.0, max(0.5, area.width() / TILE_REFERENCE_WIDTH))
+        if scale != self.scale:
+            self.scale = scale
+            for name, (pixel_size, weight) in TILE_FONTS.items():
+                font = QFont('Arial')
+                font.setPixelSize(round(pixel_size * scale))
+                font.setWeight(weight)
+                self.fonts[name] = font
+            for text, font_name, _ in self.painted_items():
+                text.static_text.prepare(QTransform(), self.fonts[font_name])
+            self.painted_area.changeSize(0, round(sum(height + gap for _, height, gap in TILE_ROWS) * scale),
+                                         QSizePolicy.Minimum, QSizePolicy.Fixed)
+            self.layout().invalidate()
+
+        inset = round(5 * scale)
+        left, width = area.left() + inset, area.width() - 2 * inset
+        y = area.top()
+        gap = round(10 * scale)
+        rows = {}
+        for name, height, after in TILE_ROWS:
+            rows[name] = QRect(left, y, width, round(height * scale))
+            y += round((height + after) * scale)
+        self.title.rect = rows['title']
+        half = (width - gap) // 2
+        self.tunnel_setpoint_label.rect = QRect(left, rows['setpoints'].y(), half, rows['setpoints'].height())
+        self.fruit_setpoint_label.rect = QRect(left + half + gap, rows['setpoints'].y(), half, rows['setpoints'].height())
+        self.running_status.rect = rows['running_status']
+        self.defrost_status.rect = rows['defrost_status']
+        name_width = width * 9 // 20
+        for name, value, row in ((self.output_name, self.temp_output, rows['output']),
+                                 (self.external_name, self.temp_external, rows['external']),
+                                 (self.internal_name, self.temp_internal, rows['internal'])):
+            name.rect = QRect(row.x(), row.y(), name_width, row.height())
+            value.rect = QRect(row.x() + name_width, row.y(), row.width() - name_width, row.height())
+
+    def paintEvent(self, event):
+        # Frame and background from the application stylesheet
+        super().paintEvent(event)
+        if self.scale is None:
+            self.layout_painted_items()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        area = event.rect()
+        radius = 8 * self.scale
+        for text, font_name, color_key in self.painted_items():
+            if not area.intersects(text.rect):
+                continue
+            color, background = TILE_COLORS[color_key]
+            if background is not None:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(background)
+                painter.drawRoundedRect(QRectF(text.rect).adjusted(2, 2, -2, -2), radius, radius)
+            painter.setPen(color)
+            painter.setFont(self.fonts[font_name])
+            size = text.static_text.size()
+            painter.drawStaticText(QPointF(text.rect.center().x() - size.width() / 2,
+                                           text.rect.center().y() - size.height() / 2),
+                                   text.static_text)
+
+    def update_running_status(self, is_running):
+        self.running_active = bool(is_running)
+        self.running_status.setText("Estado: Encendido" if is_running else "Estado: Apagado")
+        self.update(self.running_status.rect)
+
+    def update_defrost_status(self, is_defrosting):
+        self.defrost_active = bool(is_defrosting)
+        self.defrost_status.setText("Descongelamiento: Activo" if is_defrosting else "Descongelamiento: Inactivo")
+        self.update(self.defrost_status.rect)
+
+    def update_stale_status(self, stale, last_seen):
+        if stale != self.stale:
+            self.stale = stale
+            self.update()
+        self.update_stale_label(stale, last_seen)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, event_loop=None):
+        """
+        Args:
+            event_loop (asyncio.AbstractEventLoop): asyncio loop running on the Qt event loop, needed by
+                mqtt.transport: asyncio (see mqtt_async.create_qt_event_loop)
+        """
         super().__init__()
         self.setWindowTitle("Control de Túneles de Enfriamiento")
+        # Changed fields of tunnels whose widget is hidden (other carousel page, other tab,
+        # minimized window), applied in one pass when the widget is shown again
+        self.pending_states = {}
+        self.deferred_updates = 0
         
         # Cross-platform fullscreen handling
         if sys.platform.startswith('linux'):
@@ -573,22 +739,71 @@ class MainWindow(QMainWindow):
             self.showFullScreen()
         
         # Initialize MQTT client with configuration
-        self.mqtt_client = MQTTClient()
+        self.mqtt_client = None
         try:
             with open('config.yaml', 'r') as f:
                 config = yaml.safe_load(f)
+                mqtt_config = config['mqtt']
+                if (mqtt_config.get('transport') == 'asyncio' and event_loop is None
+                        and not mqtt_config.get('embedded_broker')):
+                    print("qasync is not installed: using the threaded MQTT transport")
+                    mqtt_config = dict(mqtt_config, transport='thread')
+                # Only the selected transport is created: threaded paho, paho driven from the
+                # Qt/asyncio loop, or a broker in this process reached without TCP (embedded_broker)
+                self.mqtt_client = MQTTClient(create_transport(mqtt_config, event_loop))
                 self.mqtt_client.configure(config['mqtt'])
-            self.mqtt_client.temperature_updated.connect(self.update_temperature)
-            self.mqtt_client.defrost_status_updated.connect(self.update_defrost_status)
-            self.mqtt_client.tunnel_status_updated.connect(self.update_running_status)
+            self.config = config
+
+            # State model, in-memory history and historian, fed from the ingest thread
+            # Number of tunnels from config.yaml (tunnels: count)
+            self.core = TelemetryCore(config)
+            self.core.attach(self.mqtt_client.ingest)
+            self.num_tunnels = self.core.num_tunnels
+            self.state_model = self.core.state_model
+            self.history = self.core.history
+
+            # Coalesce PLC bursts into at most refresh_hz widget refreshes per second
+            ui_config = config.get('ui', {})
+            self.refresh_scheduler = RefreshScheduler(self.state_model, self.apply_tunnel_state,
+                                                      ui_config.get('refresh_hz', 5), self)
+
+            # Warm start: last saved values, shown as stale until the PLC sends live ones
+            restored = self.core.restore_snapshot()
+            if restored:
+                print(f"Restored {restored} tunnels from {self.core.snapshot.path} "
+                      f"({self.core.snapshot.restore_time * 1000:.1f} ms)")
+            if self.core.snapshot is not None:
+                self.snapshot_timer = QTimer(self)
+                self.snapshot_timer.timeout.connect(self.core.save_snapshot)
+                self.snapshot_timer.start(int(self.core.snapshot.interval * 1000))
+            if self.core.historian is not None:
+                # Write failures of the historian are shown in the status bar (it retries by itself)
+                self.historian_timer = QTimer(self)
+                self.historian_timer.timeout.connect(self.update_historian_status)
+                self.historian_timer.start(2000)
+
             self.mqtt_client.connection_status.connect(self.handle_connection_status)
             
-            # Connect the message_received signal to our handler
-            self.mqtt_client.message_received.connect(self.on_mqtt_message)
+            # Decoded events are collected from the ingest mailbox when it signals (queued connection)
+            self.mqtt_client.events_pending.connect(self.on_events_pending)
+            # Acknowledgements of the tunnel commands, routed to the widget that sent them
+            self.mqtt_client.command_status.connect(self.on_command_status)
             
             # Configuration authentication
             self.is_config_authenticated = False
             self.config_access_code = self.mqtt_client.config.get('access_code', 'migiva')
+
+            # Lazy startup: connect first, build only the visible carousel page now
+            # and the rest (other pages, trends, icons) once the window is painted
+            self.lazy_startup = ui_config.get('lazy_startup', True)
+            # Carousel pages built ahead of time; on large sites the others are built when first shown
+            self.prebuild_pages = ui_config.get('prebuild_pages', 4)
+            # Painted tiles (few widgets, no layout pass per value) instead of the label-based tunnel widgets
+            self.tunnel_class = TunnelTile if ui_config.get('painted_tiles', False) else TunnelWidget
+            self.icons_loaded = False
+            self.deferred_steps = []
+            if self.lazy_startup:
+                self.mqtt_client.connect()
             
             # Configurar la UI dependiendo de la plataforma
             if sys.platform.startswith('linux'):
@@ -608,25 +823,31 @@ class MainWindow(QMainWindow):
                 # En Windows seguimos con el comportamiento normal
                 self.setup_ui()
             
-            # Start connection after UI is set up
-            self.mqtt_client.connect()
+            if self.lazy_startup:
+                self.deferred_steps = [self.load_icons]
+                self.deferred_steps += [partial(self.build_tunnel_group, group)
+                                        for group in range(1, min(len(self.tunnel_groups), self.prebuild_pages))]
+                self.deferred_steps.append(self.build_trends_view)
+                QTimer.singleShot(0, self.run_deferred_step)
+            else:
+                # Start connection after UI is set up
+                self.mqtt_client.connect()
         except Exception as e:
+            if self.mqtt_client is None:
+                # No usable configuration: an unconnected threaded client keeps the window working
+                self.mqtt_client = MQTTClient()
             QMessageBox.critical(self, "Error", f"Error al inicializar el cliente MQTT: {str(e)}")
 
-    def handle_connection_status(self, is_connected):
-        """Handle MQTT connection status changes"""
-        status_text = "Conectado" if is_connected else "Desconectado"
-        status_color = "#4caf50" if is_connected else "#f44336"
-        self.connection_status.setText(f"Estado MQTT: {status_text}")
-        self.connection_status.setStyleSheet(f"""
-            QLabel {{
-                color: {status_color};
-                font-weight: bold;
-                padding: 8px;
-                border-radius: 4px;
-                background-color: rgba(76, 175, 80, 0.1);
-            }}
-        """)
+    def closeEvent(self, event):
+        """Stop ingesting and write the frames still queued for the historian"""
+        self.mqtt_client.disconnect()
+        if hasattr(self, 'core'):
+            self.core.save_snapshot()
+            self.core.close()
+        print(format_cache_stats())
+        print(format_command_stats(self.mqtt_client.command_stats()))
+        print(format_reconnect_stats(self.mqtt_client.reconnect_stats()))
+        super().closeEvent(event)
 
     def setup_ui(self, parent_widget=None):
         # Create central widget and main layout
@@ -636,8 +857,10 @@ class MainWindow(QMainWindow):
         if not parent_widget:
             self.setCentralWidget(central_widget)
         
-        # Create main layout
-        main_layout = QVBoxLayout(central_widget)
+        # Create main layout (on Linux the central widget already has one with the reduced margins)
+        main_layout = central_widget.layout()
+        if main_layout is None:
+            main_layout = QVBoxLayout(central_widget)
         
         # Create status bar
         status_bar = QHBoxLayout()
@@ -645,20 +868,20 @@ class MainWindow(QMainWindow):
         
         # Connection status label
         self.connection_status = QLabel("Estado MQTT: Desconectado")
-        self.connection_status.setStyleSheet("""
-            QLabel {
-                color: #f44336;
-                font-weight: bold;
-                padding: 8px;
-                border-radius: 4px;
-                background-color: rgba(244, 67, 54, 0.1);
-            }
-        """)
+        styles.apply(self.connection_status, styles.get(CONNECTION_STATUS_STYLE, color="#f44336",
+                                                        background="rgba(244, 67, 54, 0.1)"))
         status_bar.addWidget(self.connection_status)
+
+        # Historian write errors, hidden while the historian is writing normally
+        self.historian_status = QLabel()
+        styles.apply(self.historian_status, styles.get(CONNECTION_STATUS_STYLE, color="#f44336",
+                                                       background="rgba(244, 67, 54, 0.1)"))
+        self.historian_status.hide()
+        status_bar.addWidget(self.historian_status)
         
         # Add calibration button
-        calibration_button = QPushButton(qta.icon('fa5s.sliders-h'), "Calibración")
-        calibration_button.setStyleSheet("""
+        self.calibration_button = QPushButton("Calibración")
+        self.calibration_button.setStyleSheet("""
             QPushButton {
                 background-color: #2196f3;
                 color: white;
@@ -671,9 +894,9 @@ class MainWindow(QMainWindow):
                 background-color: #1e88e5;
             }
         """)
-        calibration_button.clicked.connect(self.open_calibration_window)
+        self.calibration_button.clicked.connect(self.open_calibration_window)
         status_bar.addStretch()  # Add stretch to push connection status to the left and calibration button to the right
-        status_bar.addWidget(calibration_button)
+        status_bar.addWidget(self.calibration_button)
         
         # Add status bar to main layout
         main_layout.addLayout(status_bar)
@@ -699,8 +922,9 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(carousel_layout)
         
         # Crear botones de navegación
-        prev_button = QPushButton(qta.icon('fa5s.chevron-left'), "")
-        next_button = QPushButton(qta.icon('fa5s.chevron-right'), "")
+        prev_button = QPushButton("")
+        next_button = QPushButton("")
+        self.nav_buttons = (prev_button, next_button)
         
         # Ajustar tamaño solo en Linux
         if sys.platform.startswith('linux'):
@@ -722,9 +946,11 @@ class MainWindow(QMainWindow):
         
         carousel_layout.addWidget(next_button)
         
-        # Create tunnel widgets in groups of 3
-        self.tunnel_widgets = []
-        num_groups = (12 + 2) // 3  # Ceiling division to get number of groups
+        # Create tunnel widgets in groups of 3; with lazy startup only the first
+        # group is built now, the other pages are filled by run_deferred_step
+        self.tunnel_widgets = {}
+        self.tunnel_groups = []
+        num_groups = (self.num_tunnels + 2) // 3  # Ceiling division to get number of groups
         
         for group in range(num_groups):
             group_widget = QWidget()
@@ -737,36 +963,13 @@ class MainWindow(QMainWindow):
             else:
                 group_layout.setSpacing(15)  # Espaciado normal para Windows
             
-            # Add 3 tunnels to this group
-            for i in range(3):
-                tunnel_index = group * 3 + i
-                if tunnel_index < 12:  # Only create valid tunnel widgets
-                    tunnel_widget = TunnelWidget(tunnel_index + 1, self.mqtt_client)
-                    
-                    # En Linux, establecer tamaños fijos para la pantalla de 21cm x 16cm
-                    if sys.platform.startswith('linux'):
-                        # Tamaños fijos optimizados para pantalla pequeña
-                        tunnel_widget.setFixedWidth(220)  # Ancho fijo ajustado
-                        tunnel_widget.setFixedHeight(400)  # Alto fijo ajustado
-                        
-                        # Ajustar tamaños de fuente y botones para Linux
-                        for child in tunnel_widget.findChildren(QPushButton):
-                            child.setFixedHeight(40)  # Altura reducida para botones
-                            child.setFont(QFont('Arial', 8))  # Fuente más pequeña
-                            
-                        for child in tunnel_widget.findChildren(QLabel):
-                            font = child.font()
-                            font.setPointSize(8)  # Fuente más pequeña para etiquetas
-                            child.setFont(font)
-                    else:
-                        tunnel_widget.setMinimumWidth(300)  # Ancho mínimo normal para Windows
-                        tunnel_widget.setMinimumHeight(700)  # Altura mínima normal para Windows
-                        
-                    group_layout.addWidget(tunnel_widget)
-                    self.tunnel_widgets.append(tunnel_widget)
-            
             # Agregar el grupo de túneles al stack
             self.tunnel_stack.addWidget(group_widget)
+            self.tunnel_groups.append(group_widget)
+            if group == 0 or (not self.lazy_startup and group < self.prebuild_pages):
+                self.build_tunnel_group(group)
+        # A page reached before run_deferred_step got to it is built on demand
+        self.tunnel_stack.currentChanged.connect(self.on_page_changed)
         # Connect navigation buttons
         prev_button.clicked.connect(lambda: self.tunnel_stack.setCurrentIndex(
             (self.tunnel_stack.currentIndex() - 1) % self.tunnel_stack.count()))
@@ -776,7 +979,20 @@ class MainWindow(QMainWindow):
         # Add carousel to monitoring tab
         grid_layout.addLayout(carousel_layout, 0, 0, 1, 1)
         
-        tab_widget.addTab(monitoring_tab, "Monitoreo")
+        self.monitoring_tab_index = tab_widget.addTab(monitoring_tab, "Monitoreo")
+
+        # Overview of every tunnel (model/view: only the rows on screen are painted)
+        self.overview = TunnelOverview(self.state_model)
+        self.overview.activated.connect(self.show_tunnel)
+        tab_widget.addTab(self.overview, "Resumen")
+
+        # Trends tab (only redraws while visible); pyqtgraph is imported when it is built
+        self.trends_view = None
+        self.trends_tab_index = tab_widget.addTab(QWidget(), "Tendencias")
+        self.tab_widget = tab_widget
+        tab_widget.currentChanged.connect(self.on_tab_changed)
+        if not self.lazy_startup:
+            self.build_trends_view()
         
         # Configuration tab
         config_tab = QWidget()
@@ -834,40 +1050,183 @@ class MainWindow(QMainWindow):
         
         # Add tabs to main layout
         main_layout.addWidget(tab_widget)
-    
+
+        if not self.lazy_startup:
+            self.load_icons()
+
+    def build_tunnel_group(self, group):
+        """Create the tunnel widgets of a carousel page (no-op if already built)"""
+        group_widget = self.tunnel_groups[group]
+        group_layout = group_widget.layout()
+        if group_layout.count():
+            return
+        for i in range(3):
+            tunnel_index = group * 3 + i
+            if tunnel_index < self.num_tunnels:  # Only create valid tunnel widgets
+                tunnel_widget = self.tunnel_class(tunnel_index + 1, self.mqtt_client, self.state_model,
+                                                defer_icons=not self.icons_loaded)
+                
+                # En Linux, establecer tamaños fijos para la pantalla de 21cm x 16cm
+                if sys.platform.startswith('linux'):
+                    # Tamaños fijos optimizados para pantalla pequeña
+                    tunnel_widget.setFixedWidth(220)  # Ancho fijo ajustado
+                    tunnel_widget.setFixedHeight(400)  # Alto fijo ajustado
+                    
+                    # Ajustar tamaños de fuente y botones para Linux
+                    for child in tunnel_widget.findChildren(QPushButton):
+                        child.setFixedHeight(40)  # Altura reducida para botones
+                        child.setFont(QFont('Arial', 8))  # Fuente más pequeña
+                        
+                    for child in tunnel_widget.findChildren(QLabel):
+                        font = child.font()
+                        font.setPointSize(8)  # Fuente más pequeña para etiquetas
+                        child.setFont(font)
+                else:
+                    tunnel_widget.setMinimumWidth(300)  # Ancho mínimo normal para Windows
+                    tunnel_widget.setMinimumHeight(700)  # Altura mínima normal para Windows
+                    
+                group_layout.addWidget(tunnel_widget)
+                self.tunnel_widgets[tunnel_index + 1] = tunnel_widget
+
+                # Show what was received before the widget existed
+                self.pending_states.pop(tunnel_index + 1, None)
+                state = self.state_model[tunnel_index + 1]
+                fields = {field for field in DISPLAY_DECIMALS if state.get(field) is not None}
+                if state.stale:
+                    fields.add('stale')
+                if fields:
+                    tunnel_widget.apply_state(state, fields)
+
+    def build_trends_view(self):
+        """Create the trends tab (no-op if already built)"""
+        if self.trends_view is not None:
+            return
+        from trends_view import TrendsView
+        self.trends_view = TrendsView(self.history, self.num_tunnels)
+        current = self.tab_widget.currentIndex()
+        self.tab_widget.blockSignals(True)
+        self.tab_widget.removeTab(self.trends_tab_index)
+        self.tab_widget.insertTab(self.trends_tab_index, self.trends_view, "Tendencias")
+        self.tab_widget.setCurrentIndex(current)
+        self.tab_widget.blockSignals(False)
+
+    def on_tab_changed(self, index):
+        if index == self.trends_tab_index:
+            self.build_trends_view()
+        self.apply_pending_states()
+
+    def on_page_changed(self, index):
+        self.build_tunnel_group(index)
+        self.apply_pending_states()
+
+    def load_icons(self):
+        """Set the icons of every built widget (loads the qtawesome fonts on first use)"""
+        self.icons_loaded = True
+        self.calibration_button.setIcon(icon('fa5s.sliders-h'))
+        self.nav_buttons[0].setIcon(icon('fa5s.chevron-left'))
+        self.nav_buttons[1].setIcon(icon('fa5s.chevron-right'))
+        for tunnel_widget in self.tunnel_widgets.values():
+            tunnel_widget.load_icons()
+
+    def run_deferred_step(self):
+        """Lazy startup: build the rest of the UI one step per event loop pass, after the first paint"""
+        if self.deferred_steps:
+            self.deferred_steps.pop(0)()
+        if self.deferred_steps:
+            QTimer.singleShot(0, self.run_deferred_step)
+
     def update_temperature(self, tunnel_id, output_temp, external_temp, internal_temp):
-        if 1 <= tunnel_id <= 12:
-            self.tunnel_widgets[tunnel_id - 1].update_temperature(output_temp, external_temp, internal_temp)
-    
+        if tunnel_id in self.state_model:
+            self.refresh_scheduler.submit(tunnel_id, output_temp=output_temp, external_temp=external_temp,
+                                          internal_temp=internal_temp)
+
     def update_defrost_status(self, tunnel_id, is_defrosting):
-        if 1 <= tunnel_id <= 12:
-            self.tunnel_widgets[tunnel_id - 1].update_defrost_status(is_defrosting)
+        if tunnel_id in self.state_model:
+            self.refresh_scheduler.submit(tunnel_id, defrosting=is_defrosting)
 
     def update_running_status(self, tunnel_id, is_running):
-        if 1 <= tunnel_id <= 12:
-            self.tunnel_widgets[tunnel_id - 1].update_running_status(is_running)
-    
+        if tunnel_id in self.state_model:
+            self.refresh_scheduler.submit(tunnel_id, running=is_running)
+
+    def apply_tunnel_state(self, tunnel_id, state, fields):
+        """Push the changed fields of a tunnel to its widget (called by the refresh scheduler)"""
+        tunnel_widget = self.tunnel_widgets.get(tunnel_id)
+        if tunnel_widget is not None:
+            if self.tunnel_visible(tunnel_widget):
+                tunnel_widget.apply_state(state, fields)
+            else:
+                # Off screen: only remember what changed; the state model already holds the values
+                self.pending_states.setdefault(tunnel_id, set()).update(fields)
+                self.deferred_updates += 1
+        self.overview.tunnel_changed(tunnel_id, fields)
+
+    def on_command_status(self, command):
+        """A tunnel command was acknowledged, retried or given up"""
+        tunnel_widget = self.tunnel_widgets.get(command.tunnel_id)
+        if tunnel_widget is not None:
+            tunnel_widget.update_command_status(command)
+
+    def tunnel_visible(self, tunnel_widget):
+        """True if the widget is on the current carousel page and tab of a window that is not minimized"""
+        return tunnel_widget.isVisible() and not self.isMinimized()
+
+    def apply_pending_states(self):
+        """Apply the changes recorded while tunnel widgets were hidden to the ones now visible"""
+        for tunnel_id in list(self.pending_states):
+            tunnel_widget = self.tunnel_widgets[tunnel_id]
+            if self.tunnel_visible(tunnel_widget):
+                tunnel_widget.apply_state(self.state_model[tunnel_id], self.pending_states.pop(tunnel_id))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.apply_pending_states()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange and not self.isMinimized():
+            self.apply_pending_states()
+
+    def show_tunnel(self, index):
+        """Show the carousel page of the tunnel activated in the overview"""
+        tunnel_id = self.overview.tunnel_at(index)
+        self.tunnel_stack.setCurrentIndex((tunnel_id - 1) // 3)
+        self.tab_widget.setCurrentIndex(self.monitoring_tab_index)
+
     def handle_connection_status(self, connected):
-        # Update connection status label
-        status_text = "Conectado" if connected else "Desconectado"
+        """Status bar indicator of the broker connection.
+
+        The transport reconnects by itself with no attempt limit and every
+        refused attempt reports the status again, so a lost connection is
+        shown here instead of in a (blocking, stacking) dialog.
+        """
+        if connected:
+            status_text = "Conectado"
+            self.connection_status.setToolTip("")
+        else:
+            status_text = "Reconectando..."
+            self.connection_status.setToolTip("Se perdió la conexión con el broker MQTT; "
+                                              "el panel se reconecta automáticamente.")
         status_color = "#4caf50" if connected else "#f44336"
         status_bg = "rgba(76, 175, 80, 0.1)" if connected else "rgba(244, 67, 54, 0.1)"
         self.connection_status.setText(f"Estado MQTT: {status_text}")
-        self.connection_status.setStyleSheet(f"""
-            QLabel {{
-                color: {status_color};
-                font-weight: bold;
-                padding: 8px;
-                border-radius: 4px;
-                background-color: {status_bg};
-            }}
-        """)
-        
-        # Show warning only when disconnected
-        if not connected:
-            QMessageBox.warning(self, "Error de Conexión",
-                              "Se perdió la conexión con el broker MQTT.\n"
-                              "Verifique la conexión y reinicie la aplicación.")
+        styles.apply(self.connection_status, styles.get(CONNECTION_STATUS_STYLE, color=status_color,
+                                                        background=status_bg))
+
+    def update_historian_status(self):
+        """Status bar indicator of historian rows waiting for a retry or discarded"""
+        stats = self.core.historian.stats()
+        if not stats['backlog_rows'] and not stats['rows_dropped']:
+            self.historian_status.hide()
+            return
+        text = "Historial: "
+        if stats['backlog_rows']:
+            text += f"error de escritura, {stats['backlog_rows']} filas pendientes"
+        if stats['rows_dropped']:
+            text += (", " if stats['backlog_rows'] else "") + f"{stats['rows_dropped']} filas descartadas"
+        self.historian_status.setText(text)
+        self.historian_status.setToolTip(f"Último error: {stats['last_error']}\n"
+                                         "Las filas pendientes se vuelven a escribir automáticamente.")
+        self.historian_status.show()
     
     def open_calibration_window(self):
         try:
@@ -876,8 +1235,9 @@ class MainWindow(QMainWindow):
                 self.calibration_window.close()
                 self.calibration_window = None
             
-            # Create and show new calibration window
-            self.calibration_window = CalibrationWindow(self.mqtt_client)
+            # Create and show new calibration window (imported on first use to keep startup short)
+            from calibration_window import CalibrationWindow
+            self.calibration_window = CalibrationWindow(self.mqtt_client, self.num_tunnels)
             self.calibration_window.showFullScreen()
             
             # Connect signals for cleanup
@@ -969,134 +1329,65 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Debe autenticarse primero para guardar la configuración")
             return
             
-        config = {
-            'mqtt': {
-                'broker': self.broker_input.text(),
-                'port': int(self.port_input.text()),
-                'access_code': self.access_code_input.text(),
-                'topics': {
-                    'send': self.send_topic_input.text(),
-                    'receive': self.receive_topic_input.text()
-                },
-                'messages': {
-                    'start': self.start_msg_input.text(),
-                    'stop': self.stop_msg_input.text()
-                }
+        # Keep the other sections (ui, ...) and any extra mqtt keys of the loaded configuration
+        config = dict(self.config)
+        config['mqtt'] = dict(self.config.get('mqtt', {}))
+        config['mqtt'].update({
+            'broker': self.broker_input.text(),
+            'port': int(self.port_input.text()),
+            'access_code': self.access_code_input.text(),
+            'topics': {
+                'send': self.send_topic_input.text(),
+                'receive': self.receive_topic_input.text()
+            },
+            'messages': {
+                'start': self.start_msg_input.text(),
+                'stop': self.stop_msg_input.text()
             }
-        }
+        })
         
         # Save to config file
         with open('config.yaml', 'w') as f:
             yaml.dump(config, f)
+        self.config = config
         
         # Update MQTT client configuration
         self.mqtt_client.configure(config['mqtt'])
         
         QMessageBox.information(self, "Configuración", "Configuración guardada exitosamente.")
         
-    def on_mqtt_message(self, topic, payload):
-        try:
-            # Check if this is a message from the A_ENVIAR topic
-            if topic == self.mqtt_client.config['topics']['receive']:
-                # Check if it's a setpoint message format (SXX,+/-XX.XX or FXX,+/-XX.XX)
-                if (payload.startswith("S") or payload.startswith("F")) and len(payload) >= 9:
-                    self.handle_setpoint_message(payload)
-                    return
-                
-                # Handle the new comma-separated values format
-                # Format: TXX,T.S,T.E,T.I,SP_Tunel,SP_Fruta,Estado_PID,Estado_Ventilador
-                values = payload.split(',')
-                
-                # Process values in groups of 8
-                for i in range(0, len(values), 8):
-                    if i + 7 < len(values):  # Ensure we have a complete set of 8 values
-                        try:
-                            # Extract tunnel identifier (TXX format)
-                            tunnel_identifier = values[i].strip()
-                            if tunnel_identifier.startswith('T') and len(tunnel_identifier) >= 3:
-                                tunnel_id = int(tunnel_identifier[1:])
-                                
-                                # Extract values
-                                output_temp = float(values[i+1])
-                                external_temp = float(values[i+2])
-                                internal_temp = float(values[i+3])
-                                tunnel_setpoint = float(values[i+4])
-                                fruit_setpoint = float(values[i+5])
-                                pid_status = values[i+6].strip().lower() in ('true', '1', 't', 'y', 'yes')
-                                fan_status = values[i+7].strip().lower() in ('true', '1', 't', 'y', 'yes')
-                                
-                                # Determine defrost status: PID off (0) and fan on (1)
-                                is_defrosting = not pid_status and fan_status
-                                
-                                # Update UI if tunnel_id is valid
-                                if 1 <= tunnel_id <= 12:
-                                    # Update temperatures
-                                    self.tunnel_widgets[tunnel_id-1].update_temperature(output_temp, external_temp, internal_temp)
-                                    
-                                    # Update setpoints
-                                    self.tunnel_widgets[tunnel_id-1].update_tunnel_setpoint(tunnel_setpoint)
-                                    self.tunnel_widgets[tunnel_id-1].update_fruit_setpoint(fruit_setpoint)
-                                    
-                                    # Update running status based on PID status
-                                    self.tunnel_widgets[tunnel_id-1].update_running_status(pid_status)
-                                    
-                                    # Update defrost status based on our logic
-                                    self.tunnel_widgets[tunnel_id-1].update_defrost_status(is_defrosting)
-                        except (ValueError, IndexError) as e:
-                            print(f"Error parsing tunnel data at index {i}: {e}")
-        
-        except Exception as e:
-            print(f"Error processing MQTT message: {e}")
-    
-    def handle_setpoint_message(self, payload):
-        """Handle legacy setpoint message format"""
-        try:
-            # Check if it's a tunnel setpoint message (format: SXX,+/-XX.XX)
-            if payload.startswith("S") and len(payload) >= 9:
-                tunnel_id = int(payload[1:3])
-                setpoint_str = payload[4:]
-                setpoint_value = float(setpoint_str)
-                if 1 <= tunnel_id <= 12:
-                    # Update the corresponding tunnel widget's setpoint label
-                    self.tunnel_widgets[tunnel_id-1].update_tunnel_setpoint(setpoint_value)
-            
-            # Check if it's a fruit setpoint message (format: FXX,+/-XX.XX)
-            elif payload.startswith("F") and len(payload) >= 9:
-                fruit_id = int(payload[1:3])
-                setpoint_str = payload[4:]
-                setpoint_value = float(setpoint_str)
-                if 1 <= fruit_id <= 12:
-                    # Update the corresponding tunnel widget's fruit setpoint label
-                    self.tunnel_widgets[fruit_id-1].update_fruit_setpoint(setpoint_value)
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing setpoint message: {e}")
+    def on_events_pending(self):
+        """Drain the ingest mailbox; anything superseded while we were busy was already dropped"""
+        self.on_mqtt_events(self.mqtt_client.take_events())
 
+    def on_mqtt_events(self, events):
+        """Apply the events decoded by the MQTT ingest thread"""
+        for tunnel_id, fields in event_updates(events):
+            # Buffer the new state; the refresh scheduler pushes it to the widget
+            if tunnel_id in self.state_model:
+                self.refresh_scheduler.submit(tunnel_id, **fields)
 
 def main():
     app = QApplication(sys.argv)
     
-    # Set application style
-    app.setStyle('Fusion')
+    # Fusion style, light palette with lime accents and the application stylesheet
+    apply_theme(app)
     
-    # Create light palette with lime accents
-    palette = QPalette()
-    palette.setColor(QPalette.Window, QColor(245, 245, 245))
-    palette.setColor(QPalette.WindowText, QColor(51, 51, 51))
-    palette.setColor(QPalette.Base, QColor(255, 255, 255))
-    palette.setColor(QPalette.AlternateBase, QColor(240, 240, 240))
-    palette.setColor(QPalette.ToolTipBase, QColor(255, 255, 255))
-    palette.setColor(QPalette.ToolTipText, QColor(51, 51, 51))
-    palette.setColor(QPalette.Text, QColor(51, 51, 51))
-    palette.setColor(QPalette.Button, QColor(154, 205, 50))
-    palette.setColor(QPalette.ButtonText, QColor(255, 255, 255))
-    palette.setColor(QPalette.BrightText, QColor(255, 0, 0))
-    palette.setColor(QPalette.Link, QColor(154, 205, 50))
-    palette.setColor(QPalette.Highlight, QColor(154, 205, 50))
-    palette.setColor(QPalette.HighlightedText, QColor(255, 255, 255))
-    app.setPalette(palette)
+    # mqtt.transport: asyncio runs the MQTT client on an asyncio loop on top of the Qt loop
+    event_loop = None
+    try:
+        with open('config.yaml', 'r') as f:
+            if (yaml.safe_load(f).get('mqtt') or {}).get('transport') == 'asyncio':
+                event_loop = create_qt_event_loop(app)
+    except (OSError, yaml.YAMLError):
+        pass  # MainWindow reports configuration errors
     
-    window = MainWindow()
+    window = MainWindow(event_loop)
     window.show()
+    if event_loop is not None:
+        with event_loop:
+            event_loop.run_forever()
+        sys.exit(0)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
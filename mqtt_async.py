@@ -0,0 +1,178 @@
+import asyncio
+import socket
+
+import paho.mqtt.client as mqtt
+from mqtt_transport import MQTTTransport, EmbeddedMQTTTransport
+from mqtt_broker import embedded_broker
+from reconnect import STOPPED
+
+
+class _PreconnectedClient(mqtt.Client):
+    """paho client that can be handed a TCP socket already connected by asyncio.
+
+    paho's connect() opens its socket with a blocking socket.create_connection;
+    when ``connected_socket`` is set it is used instead, so the only wait for
+    the broker is the awaited loop.sock_connect.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected_socket = None
+
+    def _create_socket_connection(self):
+        sock, self.connected_socket = self.connected_socket, None
+        return sock if sock is not None else super()._create_socket_connection()
+
+
+class AsyncMQTTTransport(MQTTTransport):
+    """MQTTTransport driven by an asyncio event loop, on a single thread.
+
+    paho's socket is watched with loop.add_reader/add_writer and serviced with
+    loop_read/loop_write when it is ready; loop_misc (keepalive pings, QoS
+    retries) runs every second from the loop. The TCP connect is awaited and
+    retries are call_later timers spaced by the reconnect policy, so nothing
+    ever blocks the loop.
+    Payloads are decoded inline (IngestPipeline.process): there is no paho
+    network thread, no ingest thread and no cross-thread queue, and
+    ``on_events_pending`` is called on the loop thread.
+
+    Under the GUI the loop is the Qt event loop itself (see
+    create_qt_event_loop), so the MQTTClient signals are direct calls.
+    Only a broker given as a host name is resolved on asyncio's default
+    executor.
+    """
+
+    def __init__(self, loop=None, connect_timeout=5.0):
+        """
+        Args:
+            loop (asyncio.AbstractEventLoop): Loop to run on; the current event loop when connect() is called if None
+            connect_timeout (float): Seconds to wait for the TCP connection before retrying
+        """
+        super().__init__()
+        self.loop = loop
+        self.connect_timeout = connect_timeout
+        self.connect_task = None
+        self.retry_handle = None
+        self.misc_handle = None
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def create_client(self):
+        return _PreconnectedClient()
+
+    def connect(self):
+        """Connect to MQTT broker on the event loop, retrying until disconnect()"""
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        self.reconnect_policy.start()
+        self._try_connect()
+
+    def _try_connect(self):
+        """Start a connection attempt (also used after a failure or an unexpected disconnection)"""
+        self.retry_handle = None
+        self.connect_task = self.loop.create_task(self._connect())
+
+    async def _connect(self):
+        host, port = self.config['broker'], self.config['port']
+        sock = None
+        self.reconnect_policy.attempt()
+        try:
+            print(f"Attempting to connect to MQTT broker at {host}:{port} (Attempt {self.reconnect_policy.attempts})")
+            family, socket_type, proto, _, address = (await self.loop.getaddrinfo(
+                host, port, type=socket.SOCK_STREAM))[0]
+            sock = socket.socket(family, socket_type, proto)
+            sock.setblocking(False)
+            await asyncio.wait_for(self.loop.sock_connect(sock, address), self.connect_timeout)
+            # paho takes over the connected socket and queues the CONNECT packet
+            self.client.connected_socket = sock
+            self.client.connect(host, port)
+        except (OSError, asyncio.TimeoutError) as e:
+            if sock is not None:
+                sock.close()
+            error_msg = f"Connection error: {e or 'timed out'}. Please verify broker address and port."
+            print(error_msg)
+            self.reconnect_policy.failed()
+            self._report_error(error_msg)
+            self._schedule_retry()
+
+    def _schedule_retry(self):
+        """Schedule the next attempt on the loop after the backoff delay"""
+        if self.reconnect_policy.state == STOPPED or self.retry_handle is not None:
+            return
+        delay = self.reconnect_policy.next_delay()
+        print(f"Reconnecting to MQTT broker in {delay:.1f} seconds")
+        self.retry_handle = self.loop.call_later(delay, self._try_connect)
+
+    def on_disconnect(self, client, userdata, rc):
+        super().on_disconnect(client, userdata, rc)
+        if rc != 0:
+            self._schedule_retry()
+
+    def disconnect(self):
+        """Cancel pending attempts and disconnect from MQTT broker"""
+        self.coalescer.flush_due(force=True)
+        self.reconnect_policy.stop()
+        for pending in (self.connect_task, self.retry_handle, self.misc_handle):
+            if pending is not None:
+                pending.cancel()
+        self.client.disconnect()
+        self.ingest.stop()
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc_handle = self.loop.call_later(1.0, self._loop_misc)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if self.misc_handle is not None:
+            self.misc_handle.cancel()
+            self.misc_handle = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    def _loop_misc(self):
+        """Keepalive and QoS retries, once per second while the socket is open"""
+        if self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            self.misc_handle = self.loop.call_later(1.0, self._loop_misc)
+
+    def on_message(self, client, userdata, msg):
+        """Decode messages from the PLC's ENVIAR topic (A_ENVIAR) right away, on the loop thread"""
+        if msg.topic == self.config['topics']['receive']:
+            self.ingest.process(msg.payload)
+
+
+def create_transport(config, loop=None):
+    """Transport selected by ``transport`` in the mqtt config: 'thread' (default) or 'asyncio'.
+
+    With ``embedded_broker`` set, a broker is started in this process on
+    broker:port and the transport talks to it directly (EmbeddedMQTTTransport,
+    callbacks on the publishers' threads as with 'thread'); ``transport`` is
+    then ignored.
+    """
+    if config.get('embedded_broker'):
+        return EmbeddedMQTTTransport(embedded_broker(config['broker'], config['port']))
+    if config.get('transport', 'thread') == 'asyncio':
+        return AsyncMQTTTransport(loop)
+    return MQTTTransport()
+
+
+def create_qt_event_loop(app):
+    """Install an asyncio event loop that runs on the Qt event loop (qasync).
+
+    Returns:
+        asyncio.AbstractEventLoop: The loop, or None if qasync is not installed
+    """
+    try:
+        import qasync
+    except ImportError:
+        return None
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    return loop
@@ -0,0 +1,501 @@
+"""Minimal MQTT 3.1.1 broker stand-in, to run the panel, the headless service and the PLC emulator on one machine:
+
+    python mqtt_broker.py [--host 127.0.0.1] [--port 1883]
+
+The broker can also run inside the panel or the headless service
+(``mqtt.embedded_broker`` in config.yaml, see ``embedded_broker``): clients in
+the same process then reach it through ``LocalClient`` instead of TCP.
+"""
+import argparse
+import asyncio
+import threading
+from collections import namedtuple
+
+# Packet types (high nibble of the first byte)
+CONNECT = 1
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+UNSUBSCRIBE = 10
+PINGREQ = 12
+DISCONNECT = 14
+
+# Result codes of LocalClient.publish, same values as paho's MQTT_ERR_*
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+# What LocalClient hands to on_message and returns from publish (the fields the panel reads from paho's)
+LocalMessage = namedtuple('LocalMessage', 'topic payload qos retain')
+PublishResult = namedtuple('PublishResult', 'rc mid')
+
+
+def encode_length(length):
+    """Remaining length field of the fixed header"""
+    encoded = bytearray()
+    while True:
+        length, digit = length // 128, length % 128
+        encoded.append(digit | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(text):
+    data = text.encode()
+    return len(data).to_bytes(2, 'big') + data
+
+
+def publish_packet(topic, payload, qos=0, packet_id=0, retain=False):
+    body = encode_string(topic) + (packet_id.to_bytes(2, 'big') if qos else b'') + payload
+    return bytes([PUBLISH << 4 | qos << 1 | retain]) + encode_length(len(body)) + body
+
+
+def topic_matches(topic_filter, topic):
+    """Whether a topic filter (with + and # wildcards) matches a topic name"""
+    if topic_filter == topic:
+        return True
+    filter_levels = topic_filter.split('/')
+    levels = topic.split('/')
+    # Wildcards in the first level do not match the broker's own $ topics
+    if topic.startswith('$') and filter_levels[0] in ('+', '#'):
+        return False
+    for position, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if position >= len(levels) or level not in ('+', levels[position]):
+            return False
+    return len(filter_levels) == len(levels)
+
+
+class _Subscriber:
+    """Subscriptions of one client, TCP (_Session) or in-process (LocalClient)"""
+
+    def __init__(self):
+        self.subscriptions = {}  # topic filter -> granted QoS
+        self.wildcards = []  # filters with + or #, matched level by level
+        self.next_packet_id = 0
+
+    def add_filter(self, topic_filter, qos):
+        self.subscriptions[topic_filter] = qos
+        self.wildcards = [f for f in self.subscriptions if '+' in f or '#' in f]
+
+    def remove_filter(self, topic_filter):
+        self.subscriptions.pop(topic_filter, None)
+        self.wildcards = [f for f in self.subscriptions if '+' in f or '#' in f]
+
+    def granted_qos(self, topic):
+        """Highest QoS among the filters matching a topic, or None if none does"""
+        granted = self.subscriptions.get(topic)
+        for topic_filter in self.wildcards:
+            if topic_matches(topic_filter, topic):
+                granted = max(granted or 0, self.subscriptions[topic_filter])
+        return granted
+
+    def packet_id(self):
+        self.next_packet_id = self.next_packet_id % 0xFFFF + 1
+        return self.next_packet_id
+
+
+class _Session(_Subscriber):
+    """One TCP client: its writer, its subscriptions and its outgoing packet ids"""
+
+    def __init__(self, broker, writer):
+        super().__init__()
+        self.broker = broker
+        self.writer = writer
+        self.handler = asyncio.current_task()
+
+    def deliver(self, topic, payload, qos, packet_id, retain):
+        packet = publish_packet(topic, payload, qos, packet_id, retain)
+        if threading.get_ident() == self.broker.loop_thread:
+            self.writer.write(packet)
+        else:
+            # Published by an in-process client on another thread
+            self.broker.loop.call_soon_threadsafe(self.writer.write, packet)
+
+
+class MQTTBroker:
+    """Routes publications between local clients (the panel, the PLC emulator, benchmarks).
+
+    A stand-in, not a production broker: QoS 0 and 1 publications are
+    acknowledged and delivered at the lower of their QoS and the subscriber's,
+    but deliveries are never retried and sessions are not kept across
+    connections. Topic filters may use the + and # wildcards, and the last
+    retained message of each topic is sent to new subscribers (an empty
+    retained message clears it). The broker runs on its own asyncio loop, in
+    a daemon thread (``start``) or in the caller's (``serve``).
+
+    Clients of the same process connect with ``LocalClient`` instead of TCP:
+    a publication is routed in the publisher's thread and handed to in-process
+    subscribers by a direct call, with no socket, packet or network thread in
+    between. Deliveries to TCP clients are written by the broker's loop.
+    """
+
+    def __init__(self, host='127.0.0.1', port=1883):
+        """
+        Args:
+            host (str): Address to listen on
+            port (int): TCP port; 0 picks a free one (see ``port`` after start); None accepts
+                in-process clients only
+        """
+        self.host = host
+        self.port = port
+        self.sessions = set()
+        self.retained = {}  # topic -> (payload, QoS)
+        # Sessions, subscriptions and retained messages are shared by the loop and in-process clients
+        self.lock = threading.Lock()
+        self.server = None
+        self.loop = None
+        self.loop_thread = None
+        self.thread = None
+        self.connection_count = 0
+        self.received_count = 0
+        self.delivered_count = 0
+
+    async def serve(self):
+        """Start listening on the running loop; returns once the port is bound"""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        if self.port is not None:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    def start(self):
+        """Run the broker on a daemon thread; returns once it accepts connections
+
+        Raises:
+            OSError: The port could not be bound
+        """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.serve())
+            except OSError as e:
+                errors.append(e)
+                loop.close()
+                return
+            finally:
+                ready.set()
+            loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name='mqtt-broker', daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            self.thread = None
+            raise errors[0]
+        return self
+
+    async def close(self):
+        """Close the listening socket and the client connections (on the broker's loop)"""
+        if self.server is not None:
+            self.server.close()
+        with self.lock:
+            sessions = [session for session in self.sessions if isinstance(session, _Session)]
+        for session in sessions:
+            session.writer.close()
+        # Each handler then ends on its read, like on a client disconnection
+        await asyncio.gather(*(session.handler for session in sessions), return_exceptions=True)
+
+    def stop(self):
+        """Stop a broker started with ``start``"""
+        if self.thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout=2.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2.0)
+
+    def attach(self, subscriber):
+        with self.lock:
+            self.sessions.add(subscriber)
+            self.connection_count += 1
+
+    def detach(self, subscriber):
+        with self.lock:
+            self.sessions.discard(subscriber)
+
+    def route(self, topic, payload, qos, retain=False):
+        """Deliver a publication to the matching subscribers (from the loop or an in-process client's thread)"""
+        with self.lock:
+            self.received_count += 1
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos)
+                else:
+                    self.retained.pop(topic, None)
+            deliveries = []
+            for subscriber in self.sessions:
+                granted = subscriber.granted_qos(topic)
+                if granted is None:
+                    continue
+                delivered_qos = min(qos, granted)
+                deliveries.append((subscriber, delivered_qos, subscriber.packet_id() if delivered_qos else 0))
+            self.delivered_count += len(deliveries)
+        # Outside the lock: an in-process subscriber may publish from its callback (the emulator's echoes)
+        for subscriber, delivered_qos, packet_id in deliveries:
+            subscriber.deliver(topic, payload, delivered_qos, packet_id, False)
+
+    def subscribe(self, subscriber, topic_filter, qos):
+        """Add a subscription
+
+        Returns:
+            tuple: (granted QoS, [(topic, payload, QoS, packet id)] retained messages to deliver after the SUBACK)
+        """
+        granted = min(qos, 1)
+        with self.lock:
+            subscriber.add_filter(topic_filter, granted)
+            retained = []
+            for topic, (payload, retained_qos) in self.retained.items():
+                if topic_matches(topic_filter, topic):
+                    delivered_qos = min(retained_qos, granted)
+                    retained.append((topic, payload, delivered_qos, subscriber.packet_id() if delivered_qos else 0))
+            self.delivered_count += len(retained)
+        return granted, retained
+
+    def unsubscribe(self, subscriber, topic_filter):
+        with self.lock:
+            subscriber.remove_filter(topic_filter)
+
+    async def _handle(self, reader, writer):
+        session = _Session(self, writer)
+        self.attach(session)
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length, shift = 0, 0
+                while True:
+                    digit = (await reader.readexactly(1))[0]
+                    length |= (digit & 0x7F) << shift
+                    shift += 7
+                    if not digit & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                kind = header >> 4
+                if kind == CONNECT:
+                    writer.write(b'\x20\x02\x00\x00')
+                elif kind == PUBLISH:
+                    self._publish(session, header, body)
+                elif kind == SUBSCRIBE:
+                    self._subscribe(session, body)
+                elif kind == UNSUBSCRIBE:
+                    writer.write(self._unsubscribe(session, body))
+                elif kind == PINGREQ:
+                    writer.write(b'\xd0\x00')
+                elif kind == DISCONNECT:
+                    break
+                # PUBACKs of the deliveries are not tracked
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.detach(session)
+            writer.close()
+
+    def _publish(self, session, header, body):
+        qos = (header >> 1) & 3
+        topic_length = int.from_bytes(body[:2], 'big')
+        topic = body[2:2 + topic_length].decode()
+        position = 2 + topic_length
+        if qos:
+            session.writer.write(bytes([PUBACK << 4, 2]) + body[position:position + 2])
+            position += 2
+        self.route(topic, body[position:], min(qos, 1), bool(header & 1))
+
+    def _subscribe(self, session, body):
+        granted = bytearray()
+        retained = []
+        position = 2
+        while position < len(body):
+            topic_length = int.from_bytes(body[position:position + 2], 'big')
+            topic_filter = body[position + 2:position + 2 + topic_length].decode()
+            qos, messages = self.subscribe(session, topic_filter, body[position + 2 + topic_length])
+            position += 3 + topic_length
+            granted.append(qos)
+            retained += messages
+        session.writer.write(b'\x90' + encode_length(2 + len(granted)) + body[:2] + bytes(granted))
+        for topic, payload, qos, packet_id in retained:
+            session.deliver(topic, payload, qos, packet_id, True)
+
+    def _unsubscribe(self, session, body):
+        position = 2
+        while position < len(body):
+            topic_length = int.from_bytes(body[position:position + 2], 'big')
+            self.unsubscribe(session, body[position + 2:position + 2 + topic_length].decode())
+            position += 2 + topic_length
+        return b'\xb0\x02' + body[:2]
+
+    def stats(self):
+        with self.lock:
+            return {'clients': len(self.sessions), 'connections': self.connection_count,
+                    'received': self.received_count, 'delivered': self.delivered_count,
+                    'retained': len(self.retained)}
+
+
+class LocalClient(_Subscriber):
+    """In-process client of an MQTTBroker with the part of paho's Client API the panel uses.
+
+    Nothing goes through a socket: ``publish`` routes the message in the
+    caller's thread, and the subscribers' ``on_message`` run there too (on the
+    broker's loop thread for messages from TCP clients), as paho's callbacks
+    run on its network thread. The acknowledgement is immediate: QoS 1
+    ``on_publish`` is called before ``publish`` returns. ``loop_start``
+    connects from the broker's loop thread, so that, as with paho,
+    ``on_connect`` never runs inside the caller. There is no network to lose,
+    so the connection only ends with ``disconnect``.
+    """
+
+    def __init__(self, broker, client_id=''):
+        """
+        Args:
+            broker (MQTTBroker): Broker of this process
+            client_id (str): Name used in error messages
+        """
+        super().__init__()
+        self.broker = broker
+        self.client_id = client_id
+        self.connected = False
+        self.next_mid = 0
+        self.mid_lock = threading.Lock()
+        self.on_connect = None
+        self.on_connect_fail = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_subscribe = None
+        self.on_publish = None
+
+    def _mid(self):
+        with self.mid_lock:
+            self.next_mid = self.next_mid % 0xFFFF + 1
+            return self.next_mid
+
+    def connect(self, host=None, port=None, keepalive=60):
+        """Attach to the broker; ``on_connect`` is called before this returns (host and port are ignored)"""
+        self.broker.attach(self)
+        self.connected = True
+        if self.on_connect is not None:
+            self.on_connect(self, None, {'session present': 0}, 0)
+        return MQTT_ERR_SUCCESS
+
+    def connect_async(self, host=None, port=None, keepalive=60):
+        """Nothing to resolve or dial: the connection is made by ``loop_start``"""
+
+    def loop_start(self):
+        if not self.connected:
+            self.broker.loop.call_soon_threadsafe(self.connect)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        if not self.connected:
+            return MQTT_ERR_NO_CONN
+        self.broker.detach(self)
+        self.connected = False
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, None, 0)
+        return MQTT_ERR_SUCCESS
+
+    def is_connected(self):
+        return self.connected
+
+    def socket(self):
+        """No socket (paho returns the TCP socket)"""
+        return None
+
+    def max_inflight_messages_set(self, inflight):
+        """Every publication is acknowledged before ``publish`` returns: nothing waits in flight"""
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """Route a message to the subscribers now
+
+        Returns:
+            PublishResult: rc MQTT_ERR_NO_CONN after ``disconnect`` (the message is dropped), and the mid
+        """
+        mid = self._mid()
+        if not self.connected:
+            return PublishResult(MQTT_ERR_NO_CONN, mid)
+        if payload is None:
+            payload = b''
+        elif not isinstance(payload, (bytes, bytearray)):
+            payload = str(payload).encode()
+        self.broker.route(topic, bytes(payload), min(qos, 1), retain)
+        if self.on_publish is not None:
+            self.on_publish(self, None, mid)
+        return PublishResult(MQTT_ERR_SUCCESS, mid)
+
+    def subscribe(self, topic, qos=0):
+        """Subscribe to a topic filter; retained messages follow ``on_subscribe``
+
+        Returns:
+            tuple: (MQTT_ERR_SUCCESS, mid), as paho
+        """
+        mid = self._mid()
+        granted, retained = self.broker.subscribe(self, topic, qos)
+        if self.on_subscribe is not None:
+            self.on_subscribe(self, None, mid, (granted,))
+        for message in retained:
+            self.deliver(*message, True)
+        return MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic):
+        self.broker.unsubscribe(self, topic)
+        return MQTT_ERR_SUCCESS, self._mid()
+
+    def deliver(self, topic, payload, qos, packet_id, retain):
+        if self.on_message is None:
+            return
+        try:
+            self.on_message(self, None, LocalMessage(topic, payload, qos, retain))
+        except Exception as e:
+            # Would otherwise surface in the publisher's thread
+            print(f"In-process MQTT client {self.client_id or id(self)}: error handling {topic}: {e}")
+
+
+_embedded_brokers = {}
+_embedded_lock = threading.Lock()
+
+
+def embedded_broker(host='127.0.0.1', port=1883):
+    """The broker of this process for host:port, started on first use.
+
+    It also listens on host:port so that other processes (the PLC emulator,
+    a second panel) can connect over TCP; if the port cannot be bound (e.g.
+    host is a remote broker's address) only in-process clients reach it.
+    """
+    with _embedded_lock:
+        broker = _embedded_brokers.get((host, port))
+        if broker is None:
+            broker = MQTTBroker(host, port)
+            try:
+                broker.start()
+                print(f"Embedded MQTT broker listening on {host}:{broker.port}")
+            except OSError as e:
+                print(f"Embedded MQTT broker: cannot listen on {host}:{port} ({e}); in-process clients only")
+                broker.port = None
+                broker.start()
+            _embedded_brokers[(host, port)] = broker
+        return broker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Broker MQTT mínimo para pruebas locales (panel y emulador de PLC)")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección de escucha")
+    parser.add_argument('--port', type=int, default=1883, help="Puerto TCP")
+    args = parser.parse_args(argv)
+
+    async def run():
+        broker = MQTTBroker(args.host, args.port)
+        await broker.serve()
+        print(f"MQTT broker stand-in listening on {args.host}:{broker.port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,246 +1,130 @@
-import paho.mqtt.client as mqtt
-import json
-from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from mqtt_transport import MQTTTransport
+from command_tracker import PENDING, HELD
 
 class MQTTClient(QObject):
-    temperature_updated = pyqtSignal(int, float, float, float)  # tunnel_id, output_temp, external_temp, internal_temp
-    defrost_status_updated = pyqtSignal(int, bool)  # tunnel_id, defrost_status
-    tunnel_status_updated = pyqtSignal(int, bool)  # tunnel_id, running_status
+    """Qt face of MQTTTransport: the transport callbacks become signals.
+
+    With the threaded transport, callbacks run on the paho or ingest threads;
+    emitting a signal from there delivers it to GUI-thread slots through a
+    queued connection. With the asyncio transport (mqtt_async) they already
+    run on the GUI thread and the slots are called directly.
+    """
+    events_pending = pyqtSignal()  # decoded events are waiting in self.mailbox (emitted from the ingest thread)
     connection_status = pyqtSignal(bool)  # connected status
     error_occurred = pyqtSignal(str)  # error message
-    message_received = pyqtSignal(str, str)  # Add this signal for raw messages
-    
-    def __init__(self):
+    command_status = pyqtSignal(object)  # TrackedCommand acknowledged, retried or failed
+    batch_finished = pyqtSignal(object)  # CommandBatch whose commands are all confirmed or failed
+
+    def __init__(self, transport=None):
+        """
+        Args:
+            transport (MQTTTransport): Transport to wrap; a threaded MQTTTransport if None
+        """
         super().__init__()
-        self.client = mqtt.Client()
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
-        self.client.on_disconnect = self.on_disconnect
-        self.client.on_subscribe = self.on_subscribe
-        self.client.on_publish = self.on_publish
-        self.reconnect_delay = 3  # seconds
-        self.max_retries = 10
-        self.retry_count = 0
-        self.connected = False
-        self.subscriptions = set()
-        self.pending_subscriptions = set()
-        # Default configuration
-        self.config = {
-            'broker': '172.25.2.52',
-            'port': 1883,
-            'topics': {
-                'send': 'A_RECIBIR',
-                'receive': 'A_ENVIAR'
-            },
-            'messages': {
-                'start': 'start',
-                'stop': 'stop'
-            }
-        }
-
-    def on_subscribe(self, client, userdata, mid, granted_qos):
-        """Callback when subscription is confirmed"""
-        print(f"Subscription confirmed with QoS: {granted_qos}")
-        # Add successfully subscribed topics to subscriptions set
-        for topic in self.pending_subscriptions.copy():
-            self.subscriptions.add(topic)
-            self.pending_subscriptions.remove(topic)
-    
+        self.transport = transport if transport is not None else MQTTTransport()
+        self.transport.on_events_pending = self.events_pending.emit
+        self.transport.on_connection_status = self.connection_status.emit
+        self.transport.on_error = self.error_occurred.emit
+        self.transport.on_command_status = self.command_status.emit
+        self.transport.on_batch_finished = self.batch_finished.emit
+        # Acknowledgement timeouts are checked on the GUI thread while commands are in flight
+        self.command_timer = QTimer(self)
+        self.command_timer.setInterval(250)
+        self.command_timer.timeout.connect(self.check_commands)
+        # Operator commands held by the transport's coalescer go out when their window closes
+        self.coalesce_timer = QTimer(self)
+        self.coalesce_timer.setSingleShot(True)
+        self.coalesce_timer.timeout.connect(self.flush_commands)
+        # Commands queued while offline are replayed from the network thread on connection
+        self.command_status.connect(self.watch_command)
+        # Shared with the transport (configure() updates the dict in place)
+        self.client = self.transport.client
+        self.config = self.transport.config
+        self.mailbox = self.transport.mailbox
+        self.ingest = self.transport.ingest
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    @property
+    def access_code(self):
+        return self.transport.access_code
+
     def configure(self, config):
         """Update MQTT configuration"""
-        self.config.update(config)
-        # Store access code for future use
-        self.access_code = config.get('access_code', 'migiva')
-    
+        self.transport.configure(config)
+
     def connect(self):
         """Connect to MQTT broker with retry mechanism"""
-        self.retry_count = 0
-        self._try_connect()
-
-    def _try_connect(self):
-        """Internal method to attempt connection with retry logic"""
-        if self.retry_count >= self.max_retries:
-            error_msg = "Maximum connection retries reached. Please check if the MQTT broker is running and accessible."
-            print(error_msg)
-            self.error_occurred.emit(error_msg)
-            self.connection_status.emit(False)
-            return
+        self.transport.connect()
 
-        try:
-            print(f"Attempting to connect to MQTT broker at {self.config['broker']}:{self.config['port']} (Attempt {self.retry_count + 1}/{self.max_retries})")
-            self.client.connect(self.config['broker'], self.config['port'])
-            self.client.loop_start()
-        except Exception as e:
-            error_msg = f"Connection error: {e}. Please verify broker address and port."
-            print(error_msg)
-            self.error_occurred.emit(error_msg)
-            self.retry_count += 1
-            print(f"Retrying in {self.reconnect_delay} seconds (Attempt {self.retry_count + 1}/{self.max_retries})...")
-            self._schedule_retry()
-
-    def _schedule_retry(self):
-        """Schedule a retry attempt"""
-        from threading import Timer
-        Timer(self.reconnect_delay, self._try_connect).start()
-    
     def disconnect(self):
         """Disconnect from MQTT broker"""
-        self.client.loop_stop()
-        self.client.disconnect()
-    
-    def on_connect(self, client, userdata, flags, rc):
-        """Callback when connected to broker"""
-        if rc == 0:
-            print("Connected to MQTT broker")
-            self.connected = True
-            self.connection_status.emit(True)
-            # Subscribe to the PLC's ENVIAR topic with QoS=1
-            topic = self.config['topics']['receive']
-            self.client.subscribe(topic, qos=1)
-            self.pending_subscriptions.add(topic)
-        else:
-            error_msg = f"Connection failed with code {rc}"
-            print(error_msg)
-            self.error_occurred.emit(error_msg)
-            self.connection_status.emit(False)
-    
-    def on_disconnect(self, client, userdata, rc):
-        """Callback when disconnected from broker"""
-        self.connected = False
-        self.subscriptions.clear()
-        self.pending_subscriptions.clear()
-        print("Disconnected from MQTT broker")
-        self.connection_status.emit(False)
-        if rc != 0:
-            error_msg = "Unexpected disconnection. Attempting to reconnect..."
-            print(error_msg)
-            self.error_occurred.emit(error_msg)
-            self._try_connect()
-    
-    def on_publish(self, client, userdata, mid):
-        """Callback when a message is published"""
-        print(f"Message {mid} has been published")
-        # The actual delivery confirmation will be handled by the publish() result's wait_for_publish()
-    
-    def on_message(self, client, userdata, msg):
-        try:
-            # Emit the raw message for custom handling
-            payload = msg.payload.decode()
-            self.message_received.emit(msg.topic, payload)
-            
-            # Process messages from PLC's ENVIAR topic (A_ENVIAR)
-            if msg.topic == self.config['topics']['receive']:
-                try:
-                    # Parse the JSON message
-                    data = json.loads(msg.payload)
-                    print(f"Received message on {msg.topic}: {data}")
-                    
-                    # Check if the message contains a tunnel ID
-                    if 'tunnel_id' in data:
-                        tunnel_id = int(data['tunnel_id'])
-                        
-                        # Process temperature update message
-                        if all(key in data for key in ['temp_output', 'temp_external', 'temp_internal']):
-                            print(f"Processing temperature update for tunnel {tunnel_id}")
-                            self.temperature_updated.emit(
-                                tunnel_id,
-                                float(data['temp_output']),
-                                float(data['temp_external']),
-                                float(data['temp_internal'])
-                            )
-                        
-                        # Process defrost status update message
-                        if 'defrost_status' in data:
-                            print(f"Processing defrost status update for tunnel {tunnel_id}: {data['defrost_status']}")
-                            self.defrost_status_updated.emit(tunnel_id, bool(data['defrost_status']))
-                        
-                        # Process running status update message
-                        if 'running_status' in data:
-                            print(f"Processing running status update for tunnel {tunnel_id}: {data['running_status']}")
-                            self.tunnel_status_updated.emit(tunnel_id, bool(data['running_status']))
-                except json.JSONDecodeError:
-                    print(f"Error decoding JSON message: {msg.payload}")
-        except Exception as e:
-            error_msg = f"Error processing message: {e}"
-            print(error_msg)
-            self.error_occurred.emit(error_msg)
-    
+        self.transport.disconnect()
+
+    def take_events(self):
+        """Return the decoded events waiting for the GUI (latest value per tunnel)"""
+        return self.transport.take_events()
+
+    def ingest_stats(self):
+        """Queue depth and drop counters of the ingest pipeline"""
+        return self.transport.ingest_stats()
+
+    def command_stats(self):
+        """In-flight count, outcomes and acknowledgement latency percentiles of the commands"""
+        return self.transport.command_stats()
+
+    def reconnect_stats(self):
+        """Connection state, attempts, downtime and time-to-reconnect of the broker connection"""
+        return self.transport.reconnect_stats()
+
+    def watch_command(self, command):
+        """Make sure the timeouts are checked while a command (e.g. a replayed one) is in flight"""
+        if command.state == PENDING and not self.command_timer.isActive():
+            self.command_timer.start()
+
+    def flush_commands(self):
+        """Send the held commands whose coalescing window closed; re-armed for the next one"""
+        delay = self.transport.flush_commands()
+        if delay is not None:
+            self.coalesce_timer.start(int(delay * 1000) + 1)
+
+    def follow_command(self, command):
+        """Start the coalescing or acknowledgement timer for a command just sent"""
+        if not command:
+            return
+        if command.state == HELD:
+            if not self.coalesce_timer.isActive():
+                self.flush_commands()
+        elif not self.command_timer.isActive():
+            self.command_timer.start()
+
+    def check_commands(self):
+        """Retry or give up overdue commands; the timer stops once none is in flight"""
+        if self.transport.check_commands() == 0:
+            self.command_timer.stop()
+
     def set_temperature(self, tunnel_id, temperature, is_fruit=False):
-        """
-        Envía un comando para establecer la temperatura de un túnel o fruta.
-        
-        Args:
-            tunnel_id (int): ID del túnel o fruta (1-12)
-            temperature (float): Temperatura a establecer
-            is_fruit (bool): Si es True, se trata de un setpoint de fruta
-        
-        Returns:
-            bool: True si el mensaje se envió correctamente, False en caso contrario
-        """
-        try:
-            if is_fruit:
-                # Formato para setpoint de fruta: FXX,+/-XX.XX
-                message = f"F{tunnel_id:02d},{'+' if temperature >= 0 else '-'}{abs(temperature):.2f}"
-                topic = f"fruit_setpoint/{tunnel_id}"
-            else:
-                # Formato para setpoint de túnel: SXX,+/-XX.X
-                message = f"S{tunnel_id:02d},{'+' if temperature >= 0 else '-'}{abs(temperature):.1f}"
-                topic = f"tunnel_setpoint/{tunnel_id}"
-            
-            # Publicar el mensaje usando el método correcto de tu cliente MQTT
-            # (podría ser publish_message, send_message, etc.)
-            self.client.publish(topic, message)
-            return True
-        except Exception as e:
-            print(f"Error al enviar setpoint: {e}")
-            return False
-    
-    def send_command(self, tunnel_id, command, message=None):
-        """Send command for a tunnel with optional custom message
-        
-        Args:
-            tunnel_id (int): The ID of the tunnel (1-12)
-            command (str): Command type ('start', 'stop', 'defrost')
-            message (str, optional): Custom message to send. If None, uses config default.
-            
-        Returns:
-            bool: True if message was published successfully
-            
-        Message Format:
-            {"type": "command", "tunnel_id": X, "value": "XX,X,X"}
-            Where XX is the two-digit tunnel number, and X,X are the fan and PID values
-            Sent to topic: A_RECIBIR
-        """
-        if not self.client.is_connected():
-            print("Cannot send command: Not connected to MQTT broker")
-            return False
-
-        # Get the topic from config (A_RECIBIR)
-        topic = self.config['topics']['send']
-        
-        # Format the tunnel number as two digits
-        tunnel_str = f"{tunnel_id:02d}"
-        
-        # Determine the fan and PID values based on the command
-        if command == 'start':
-            # For start command: fan=1, PID=1
-            value = f"{tunnel_str},1,1"
-        elif command == 'stop':
-            # For stop command: fan=0, PID=0
-            value = f"{tunnel_str},0,0"
-        elif command == 'defrost':
-            # For defrost command, use the provided message format (XX,X,0)
-            # This should be in the format: XX,1,0 for defrost ON or XX,0,0 for defrost OFF
-            # Where XX is the two-digit tunnel number
-            value = message if message else self.config['messages'].get(command, command)
-        else:
-            # For other commands, use the original message or config default
-            value = message if message else self.config['messages'].get(command, command)
-        
-        # Send the raw message directly without JSON wrapping
-        # Publish the message with QoS=1 (at least once delivery) and retain flag set to true
-        result = self.client.publish(topic, value, qos=1, retain=True)
-        success = result.is_published()
-        
-        print(f"Publishing command to {topic}. Message: {value}. Success: {success}")
-        return success
\ No newline at end of file
+        """Send a tunnel or fruit setpoint, see MQTTTransport.set_temperature"""
+        return self.transport.set_temperature(tunnel_id, temperature, is_fruit)
+
+    def send_command(self, tunnel_id, command, message=None, previous=None):
+        """Send a tunnel command without waiting for its acknowledgement, see MQTTTransport.send_command"""
+        command = self.transport.send_command(tunnel_id, command, message, previous)
+        self.follow_command(command)
+        return command
+
+    def send_setpoint(self, tunnel_id, message, is_fruit=False):
+        """Send a formatted tunnel or fruit setpoint, see MQTTTransport.send_setpoint"""
+        command = self.transport.send_setpoint(tunnel_id, message, is_fruit)
+        self.follow_command(command)
+        return command
+
+    def publish_batch(self, items):
+        """Pipeline several commands, see MQTTTransport.publish_batch; ``batch_finished`` reports the result"""
+        batch = self.transport.publish_batch(items)
+        if batch and not self.command_timer.isActive():
+            self.command_timer.start()
+        return batch
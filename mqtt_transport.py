@@ -0,0 +1,473 @@
+import socket
+import time
+
+import paho.mqtt.client as mqtt
+from ingest import IngestPipeline
+from event_mailbox import LatestWinsMailbox
+from command_tracker import TrackedCommand, CommandTracker, CommandBatch, CONFIRMED, FAILED
+from command_queue import OfflineCommandQueue
+from command_coalescer import CommandCoalescer
+from reconnect import ReconnectPolicy
+from mqtt_broker import LocalClient
+
+
+class _BackoffClient(mqtt.Client):
+    """paho client whose network thread waits between connection attempts as a ReconnectPolicy says.
+
+    paho's loop_start() thread makes the first connection attempt and every
+    reconnection itself; only the wait between attempts (paho: doubling
+    delay, no jitter) is replaced.
+    """
+
+    def __init__(self, policy, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policy = policy
+
+    def reconnect(self):
+        self.policy.attempt()
+        return super().reconnect()
+
+    def _reconnect_wait(self):
+        delay = self.policy.next_delay()
+        print(f"Reconnecting to MQTT broker in {delay:.1f} seconds")
+        deadline = time.monotonic() + delay
+        # Same exit conditions as paho's own wait: disconnect() or loop_stop() end it early
+        while self._state != mqtt.mqtt_cs_disconnecting and not self._thread_terminate:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 0.5))
+
+
+class MQTTTransport:
+    """MQTT connection to the PLC, without any Qt dependency.
+
+    Owns the paho client, the reconnect policy and the ingest pipeline. State
+    changes are reported through plain callbacks, paho style, so the same
+    transport runs under the GUI (wrapped by mqtt_client.MQTTClient) or
+    headless:
+
+    - ``on_connection_status(connected)``
+    - ``on_error(message)``
+    - ``on_events_pending()``: decoded events are waiting, collect them with
+      ``take_events()``; called from the ingest thread
+    - ``on_command_status(command)``: a command sent with ``send_command``
+      was acknowledged, retried or given up (command_tracker.TrackedCommand);
+      called from the paho thread or from ``check_commands()``
+    - ``on_batch_finished(batch)``: every command of a ``publish_batch``
+      was acknowledged or given up (command_tracker.CommandBatch)
+    """
+
+    def __init__(self):
+        self.on_connection_status = None
+        self.on_error = None
+        self.on_events_pending = None
+        self.on_command_status = None
+        self.on_batch_finished = None
+        # Backoff between connection attempts (no attempt limit) and reconnect metrics
+        self.reconnect_policy = ReconnectPolicy()
+        self.client = self.create_client()
+        self.client.on_connect = self.on_connect
+        self.client.on_connect_fail = self.on_connect_fail
+        self.client.on_message = self.on_message
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_subscribe = self.on_subscribe
+        self.client.on_publish = self.on_publish
+        self.connected = False
+        self.subscriptions = set()
+        self.pending_subscriptions = set()
+        # Payload decoding runs on its own thread, off both the paho and the GUI thread.
+        # Decoded events wait in a latest-wins mailbox so a stalled GUI never builds a backlog.
+        self.mailbox = LatestWinsMailbox()
+        self.ingest = IngestPipeline(self.mailbox, self._notify_events)
+        # QoS 1 commands waiting for their PUBACK, keyed by message id; send_command never waits for it
+        self.commands = CommandTracker(self._publish_command, on_change=self._report_command)
+        # QoS 1 messages awaiting acknowledgement at once, in paho and in publish_batch
+        self.max_inflight = 20
+        # Commands accepted while disconnected, replayed on connection (opened by configure)
+        self.offline = None
+        # Operator commands merged over a short window (command_coalesce_window); off until configured,
+        # since the owner must then call flush_commands() (MQTTClient does)
+        self.coalescer = CommandCoalescer(self._send_now, window=0.0, on_change=self._report_command)
+        # Default configuration
+        self.config = {
+            'broker': '172.25.2.52',
+            'port': 1883,
+            'topics': {
+                'send': 'A_RECIBIR',
+                'receive': 'A_ENVIAR'
+            },
+            'messages': {
+                'start': 'start',
+                'stop': 'stop'
+            }
+        }
+
+    def create_client(self):
+        """Create the paho client (overridden by transports that drive its socket themselves)"""
+        return _BackoffClient(self.reconnect_policy)
+
+    def _report_status(self, connected):
+        if self.on_connection_status is not None:
+            self.on_connection_status(connected)
+
+    def _report_error(self, error_msg):
+        if self.on_error is not None:
+            self.on_error(error_msg)
+
+    def _notify_events(self):
+        if self.on_events_pending is not None:
+            self.on_events_pending()
+
+    def _report_command(self, command):
+        if self.on_command_status is not None:
+            self.on_command_status(command)
+
+    def _report_batch(self, batch):
+        if self.on_batch_finished is not None:
+            self.on_batch_finished(batch)
+
+    def on_subscribe(self, client, userdata, mid, granted_qos):
+        """Callback when subscription is confirmed"""
+        print(f"Subscription confirmed with QoS: {granted_qos}")
+        # Add successfully subscribed topics to subscriptions set
+        for topic in self.pending_subscriptions.copy():
+            self.subscriptions.add(topic)
+            self.pending_subscriptions.remove(topic)
+    
+    def configure(self, config):
+        """Update MQTT configuration"""
+        self.config.update(config)
+        # Store access code for future use
+        self.access_code = config.get('access_code', 'migiva')
+        # Acknowledgement wait and retries of the tunnel commands
+        self.commands.timeout = config.get('command_timeout', self.commands.timeout)
+        self.commands.max_retries = config.get('command_retries', self.commands.max_retries)
+        self.commands.backoff = config.get('command_backoff', self.commands.backoff)
+        self.max_inflight = config.get('max_inflight', self.max_inflight)
+        self.client.max_inflight_messages_set(self.max_inflight)
+        self.coalescer.window = config.get('command_coalesce_window', self.coalescer.window)
+        # Wait before the first retry, doubled after every failed attempt up to the maximum
+        self.reconnect_policy.initial_delay = config.get('reconnect_delay', self.reconnect_policy.initial_delay)
+        self.reconnect_policy.max_delay = config.get('reconnect_max_delay', self.reconnect_policy.max_delay)
+        if config.get('offline_queue') and self.offline is None:
+            self.offline = OfflineCommandQueue(config['offline_queue'])
+            if len(self.offline):
+                print(f"{len(self.offline)} commands queued before the last shutdown will be sent on connection")
+    
+    def connect(self):
+        """Connect to MQTT broker; paho's network thread keeps reconnecting until disconnect().
+
+        connect_async() only records the broker: the TCP connection is made on
+        the loop_start() thread, so an unreachable broker never holds up the
+        caller (the GUI startup). The same thread waits between attempts as
+        the reconnect policy says (exponential backoff with jitter).
+        """
+        self.ingest.start()
+        self.reconnect_policy.start()
+        print(f"Connecting to MQTT broker at {self.config['broker']}:{self.config['port']}")
+        self.client.connect_async(self.config['broker'], self.config['port'])
+        self.client.loop_start()
+
+    def disconnect(self):
+        """Disconnect from MQTT broker and stop reconnecting"""
+        # Commands still held for coalescing go out (or to the offline queue) first
+        self.coalescer.flush_due(force=True)
+        self.reconnect_policy.stop()
+        self.client.disconnect()
+        self.client.loop_stop()
+        self.ingest.stop()
+    
+    def on_connect(self, client, userdata, flags, rc):
+        """Callback when connected to broker"""
+        if rc == 0:
+            print("Connected to MQTT broker")
+            self.connected = True
+            self.reconnect_policy.connected()
+            # Commands are small packets sent while others await their PUBACK: do not let Nagle hold them back
+            sock = client.socket()
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._report_status(True)
+            # Subscribe to the PLC's ENVIAR topic with QoS=1
+            topic = self.config['topics']['receive']
+            self.client.subscribe(topic, qos=1)
+            self.pending_subscriptions.add(topic)
+            self._replay_offline()
+        else:
+            error_msg = f"Connection failed with code {rc}"
+            print(error_msg)
+            self.reconnect_policy.failed()
+            self._report_error(error_msg)
+            self._report_status(False)
+
+    def on_connect_fail(self, client, userdata):
+        """Callback when the broker could not be reached; the network thread retries after a backoff"""
+        error_msg = (f"Connection error: broker {self.config['broker']}:{self.config['port']} unreachable. "
+                     "Please verify broker address and port.")
+        print(error_msg)
+        self.reconnect_policy.failed()
+        self._report_error(error_msg)
+    
+    def on_disconnect(self, client, userdata, rc):
+        """Callback when disconnected from broker; reconnection is left to the network thread"""
+        self.connected = False
+        self.subscriptions.clear()
+        self.pending_subscriptions.clear()
+        self.reconnect_policy.lost()
+        print("Disconnected from MQTT broker")
+        self._report_status(False)
+        if rc != 0:
+            error_msg = "Unexpected disconnection. Attempting to reconnect..."
+            print(error_msg)
+            self._report_error(error_msg)
+    
+    def on_publish(self, client, userdata, mid):
+        """Callback when a message is published (PUBACK received for QoS 1)"""
+        print(f"Message {mid} has been published")
+        self.commands.acknowledge(mid)
+    
+    def on_message(self, client, userdata, msg):
+        """Hand messages from the PLC's ENVIAR topic (A_ENVIAR) to the ingest worker.
+
+        Decoding happens once, on the ingest thread; the consumer is notified through
+        ``on_events_pending`` and collects the resulting events with ``take_events()``.
+        """
+        if msg.topic == self.config['topics']['receive']:
+            self.ingest.submit(msg.payload)
+
+    def take_events(self):
+        """Return the decoded events waiting for the consumer (latest value per tunnel)"""
+        return self.mailbox.drain()
+
+    def ingest_stats(self):
+        """Queue depth and drop counters of the ingest pipeline"""
+        return self.ingest.stats()
+
+    def check_commands(self):
+        """Retry or give up the commands whose acknowledgement is overdue; call periodically while any is in flight
+
+        Returns:
+            int: Number of commands still waiting for their acknowledgement
+        """
+        return self.commands.check_timeouts()
+
+    def flush_commands(self):
+        """Send or cancel the operator commands whose coalescing window closed
+
+        Returns:
+            float: Seconds until this must be called again, or None if no command is held
+        """
+        return self.coalescer.flush_due()
+
+    def command_stats(self):
+        """In-flight count, outcomes and acknowledgement latency percentiles of the commands"""
+        stats = self.commands.stats()
+        if self.offline is not None:
+            stats['offline_queued'] = len(self.offline)
+        coalescer = self.coalescer.stats()
+        stats['operator_actions'] = coalescer['actions']
+        stats['coalesced'] = coalescer['coalesced']
+        stats['cancelled'] = coalescer['cancelled']
+        return stats
+
+    def reconnect_stats(self):
+        """Connection state, attempts, downtime and time-to-reconnect of the broker connection"""
+        return self.reconnect_policy.stats()
+    
+    def set_temperature(self, tunnel_id, temperature, is_fruit=False):
+        """
+        Envía un comando para establecer la temperatura de un túnel o fruta.
+        
+        Args:
+            tunnel_id (int): ID del túnel o fruta (1-12)
+            temperature (float): Temperatura a establecer
+            is_fruit (bool): Si es True, se trata de un setpoint de fruta
+        
+        Returns:
+            bool: True si el mensaje se envió correctamente, False en caso contrario
+        """
+        try:
+            if is_fruit:
+                # Formato para setpoint de fruta: FXX,+/-XX.XX
+                message = f"F{tunnel_id:02d},{'+' if temperature >= 0 else '-'}{abs(temperature):.2f}"
+                topic = f"fruit_setpoint/{tunnel_id}"
+            else:
+                # Formato para setpoint de túnel: SXX,+/-XX.X
+                message = f"S{tunnel_id:02d},{'+' if temperature >= 0 else '-'}{abs(temperature):.1f}"
+                topic = f"tunnel_setpoint/{tunnel_id}"
+            
+            # Publicar el mensaje usando el método correcto de tu cliente MQTT
+            # (podría ser publish_message, send_message, etc.)
+            self.client.publish(topic, message)
+            return True
+        except Exception as e:
+            print(f"Error al enviar setpoint: {e}")
+            return False
+    
+    def send_command(self, tunnel_id, command, message=None, previous=None):
+        """Send command for a tunnel with optional custom message
+        
+        Args:
+            tunnel_id (int): The ID of the tunnel (1-12)
+            command (str): Command type ('start', 'stop', 'defrost')
+            message (str, optional): Custom message to send. If None, uses config default.
+            previous (str, optional): XX,fan,pid value the tunnel had before this command (start,
+                stop and defrost all write it), so that a coalesced burst ending where it started
+                sends nothing. Without it start assumes the tunnel was stopped and stop that it
+                was running.
+            
+        Returns:
+            TrackedCommand: The command, 'held' while further actions may still replace it (see
+                command_coalescer), then 'pending' until the broker acknowledges it (see
+                command_tracker), or 'queued' if not connected and the offline queue is
+                enabled; False if not connected without offline queue
+            
+        Message Format:
+            {"type": "command", "tunnel_id": X, "value": "XX,X,X"}
+            Where XX is the two-digit tunnel number, and X,X are the fan and PID values
+            Sent to topic: A_RECIBIR
+        """
+        # Format the tunnel number as two digits
+        tunnel_str = f"{tunnel_id:02d}"
+        
+        # Determine the fan and PID values based on the command
+        if command == 'start':
+            # For start command: fan=1, PID=1
+            value = f"{tunnel_str},1,1"
+            previous = previous or f"{tunnel_str},0,0"
+        elif command == 'stop':
+            # For stop command: fan=0, PID=0
+            value = f"{tunnel_str},0,0"
+            previous = previous or f"{tunnel_str},1,1"
+        elif command == 'defrost':
+            # For defrost command, use the provided message format (XX,X,0)
+            # This should be in the format: XX,1,0 for defrost ON or XX,0,0 for defrost OFF
+            # Where XX is the two-digit tunnel number
+            value = message if message else self.config['messages'].get(command, command)
+        else:
+            # For other commands, use the original message or config default
+            value = message if message else self.config['messages'].get(command, command)
+        
+        return self._dispatch(tunnel_id, command, value, previous)
+
+    def send_setpoint(self, tunnel_id, message, is_fruit=False):
+        """Send a tunnel (SXX,+/-XX.XX) or fruit (FXX,+/-XX.XX) setpoint already formatted by the caller
+
+        Returns:
+            TrackedCommand: As send_command
+        """
+        return self._dispatch(tunnel_id, 'fruit_setpoint' if is_fruit else 'tunnel_setpoint', message)
+
+    def _dispatch(self, tunnel_id, kind, value, previous=None):
+        """Hold a command for coalescing, or send it at once if coalescing is off"""
+        # Get the topic from config (A_RECIBIR)
+        topic = self.config['topics']['send']
+        if not self.client.is_connected() and self.offline is None:
+            print("Cannot send command: Not connected to MQTT broker")
+            return False
+        if self.coalescer.window > 0:
+            return self.coalescer.submit(tunnel_id, kind, topic, value, previous)
+        return self._send_now(TrackedCommand(tunnel_id, kind, topic, value, 1, True))
+
+    def _send_now(self, command):
+        """Publish a command to A_RECIBIR, or queue it for the next connection"""
+        if not self.client.is_connected():
+            if self.offline is None:
+                # Connection lost while the command was held
+                print("Cannot send command: Not connected to MQTT broker")
+                command.state = FAILED
+                return False
+            self.offline.put(command)
+            print(f"Not connected to MQTT broker: command {command.payload} queued ({len(self.offline)} waiting)")
+            return command
+        if self.offline is not None:
+            # A queued value for the same setting is obsolete now
+            self.offline.discard(command.tunnel_id, command.kind, command.payload)
+
+        # Send the raw message directly without JSON wrapping
+        # Publish the message with QoS=1 (at least once delivery) and retain flag set to true;
+        # the PUBACK arrives later through on_publish
+        self.commands.resume(command)
+        
+        print(f"Publishing command to {command.topic}. Message: {command.payload}. Message id: {command.mid}")
+        return command
+
+    def _replay_offline(self):
+        """Send the commands queued while disconnected, most important first (see command_queue)
+
+        Each one leaves the queue when acknowledged; one given up stays for the next connection.
+        """
+        if self.offline is None:
+            return
+        pending = self.offline.pending()
+        if not pending:
+            return
+        print(f"Replaying {len(pending)} commands queued while disconnected")
+        for command in pending:
+            self.commands.resume(command)
+            command.future.add_done_callback(lambda future, command=command: self._replayed(command))
+            self._report_command(command)
+
+    def _replayed(self, command):
+        if command.state == CONFIRMED:
+            self.offline.done(command)
+
+    def publish_batch(self, items):
+        """Publish several commands as a pipeline of at most ``max_inflight`` unacknowledged messages
+
+        Args:
+            items (list): (tunnel_id, kind, payload) of each command, sent to the send topic (A_RECIBIR)
+
+        Returns:
+            CommandBatch: The batch, with per-command status; ``on_batch_finished`` is called when
+                every command is confirmed or failed. If not connected the commands are put in the
+                offline queue instead (``batch.queued``) and the batch is not started; False if
+                not connected without offline queue
+        """
+        topic = self.config['topics']['send']
+        commands = [TrackedCommand(tunnel_id, kind, topic, payload, 1, True) for tunnel_id, kind, payload in items]
+        batch = CommandBatch(self.commands, commands, self.max_inflight, self._report_batch)
+        if not self.client.is_connected():
+            if self.offline is None:
+                print("Cannot send batch: Not connected to MQTT broker")
+                return False
+            for command in commands:
+                self.offline.put(command)
+            print(f"Not connected to MQTT broker: {len(commands)} commands queued ({len(self.offline)} waiting)")
+            return batch
+        for command in commands:
+            if self.offline is not None:
+                self.offline.discard(command.tunnel_id, command.kind, command.payload)
+        print(f"Publishing {len(commands)} commands to {topic}, {self.max_inflight} in flight at most")
+        return batch.start()
+
+    def _publish_command(self, topic, payload, qos, retain):
+        """Publish for the command tracker: the message id, or None if paho rejected the message"""
+        result = self.client.publish(topic, payload, qos=qos, retain=retain)
+        # Without a connection paho keeps QoS 1 messages and sends them on reconnect
+        if result.rc in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            return result.mid
+        return None
+
+
+class EmbeddedMQTTTransport(MQTTTransport):
+    """MQTTTransport connected to a broker running in this process (mqtt.embedded_broker), without TCP.
+
+    The paho client is replaced by an mqtt_broker.LocalClient: telemetry
+    published by an in-process PLC emulator reaches ``on_message`` in the
+    publisher's thread, and messages from TCP clients on the broker's loop
+    thread; the ingest thread decodes them as with paho. Commands are
+    acknowledged before ``publish`` returns.
+    """
+
+    def __init__(self, broker):
+        """
+        Args:
+            broker (mqtt_broker.MQTTBroker): Broker of this process (see mqtt_broker.embedded_broker)
+        """
+        self.broker = broker
+        super().__init__()
+
+    def create_client(self):
+        return LocalClient(self.broker, 'panel')
@@ -0,0 +1,198 @@
+from PyQt5.QtWidgets import QTableView, QStyledItemDelegate, QStyle, QHeaderView, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QRectF
+from PyQt5.QtGui import QColor, QFont, QPen
+
+# Columns of the overview: (header, TunnelState field, number format)
+COLUMNS = (
+    ("Túnel", None, None),
+    ("T. Salida", 'output_temp', "{:.1f}°C"),
+    ("T. Externa", 'external_temp', "{:.1f}°C"),
+    ("T. Interna", 'internal_temp', "{:.1f}°C"),
+    ("SP Túnel", 'tunnel_setpoint', "{:.1f}°C"),
+    ("SP Fruta", 'fruit_setpoint', "{:.2f}°C"),
+    ("Estado", 'running', None),
+    ("Descongelar", 'defrosting', None),
+)
+FIELD_COLUMNS = {field: column for column, (_, field, _) in enumerate(COLUMNS) if field}
+
+# Status columns: field -> ((text, foreground, background) when off, ... when on)
+STATUS_STYLES = {
+    'running': (("Apagado", '#d32f2f', '#ffebee'), ("Encendido", '#2e7d32', '#e8f5e9')),
+    'defrosting': (("Apagado", '#d32f2f', '#ffebee'), ("Encendido", '#1565c0', '#e3f2fd')),
+}
+
+# Same colors as the labels of the tunnel widgets (theme.py)
+TEXT_COLORS = {
+    'output_temp': '#388e3c',
+    'external_temp': '#7cb342',
+    'internal_temp': '#43a047',
+    'tunnel_setpoint': '#1B5E20',
+    'fruit_setpoint': '#6A1B9A',
+}
+
+ROW_HEIGHT = 36
+
+# Data role: True while the row shows values restored from the state snapshot
+STALE_ROLE = Qt.UserRole + 1
+
+
+class TunnelOverviewModel(QAbstractTableModel):
+    """Read-only table model over the TunnelStateModel, one row per tunnel.
+
+    The model holds no copy of the data: cells are formatted from the tunnel
+    state when the view asks for them, which it only does for the rows on
+    screen. ``tunnel_changed`` is called for the tunnels flushed by the
+    refresh scheduler and signals only the cells of the fields that changed.
+    """
+
+    def __init__(self, state_model, parent=None):
+        super().__init__(parent)
+        self.state_model = state_model
+        self.tunnel_ids = sorted(state_model.states)
+        self.rows = {tunnel_id: row for row, tunnel_id in enumerate(self.tunnel_ids)}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tunnel_ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        tunnel_id = self.tunnel_ids[index.row()]
+        _, field, number_format = COLUMNS[index.column()]
+        if role == Qt.DisplayRole:
+            if field is None:
+                return f"Túnel {tunnel_id}"
+            value = self.state_model[tunnel_id].get(field)
+            if value is None:
+                return "--"
+            if field in STATUS_STYLES:
+                return STATUS_STYLES[field][value][0]
+            return number_format.format(value)
+        if role == Qt.UserRole:
+            # Raw value, used by the delegate to pick the status colors
+            return None if field is None else self.state_model[tunnel_id].get(field)
+        if role == STALE_ROLE:
+            return self.state_model[tunnel_id].stale
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def tunnel_changed(self, tunnel_id, fields):
+        """Signal the cells of a tunnel whose displayed value changed
+
+        Args:
+            tunnel_id (int): Tunnel whose state was flushed
+            fields (set): Names of the fields that changed
+        """
+        row = self.rows.get(tunnel_id)
+        if row is None:
+            return
+        if 'stale' in fields:
+            # Live data replaced the restored values: the whole row changes color
+            self.dataChanged.emit(self.index(row, 1), self.index(row, len(COLUMNS) - 1), [STALE_ROLE])
+            return
+        # One signal per cell: the view repaints only that cell, and nothing if the row is off screen
+        for field in fields:
+            index = self.index(row, FIELD_COLUMNS[field])
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+
+class TunnelOverviewDelegate(QStyledItemDelegate):
+    """Paints the overview cells directly with QPainter (no widget per cell)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = QFont('Arial', 11)
+        self.bold_font = QFont('Arial', 11, QFont.Bold)
+        self.colors = {name: QColor(name) for name in set(TEXT_COLORS.values()) | {'#212121', '#9e9e9e'}}
+        for states in STATUS_STYLES.values():
+            for _, foreground, background in states:
+                self.colors.setdefault(foreground, QColor(foreground))
+                self.colors.setdefault(background, QColor(background))
+
+    def paint(self, painter, option, index):
+        _, field, _ = COLUMNS[index.column()]
+        text = index.data(Qt.DisplayRole)
+        value = index.data(Qt.UserRole)
+        rect = option.rect
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.highlight())
+        if field in STATUS_STYLES and value is not None:
+            # Status pill, same colors as the status labels of the tunnel widgets
+            _, foreground, background = STATUS_STYLES[field][value]
+            pill = QRectF(rect.adjusted(6, 4, -6, -4))
+            painter.setRenderHint(painter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(self.colors[background])
+            painter.drawRoundedRect(pill, 8, 8)
+            painter.setPen(QPen(self.colors[foreground]))
+            painter.setFont(self.bold_font)
+        else:
+            # Grey: no value yet, or a value restored from the snapshot not confirmed by the PLC
+            known = field is None or (value is not None and not index.data(STALE_ROLE))
+            color = TEXT_COLORS.get(field, '#212121') if known else '#9e9e9e'
+            painter.setPen(QPen(self.colors[color]))
+            painter.setFont(self.bold_font if field is None else self.font)
+        painter.drawText(rect, Qt.AlignCenter, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        size.setHeight(ROW_HEIGHT)
+        return size
+
+
+class TunnelOverview(QTableView):
+    """Overview of every tunnel in a single scrollable table.
+
+    Rows have a fixed height, so the view lays out and paints only the rows
+    inside the viewport: memory and refresh cost do not grow with the number
+    of tunnels, unlike one TunnelWidget per tunnel.
+    """
+
+    def __init__(self, state_model, parent=None):
+        super().__init__(parent)
+        self.overview_model = TunnelOverviewModel(state_model, self)
+        self.setModel(self.overview_model)
+        self.setItemDelegate(TunnelOverviewDelegate(self))
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setAlternatingRowColors(True)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.verticalHeader().setVisible(False)
+        # Fixed row heights: no per-row size hint is computed for rows off screen
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+    def tunnel_changed(self, tunnel_id, fields):
+        """Repaint the changed cells of a tunnel, only if its row is on screen.
+
+        Rows off screen (or the whole view while its tab is hidden) are read
+        from the state model again when they are scrolled into view.
+        """
+        if not self.isVisible():
+            return
+        row = self.overview_model.rows.get(tunnel_id)
+        header = self.verticalHeader()
+        first = header.logicalIndexAt(0)
+        last = header.logicalIndexAt(self.viewport().height() - 1)
+        if last < 0:
+            last = self.overview_model.rowCount() - 1
+        if row is not None and first <= row <= last:
+            self.overview_model.tunnel_changed(tunnel_id, fields)
+
+    def tunnel_at(self, index):
+        """Tunnel id of a model index (e.g. from the activated signal)"""
+        return self.overview_model.tunnel_ids[index.row()]
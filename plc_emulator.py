@@ -0,0 +1,329 @@
+"""PLC emulator: publishes tunnel telemetry and obeys the panel's commands over MQTT, like the real PLC.
+
+Load generator for the panel and the headless service without the plant:
+
+    python plc_emulator.py [--config config.yaml] [--tunnels 12] [--rate 1] [--speed 1] [--stand-in]
+
+With --stand-in a local broker (mqtt_broker.py) is started in the same
+process on --host/--port and the emulator publishes to it without TCP; point
+config.yaml's mqtt.broker/port at it. Without it, the emulator can also
+connect to a panel or headless service running with mqtt.embedded_broker.
+"""
+import argparse
+import signal
+import socket
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+import yaml
+
+from hmi_core import tunnel_count
+from mqtt_broker import LocalClient, embedded_broker
+
+# Time constants of the plant, in emulated seconds
+AIR_TAU = 300.0  # evaporator outlet air (sensor A) towards its target
+SURFACE_TAU = 3600.0  # box surface (sensor E) towards the air
+PULP_TAU = 3 * 3600.0  # fruit pulp (sensor I) towards the surface
+DEFROST_TAU = 120.0  # air warmed by the evaporator heaters during a defrost
+DEFROST_AIR = 12.0  # air temperature the heaters drive towards
+SENSOR_NOISE = 0.05  # standard deviation of the sensor readings (°C)
+
+# Calibration messages: sensor letter -> row of TunnelPlant.offsets
+CALIBRATION_SENSORS = {'A': 0, 'E': 1, 'I': 2}
+
+
+class TunnelPlant:
+    """Thermal state of every tunnel, advanced for all tunnels at once with NumPy.
+
+    A running tunnel (fan and PID on) pulls its air towards the tunnel
+    setpoint, or holds it just under the fruit setpoint once the pulp got
+    there; the box surface follows the air and the pulp follows the surface
+    (first-order lags). A stopped tunnel drifts back to its ambient
+    temperature. A defrost (fan on, PID off) warms the air; besides the
+    defrosts commanded by the panel, a running tunnel defrosts on its own for
+    ``defrost_duration`` every ``defrost_every`` seconds of cooling, and
+    reports PID off meanwhile, as the PLC does.
+    """
+
+    def __init__(self, num_tunnels, defrost_every=4 * 3600.0, defrost_duration=1200.0, seed=None):
+        """
+        Args:
+            num_tunnels (int): Tunnels 1..num_tunnels
+            defrost_every (float): Emulated seconds of cooling between automatic defrosts (0 disables them)
+            defrost_duration (float): Emulated seconds an automatic defrost lasts
+            seed (int): Seed of the initial temperatures and sensor noise
+        """
+        self.rng = np.random.default_rng(seed)
+        self.num_tunnels = num_tunnels
+        self.defrost_every = defrost_every
+        self.defrost_duration = defrost_duration
+        self.tunnel_ids = np.arange(1, num_tunnels + 1).tolist()
+        # Tunnels start running with a warm load, at different ambient temperatures
+        self.ambient = self.rng.uniform(18.0, 26.0, num_tunnels)
+        self.air = self.ambient.copy()
+        self.surface = self.ambient + self.rng.uniform(-1.0, 1.0, num_tunnels)
+        self.pulp = self.surface + self.rng.uniform(-0.5, 0.5, num_tunnels)
+        self.tunnel_setpoint = np.full(num_tunnels, 2.0)
+        self.fruit_setpoint = np.full(num_tunnels, 4.0)
+        self.fan = np.ones(num_tunnels, dtype=bool)
+        self.pid = np.ones(num_tunnels, dtype=bool)
+        self.offsets = np.zeros((len(CALIBRATION_SENSORS), num_tunnels))
+        self.cooling_time = self.rng.uniform(0.0, max(defrost_every, 1.0), num_tunnels)
+        self.defrost_left = np.zeros(num_tunnels)
+
+    def step(self, dt):
+        """Advance the plant by dt emulated seconds"""
+        cooling = self.fan & self.pid
+        if self.defrost_every:
+            self.cooling_time[cooling] += dt
+            due = cooling & (self.cooling_time >= self.defrost_every)
+            self.defrost_left[due] = self.defrost_duration
+            self.cooling_time[due] = 0.0
+        auto_defrost = cooling & (self.defrost_left > 0)
+        self.defrost_left = np.maximum(self.defrost_left - dt, 0.0)
+        defrosting = (self.fan & ~self.pid) | auto_defrost
+        cooling &= ~auto_defrost
+
+        holding = self.pulp <= self.fruit_setpoint
+        cooling_target = np.where(holding, np.maximum(self.tunnel_setpoint, self.fruit_setpoint - 1.0),
+                                  self.tunnel_setpoint)
+        target = np.where(defrosting, DEFROST_AIR, np.where(cooling, cooling_target, self.ambient))
+        tau = np.where(defrosting, DEFROST_TAU, np.where(cooling, AIR_TAU, SURFACE_TAU))
+        self.air += (target - self.air) * -np.expm1(-dt / tau)
+        self.surface += (self.air - self.surface) * -np.expm1(-dt / SURFACE_TAU)
+        self.pulp += (self.surface - self.pulp) * -np.expm1(-dt / PULP_TAU)
+
+    def frames(self, groups_per_frame=None):
+        """TXX,T.S,T.E,T.I,SP_Tunel,SP_Fruta,Estado_PID,Estado_Ventilador frames of every tunnel
+
+        Args:
+            groups_per_frame (int): Tunnels per message; all in one message if None
+
+        Returns:
+            list: Frame strings
+        """
+        noise = self.rng.normal(0.0, SENSOR_NOISE, (3, self.num_tunnels))
+        readings = np.stack((self.air, self.surface, self.pulp)) + self.offsets + noise
+        # An automatic defrost is reported like a commanded one: PID off, fan on
+        pid = self.pid & (self.defrost_left <= 0)
+        groups = [f"T{tunnel_id:02d},{output:.1f},{external:.1f},{internal:.1f},{setpoint:.1f},{fruit:.2f},"
+                  f"{int(pid_on)},{int(fan_on)}"
+                  for tunnel_id, output, external, internal, setpoint, fruit, pid_on, fan_on
+                  in zip(self.tunnel_ids, *readings.tolist(), self.tunnel_setpoint.tolist(),
+                         self.fruit_setpoint.tolist(), pid.tolist(), self.fan.tolist())]
+        size = groups_per_frame or len(groups)
+        return [','.join(groups[start:start + size]) for start in range(0, len(groups), size)]
+
+    def apply_command(self, payload):
+        """Apply a message of the panel's send topic (A_RECIBIR)
+
+        - ``XX,F,P``: fan and PID of tunnel XX (1,1 start, 0,0 stop, 1,0 defrost)
+        - ``SXX,+/-XX.XX`` / ``FXX,+/-XX.XX``: tunnel / fruit setpoint, echoed back
+        - ``AXX,+/-X.X`` (also E, I): calibration offset of a sensor
+
+        Returns:
+            str: Setpoint echo to publish on the receive topic, or None
+
+        Raises:
+            ValueError: Malformed message or unknown tunnel
+        """
+        head, _, value = payload.strip().partition(',')
+        if head[:1] in ('S', 'F', *CALIBRATION_SENSORS):
+            index = self._index(head[1:])
+            number = float(value)
+            if head[0] == 'S':
+                self.tunnel_setpoint[index] = number
+            elif head[0] == 'F':
+                self.fruit_setpoint[index] = number
+            else:
+                self.offsets[CALIBRATION_SENSORS[head[0]], index] = number
+                return None
+            return payload.strip()
+        fan, pid = (int(flag) for flag in value.split(','))
+        index = self._index(head)
+        self.fan[index] = bool(fan)
+        self.pid[index] = bool(pid)
+        # A command from the panel ends an automatic defrost
+        self.defrost_left[index] = 0.0
+        return None
+
+    def _index(self, tunnel_text):
+        tunnel_id = int(tunnel_text)
+        if not 1 <= tunnel_id <= self.num_tunnels:
+            raise ValueError(f"unknown tunnel {tunnel_id}")
+        return tunnel_id - 1
+
+
+class PLCEmulator:
+    """Publishes a TunnelPlant on the receive topic at a fixed rate and applies the commands of the send topic.
+
+    Frames are published with QoS 0, like the PLC's telemetry; setpoint
+    echoes as soon as the setpoint is received. Commands arrive on paho's
+    network thread (on the sender's thread with an in-process broker) and are
+    applied under the same lock as the plant steps.
+    """
+
+    def __init__(self, plant, config, rate=1.0, speed=1.0, groups_per_frame=None, broker=None):
+        """
+        Args:
+            plant (TunnelPlant): Plant to publish
+            config (dict): The mqtt section of config.yaml (broker, port, topics)
+            rate (float): Telemetry messages per second (each carries every tunnel)
+            speed (float): Emulated seconds per real second
+            groups_per_frame (int): Tunnels per message; all in one message if None
+            broker (mqtt_broker.MQTTBroker): Broker of this process to publish to without TCP;
+                config's broker/port over TCP if None
+        """
+        self.plant = plant
+        self.config = config
+        self.rate = rate
+        self.speed = speed
+        self.groups_per_frame = groups_per_frame
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        if broker is not None:
+            self.client = LocalClient(broker, 'plc-emulator')
+        else:
+            self.client = mqtt.Client(client_id='plc-emulator')
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.frame_count = 0
+        self.message_count = 0
+        self.byte_count = 0
+        self.command_count = 0
+        self.echo_count = 0
+        self.error_count = 0
+        self.late_count = 0
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print(f"PLC emulator connected, listening on {self.config['topics']['send']}")
+            # Echoes follow the PUBACK of the command: without this Nagle holds them until the broker ACKs
+            sock = client.socket()
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.subscribe(self.config['topics']['send'], qos=1)
+        else:
+            print(f"PLC emulator: connection refused ({rc})")
+
+    def on_message(self, client, userdata, msg):
+        try:
+            with self.lock:
+                echo = self.plant.apply_command(msg.payload.decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            self.error_count += 1
+            print(f"PLC emulator: ignored command {msg.payload!r}: {e}")
+            return
+        self.command_count += 1
+        if echo is not None:
+            client.publish(self.config['topics']['receive'], echo)
+            self.echo_count += 1
+
+    def run(self, duration=None, stats_interval=10.0):
+        """Publish until stop() or for ``duration`` seconds; prints a stats line every ``stats_interval``"""
+        self.client.connect_async(self.config['broker'], self.config['port'])
+        self.client.loop_start()
+        period = 1.0 / self.rate
+        start = last = time.monotonic()
+        next_tick = start
+        next_stats = start + stats_interval if stats_interval else None
+        try:
+            while not self.stopping.is_set():
+                now = time.monotonic()
+                if duration and now - start >= duration:
+                    break
+                with self.lock:
+                    self.plant.step((now - last) * self.speed)
+                    frames = self.plant.frames(self.groups_per_frame)
+                last = now
+                if self.client.is_connected():
+                    for frame in frames:
+                        self.client.publish(self.config['topics']['receive'], frame)
+                        self.byte_count += len(frame)
+                    self.message_count += len(frames)
+                    self.frame_count += 1
+                if next_stats is not None and now >= next_stats:
+                    print(format_emulator_stats(self.stats(now - start)))
+                    next_stats += stats_interval
+                next_tick += period
+                delay = next_tick - time.monotonic()
+                if delay < 0:
+                    # Building and publishing a frame took longer than the period: do not burst to catch up
+                    self.late_count += 1
+                    next_tick = time.monotonic()
+                else:
+                    self.stopping.wait(delay)
+        finally:
+            self.client.disconnect()
+            self.client.loop_stop()
+        return self.stats(time.monotonic() - start)
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats(self, elapsed):
+        return {
+            'elapsed_s': elapsed,
+            'frames': self.frame_count,
+            'messages': self.message_count,
+            'messages_per_s': self.message_count / elapsed if elapsed else 0.0,
+            'kbytes_per_s': self.byte_count / 1024 / elapsed if elapsed else 0.0,
+            'commands': self.command_count,
+            'echoes': self.echo_count,
+            'errors': self.error_count,
+            'late_ticks': self.late_count,
+        }
+
+
+def format_emulator_stats(stats):
+    return (f"PLC emulator: {stats['frames']} frames, {stats['messages_per_s']:.1f} msg/s, "
+            f"{stats['kbytes_per_s']:.1f} KiB/s, {stats['commands']} commands ({stats['echoes']} echoed, "
+            f"{stats['errors']} errors), {stats['late_ticks']} late ticks")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulador del PLC de los túneles (generador de carga MQTT)")
+    parser.add_argument('--config', default='config.yaml', help="Archivo de configuración (el mismo del panel)")
+    parser.add_argument('--tunnels', type=int, help="Cantidad de túneles (por defecto tunnels.count)")
+    parser.add_argument('--rate', type=float, default=1.0, help="Tramas de telemetría por segundo")
+    parser.add_argument('--speed', type=float, default=1.0, help="Segundos simulados por segundo real")
+    parser.add_argument('--groups-per-frame', type=int, help="Túneles por mensaje (por defecto todos en uno)")
+    parser.add_argument('--defrost-every', type=float, default=4 * 3600.0,
+                        help="Segundos simulados de frío entre descongelamientos automáticos (0 los desactiva)")
+    parser.add_argument('--duration', type=float, default=0.0, help="Segundos de ejecución (0: hasta Ctrl+C)")
+    parser.add_argument('--seed', type=int, help="Semilla de las temperaturas iniciales y del ruido")
+    parser.add_argument('--host', help="Broker (por defecto mqtt.broker)")
+    parser.add_argument('--port', type=int, help="Puerto del broker (por defecto mqtt.port)")
+    parser.add_argument('--stand-in', action='store_true', help="Iniciar un broker local (mqtt_broker.py) en host:puerto")
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help="Segundos entre líneas de estadísticas (0 para desactivar)")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    mqtt_config = dict(config['mqtt'])
+    if args.host:
+        mqtt_config['broker'] = args.host
+    if args.port:
+        mqtt_config['port'] = args.port
+
+    broker = None
+    if args.stand_in:
+        broker = embedded_broker(mqtt_config['broker'], mqtt_config['port'])
+
+    num_tunnels = args.tunnels or tunnel_count(config)
+    plant = TunnelPlant(num_tunnels, args.defrost_every, seed=args.seed)
+    emulator = PLCEmulator(plant, mqtt_config, args.rate, args.speed, args.groups_per_frame, broker)
+    signal.signal(signal.SIGINT, lambda signum, frame: emulator.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: emulator.stop())
+    print(f"Emulating {num_tunnels} tunnels at {args.rate:g} frames/s, x{args.speed:g} speed, "
+          f"broker {mqtt_config['broker']}:{mqtt_config['port']}")
+    print(format_emulator_stats(emulator.run(args.duration, args.stats_interval)))
+    if broker is not None:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    main()
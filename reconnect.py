@@ -0,0 +1,130 @@
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+# States of the connection to the broker
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+WAITING = 'waiting'
+STOPPED = 'stopped'
+
+
+class ReconnectPolicy:
+    """Connection state machine of a transport: backoff between attempts and reconnect metrics.
+
+    The wait before attempt n (counted from the last successful connection)
+    is ``initial_delay * factor ** n`` capped at ``max_delay``, shortened by
+    a random fraction of up to ``jitter`` so that panels restarted together
+    do not hit the broker in lockstep. There is no attempt limit: a panel
+    keeps trying for as long as it runs.
+
+    The transport reports what happens (``attempt``, ``connected``,
+    ``failed``, ``lost``, ``stop``) and asks ``next_delay`` how long to wait;
+    all calls come from one thread (paho's network thread or the asyncio
+    loop). ``stats`` may be read from any thread.
+    """
+
+    def __init__(self, initial_delay=1.0, max_delay=30.0, factor=2.0, jitter=0.5, clock=time.monotonic):
+        """
+        Args:
+            initial_delay (float): Seconds before the first retry
+            max_delay (float): Upper bound of the wait between attempts
+            factor (float): Growth of the wait after every failed attempt
+            jitter (float): Largest fraction of the wait removed at random (0 disables jitter)
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.clock = clock
+        self.state = DISCONNECTED
+        self.failures = 0  # consecutive failed attempts, drives the backoff
+        self.down_since = None
+        self.ever_connected = False
+        self.attempts = 0
+        self.failed_attempts = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.total_downtime = 0.0
+        # Seconds from losing the connection to having it back, one per reconnection
+        self.outages = deque(maxlen=100)
+
+    def start(self):
+        """The transport starts connecting: downtime counts from now"""
+        self.state = CONNECTING
+        self.failures = 0
+        self.down_since = self.clock()
+
+    def attempt(self):
+        """A connection attempt begins"""
+        self.state = CONNECTING
+        self.attempts += 1
+
+    def next_delay(self):
+        """Seconds to wait before the next attempt; the wait grows with every consecutive failure"""
+        self.state = WAITING
+        delay = min(self.max_delay, self.initial_delay * self.factor ** self.failures)
+        self.failures += 1
+        return delay * (1.0 - self.jitter * random.random())
+
+    def failed(self):
+        """The attempt did not end in an accepted connection"""
+        self.failed_attempts += 1
+        self.state = DISCONNECTED
+
+    def connected(self):
+        """The broker accepted the connection: reset the backoff and close the outage"""
+        self.state = CONNECTED
+        self.failures = 0
+        if self.down_since is not None:
+            downtime = self.clock() - self.down_since
+            self.total_downtime += downtime
+            if self.ever_connected:
+                self.reconnects += 1
+                self.outages.append(downtime)
+            self.down_since = None
+        self.ever_connected = True
+
+    def lost(self):
+        """An established connection dropped"""
+        if self.state == CONNECTED:
+            self.disconnects += 1
+            self.down_since = self.clock()
+        self.state = DISCONNECTED
+
+    def stop(self):
+        """Disconnected on purpose: no more attempts"""
+        if self.down_since is not None:
+            self.total_downtime += self.clock() - self.down_since
+            self.down_since = None
+        self.state = STOPPED
+
+    def stats(self):
+        """State, attempt counters, downtime and time-to-reconnect percentiles (seconds)"""
+        downtime = self.total_downtime
+        down_since = self.down_since
+        if down_since is not None:
+            downtime += self.clock() - down_since
+        stats = {
+            'state': self.state,
+            'attempts': self.attempts,
+            'failed_attempts': self.failed_attempts,
+            'disconnects': self.disconnects,
+            'reconnects': self.reconnects,
+            'downtime_s': downtime,
+        }
+        outages = np.array(self.outages)
+        if len(outages):
+            stats.update(zip(('reconnect_p50_s', 'reconnect_max_s'), (float(np.median(outages)), float(outages.max()))))
+        return stats
+
+
+def format_reconnect_stats(stats):
+    line = (f"Connection: {stats['state']}, {stats['attempts']} attempts ({stats['failed_attempts']} failed), "
+            f"{stats['disconnects']} disconnects, {stats['reconnects']} reconnects, downtime {stats['downtime_s']:.1f} s")
+    if 'reconnect_p50_s' in stats:
+        line += f", time to reconnect p50 {stats['reconnect_p50_s']:.1f} s max {stats['reconnect_max_s']:.1f} s"
+    return line
@@ -0,0 +1,64 @@
+from PyQt5.QtCore import QObject, QTimer
+
+
+class RefreshScheduler(QObject):
+    """Coalesces tunnel updates and pushes them to the widgets at a capped rate.
+
+    Incoming values are written into the TunnelStateModel, which keeps the
+    latest value and the set of fields whose displayed value changed. A single
+    QTimer flushes the dirty tunnels at most ``rate_hz`` times per second, so a
+    burst of PLC frames costs one widget refresh per tunnel per tick instead of
+    one per message, and unchanged fields are not touched at all. The timer
+    only runs while there is something to flush.
+    """
+
+    def __init__(self, model, apply_callback, rate_hz=5, parent=None):
+        """
+        Args:
+            model (TunnelStateModel): State model holding the latest values
+            apply_callback (callable): Called as apply_callback(tunnel_id, state, fields) on each flush
+            rate_hz (float): Maximum number of refreshes per second
+        """
+        super().__init__(parent)
+        self.model = model
+        self.apply_callback = apply_callback
+        self.submitted_count = 0
+        self.applied_count = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.set_rate(rate_hz)
+
+    def set_rate(self, rate_hz):
+        """Change the refresh rate (Hz)"""
+        self.timer.setInterval(max(1, int(1000 / rate_hz)))
+
+    def submit(self, tunnel_id, **fields):
+        """Record the latest values for a tunnel; changed ones are applied on the next tick.
+
+        When the scheduler is idle the first change is applied on the next event
+        loop pass (leading edge) instead of waiting a whole interval; the timer
+        then caps the rate of the following ones.
+        """
+        self.submitted_count += 1
+        if self.model.update(tunnel_id, **fields) and not self.timer.isActive():
+            self.timer.start()
+            QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        """Apply every dirty tunnel state and stop the timer if idle"""
+        dirty = self.model.take_dirty()
+        if not dirty:
+            self.timer.stop()
+            return
+        for tunnel_id, fields in dirty.items():
+            self.apply_callback(tunnel_id, self.model[tunnel_id], fields)
+        self.applied_count += len(dirty)
+
+    def stats(self):
+        """Return submitted updates vs. widget refreshes actually performed"""
+        stats = self.model.stats()
+        stats.update({
+            'submitted': self.submitted_count,
+            'applied': self.applied_count,
+        })
+        return stats
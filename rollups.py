@@ -0,0 +1,135 @@
+import numpy as np
+
+# Aggregation tiers (name, bucket width in seconds)
+TIERS = (('minute', 60), ('hour', 3600))
+TIER_SECONDS = dict(TIERS)
+
+# Aggregated channels (same names as history.CHANNELS) and the record field feeding each one
+ROLLUP_FIELDS = {
+    'output_temp': 'temp_output',
+    'external_temp': 'temp_external',
+    'internal_temp': 'temp_internal',
+    'tunnel_setpoint': 'tunnel_setpoint',
+    'fruit_setpoint': 'fruit_setpoint',
+}
+
+SCHEMA = "".join(f"""
+CREATE TABLE IF NOT EXISTS rollup_{tier} (
+    tunnel_id INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    min REAL,
+    max REAL,
+    sum REAL,
+    count INTEGER,
+    last REAL,
+    last_ts REAL,
+    PRIMARY KEY (tunnel_id, channel, bucket)
+) WITHOUT ROWID;
+""" for tier, _ in TIERS)
+
+# Merge a batch aggregate into the stored bucket (unqualified columns are the stored row)
+_UPSERT = """
+INSERT INTO rollup_{tier} (tunnel_id, channel, bucket, min, max, sum, count, last, last_ts)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (tunnel_id, channel, bucket) DO UPDATE SET
+    min = min(min, excluded.min),
+    max = max(max, excluded.max),
+    sum = sum + excluded.sum,
+    count = count + excluded.count,
+    last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+    last_ts = max(last_ts, excluded.last_ts)
+"""
+
+
+def aggregate(tunnel_ids, timestamps, values, seconds):
+    """Aggregate samples into per-tunnel time buckets in one vectorized pass.
+
+    Args:
+        tunnel_ids (np.ndarray): Tunnel of each sample
+        timestamps (np.ndarray): Sample times (epoch seconds), non-decreasing per tunnel
+        values (np.ndarray): One row per sample, one column per channel
+        seconds (int): Bucket width
+
+    Returns:
+        tuple: (tunnel_ids, buckets, mins, maxs, sums, counts, lasts, last_ts), one
+        entry (or row) per non-empty (tunnel, bucket) group
+    """
+    buckets = np.floor(timestamps / seconds) * seconds
+    # lexsort is stable, so samples keep their time order inside each group
+    order = np.lexsort((buckets, tunnel_ids))
+    tunnel_ids, buckets = tunnel_ids[order], buckets[order]
+    timestamps, values = timestamps[order], values[order]
+    boundaries = np.flatnonzero((tunnel_ids[1:] != tunnel_ids[:-1]) | (buckets[1:] != buckets[:-1])) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(tunnel_ids)]))
+    return (tunnel_ids[starts], buckets[starts],
+            np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts),
+            np.add.reduceat(values, starts), ends - starts,
+            values[ends - 1], timestamps[ends - 1])
+
+
+def update_rollups(connection, records, timestamps):
+    """Merge a batch of telemetry into every rollup tier.
+
+    Meant to run inside the historian's batch transaction, so raw rows and
+    aggregates are always committed together.
+
+    Args:
+        connection (sqlite3.Connection): Historian connection (writer thread)
+        records (np.ndarray): TELEMETRY_DTYPE records of the batch
+        timestamps (np.ndarray): Sample time of each record
+    """
+    tunnel_ids = records['tunnel_id'].astype(np.int64)
+    values = np.column_stack([records[field] for field in ROLLUP_FIELDS.values()]).astype(np.float64)
+    for tier, seconds in TIERS:
+        tunnels, buckets, mins, maxs, sums, counts, lasts, last_ts = aggregate(
+            tunnel_ids, timestamps, values, seconds)
+        tunnels, buckets = tunnels.tolist(), buckets.tolist()
+        counts, last_ts = counts.tolist(), last_ts.tolist()
+        rows = []
+        for column, channel in enumerate(ROLLUP_FIELDS):
+            rows.extend(zip(tunnels, [channel] * len(tunnels), buckets,
+                            mins[:, column].tolist(), maxs[:, column].tolist(),
+                            sums[:, column].tolist(), counts,
+                            lasts[:, column].tolist(), last_ts))
+        connection.executemany(_UPSERT.format(tier=tier), rows)
+
+
+def query_rollup(connection, tier, tunnel_id, channel, t0=None, t1=None):
+    """Aggregates of one tunnel/channel with t0 <= bucket < t1, oldest first.
+
+    Returns:
+        list: (bucket, min, max, mean, last) tuples
+    """
+    if tier not in TIER_SECONDS:
+        raise ValueError(f"Unknown rollup tier {tier!r}")
+    sql = (f"SELECT bucket, min, max, sum / count, last FROM rollup_{tier} "
+           "WHERE tunnel_id = ? AND channel = ?")
+    params = [tunnel_id, channel]
+    if t0 is not None:
+        sql += " AND bucket >= ?"
+        params.append(t0)
+    if t1 is not None:
+        sql += " AND bucket < ?"
+        params.append(t1)
+    return connection.execute(sql + " ORDER BY bucket", params).fetchall()
+
+
+def tier_for_span(span, max_points, sample_period=1.0):
+    """Finest resolution giving at most max_points over span seconds.
+
+    Args:
+        span (float): Queried time span in seconds
+        max_points (int): Maximum number of points wanted
+        sample_period (float): Seconds between raw samples of a tunnel (PLC publish period)
+
+    Returns:
+        str: Tier name, or None when the raw rows are few enough
+    """
+    if span / sample_period <= max_points:
+        return None
+    for tier, seconds in TIERS:
+        if span / seconds <= max_points:
+            return tier
+    return TIERS[-1][0]
@@ -4,15 +4,25 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                              QHeaderView, QFrame)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QColor, QPalette, QIcon
+from command_tracker import HELD, PENDING, QUEUED, CONFIRMED, FAILED, CANCELLED
 
 class SetpointWindow(QWidget):
-    def __init__(self, mqtt_client, parent=None):
+    def __init__(self, mqtt_client, num_tunnels=12, parent=None):
         super().__init__(parent)
         self.mqtt_client = mqtt_client
+        self.num_tunnels = num_tunnels
+        # Batch sent by "Guardar todos", until all its acknowledgements are in
+        self.pending_batch = None
+        # Single setpoints until confirmed, failed or cancelled: command -> (table row, type, name, value)
+        self.pending_setpoints = {}
         self.setWindowTitle("Configuración de Setpoints")
         # Eliminamos la autenticación
         self.is_authenticated = True  # Siempre autenticado
         self.setup_ui()
+        if hasattr(self.mqtt_client, 'batch_finished'):
+            self.mqtt_client.batch_finished.connect(self.on_batch_finished)
+        if hasattr(self.mqtt_client, 'command_status'):
+            self.mqtt_client.command_status.connect(self.on_command_status)
         # Use fixed size instead of fullscreen for better UI control
         self.setMinimumSize(1024, 768)
         self.resize(1200, 800)
@@ -116,8 +126,9 @@ class SetpointWindow(QWidget):
 
         main_layout.addWidget(instruction_panel)
 
-        # Tabla de setpoints - modificada para mostrar 24 filas (12 túneles + 12 frutas)
-        self.table = QTableWidget(24, 3)
+        # Tabla de setpoints: una fila por túnel y luego una por setpoint de fruta
+        n = self.num_tunnels
+        self.table = QTableWidget(2 * n, 3)
         self.table.setHorizontalHeaderLabels(["Tipo", "Setpoint (°C)", "Acción"])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.verticalHeader().setVisible(False)
@@ -125,7 +136,7 @@ class SetpointWindow(QWidget):
         self.table.setEnabled(True)
         
         # Altura de filas uniforme
-        for i in range(24):
+        for i in range(2 * n):
             self.table.setRowHeight(i, 50)
             
         self.table.setStyleSheet("""
@@ -153,8 +164,8 @@ class SetpointWindow(QWidget):
             }
         """)
 
-        # Primero los 12 túneles
-        for row in range(12):
+        # Primero los túneles
+        for row in range(n):
             tunnel_id = row + 1
             
             # Etiqueta de túnel
@@ -225,9 +236,9 @@ class SetpointWindow(QWidget):
             """)
             self.table.setCellWidget(row, 2, save_button)
             
-        # Luego los 12 setpoints de fruta
-        for row in range(12, 24):
-            fruit_id = row - 12 + 1
+        # Luego los setpoints de fruta
+        for row in range(n, 2 * n):
+            fruit_id = row - n + 1
             
             # Etiqueta de fruta
             fruit_label = QTableWidgetItem(f"Fruta Setpoint {fruit_id}")
@@ -276,7 +287,7 @@ class SetpointWindow(QWidget):
             # Botón guardar para fruta
             save_button = QPushButton("GUARDAR")
             save_button.setEnabled(True)
-            save_button.clicked.connect(lambda checked, r=row-12, t="fruit": self.save_setpoint(r, t))
+            save_button.clicked.connect(lambda checked, r=row-n, t="fruit": self.save_setpoint(r, t))
             save_button.setFixedHeight(40)
             save_button.setFixedWidth(120)
             save_button.setStyleSheet("""
@@ -304,8 +315,35 @@ class SetpointWindow(QWidget):
         save_all_container = QWidget()
         save_all_layout = QHBoxLayout(save_all_container)
         save_all_layout.setContentsMargins(0, 15, 0, 15)
-        
- 
+        save_all_layout.addStretch()
+
+        self.save_all_button = QPushButton("GUARDAR TODOS")
+        self.save_all_button.clicked.connect(self.save_all_setpoints)
+        self.save_all_button.setFixedHeight(50)
+        self.save_all_button.setFixedWidth(260)
+        self.save_all_button.setStyleSheet("""
+            QPushButton {
+                background-color: #43A047;
+                color: white;
+                border: none;
+                border-radius: 4px;
+                padding: 8px 15px;
+                font-weight: bold;
+                font-size: 16px;
+            }
+            QPushButton:hover {
+                background-color: #388E3C;
+            }
+            QPushButton:pressed {
+                background-color: #1B5E20;
+            }
+            QPushButton:disabled {
+                background-color: #A5D6A7;
+            }
+        """)
+        save_all_layout.addWidget(self.save_all_button)
+        save_all_layout.addStretch()
+        main_layout.addWidget(save_all_container)
 
         # Scroll area
         scroll = QScrollArea()
@@ -339,115 +377,48 @@ class SetpointWindow(QWidget):
         window_layout.setContentsMargins(0, 0, 0, 0)
 
     def save_all_setpoints(self):
-        setpoints = {}
-        formatted_messages = []
+        """Send every tunnel and fruit setpoint as one pipelined batch; on_batch_finished shows the result"""
+        items = []
         
-        # Primero los túneles (filas 0-11)
-        for row in range(12):
+        # Primero los túneles (filas 0 a n-1)
+        n = self.num_tunnels
+        for row in range(n):
             tunnel_id = row + 1
             spinbox = self.table.cellWidget(row, 1)
             setpoint = spinbox.value()
             # Formato para setpoint de túnel: SXX,+/-XX.XX (siempre 4 dígitos incluyendo el punto)
             formatted_message = f"S{tunnel_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):05.2f}"
-            formatted_messages.append(formatted_message)
+            items.append((tunnel_id, 'tunnel_setpoint', formatted_message))
         
-        # Luego las frutas (filas 12-23)
-        for row in range(12, 24):
-            fruit_id = row - 12 + 1
+        # Luego las frutas (filas n a 2n-1)
+        for row in range(n, 2 * n):
+            fruit_id = row - n + 1
             spinbox = self.table.cellWidget(row, 1)
             setpoint = spinbox.value()
             formatted_message = f"F{fruit_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):.2f}"
-            formatted_messages.append(formatted_message)
+            items.append((fruit_id, 'fruit_setpoint', formatted_message))
 
         try:
-            # Publicar cada mensaje formateado al topic A_RECIBIR
-            topic = "A_RECIBIR"
-            success = True
-            
-            for message in formatted_messages:
-                if hasattr(self.mqtt_client, 'client') and hasattr(self.mqtt_client.client, 'publish'):
-                    # Usar retain=True y qos=1
-                    self.mqtt_client.client.publish(topic, message, qos=1, retain=True)
-                elif hasattr(self.mqtt_client, 'publish'):
-                    # Usar retain=True y qos=1
-                    self.mqtt_client.publish(topic, message, qos=1, retain=True)
-                elif hasattr(self.mqtt_client, 'send_message'):
-                    # Asumimos que send_message ya tiene configurado retain y qos
-                    if not self.mqtt_client.send_message(topic, message):
-                        success = False
-                else:
-                    raise Exception("No se encontró un método adecuado para publicar mensajes MQTT")
-            
-            if success:
-                # Show success message with better styling
-                # Resto del código permanece igual
+            # Los mensajes van al topic A_RECIBIR (QoS 1, retenidos) con una ventana de envíos sin confirmar
+            batch = self.mqtt_client.publish_batch(items)
+            if not batch:
+                raise Exception("No hay conexión con el broker MQTT")
+            if batch.queued:
                 msg = QMessageBox(self)
                 msg.setIcon(QMessageBox.Information)
-                msg.setWindowTitle("Operación Exitosa")
-                msg.setText("<h3 style='color: #2E7D32;'>Setpoints Guardados</h3>")
-                msg.setInformativeText("Todos los setpoints han sido guardados correctamente.")
+                msg.setWindowTitle("Sin Conexión")
+                msg.setText("<h3 style='color: #455A64;'>Setpoints en Cola</h3>")
+                msg.setInformativeText(f"No hay conexión con el broker MQTT. Los {len(batch.commands)} setpoints "
+                                       "quedaron en cola y se enviarán automáticamente al reconectar.")
                 msg.setStandardButtons(QMessageBox.Ok)
-                msg.setStyleSheet("""
-                    QMessageBox {
-                        background-color: white;
-                    }
-                    QPushButton {
-                        background-color: #43A047;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                        min-width: 100px;
-                    }
-                    QPushButton:hover {
-                        background-color: #388E3C;
-                    }
-                """)
                 msg.exec_()
-                
-                # Highlight all spinboxes to indicate success
-                for row in range(self.table.rowCount()):
-                    spinbox = self.table.cellWidget(row, 1)
-                    spinbox.setStyleSheet("""
-                        QDoubleSpinBox {
-                            padding: 15px;
-                            border: 2px solid #43A047;
-                            border-radius: 10px;
-                            font-size: 24px;
-                            font-weight: bold;
-                            background-color: #E8F5E9;
-                            color: #1B5E20;
-                        }
-                        QDoubleSpinBox:hover {
-                            border-color: #66BB6A;
-                            background-color: #F1F8E9;
-                        }
-                        QDoubleSpinBox:focus {
-                            border-color: #43A047;
-                            box-shadow: 0 0 8px rgba(76, 175, 80, 0.4);
-                            background-color: white;
-                        }
-                        QDoubleSpinBox::up-button, QDoubleSpinBox::down-button {
-                            width: 40px;
-                            height: 35px;
-                            border-radius: 5px;
-                            background-color: #E0E0E0;
-                        }
-                        QDoubleSpinBox::up-button:hover, QDoubleSpinBox::down-button:hover {
-                            background-color: #AED581;
-                        }
-                        QDoubleSpinBox::up-arrow {
-                            image: url(data:image/svg+xml;utf8,<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24"><path fill="#388E3C" d="M7 14l5-5 5 5z"/></svg>);
-                            width: 20px;
-                            height: 20px;
-                        }
-                        QDoubleSpinBox::down-arrow {
-                            image: url(data:image/svg+xml;utf8,<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24"><path fill="#388E3C" d="M7 10l5 5 5-5z"/></svg>);
-                            width: 20px;
-                            height: 20px;
-                        }
-                    """)
+                return
+            self.pending_batch = batch
+            self.save_all_button.setEnabled(False)
+            self.save_all_button.setText("ENVIANDO...")
+            if batch.done:
+                # Acknowledged inside publish_batch (embedded broker): batch_finished came before pending_batch
+                self.on_batch_finished(batch)
         except Exception as e:
             # Show error message with better styling
             msg = QMessageBox(self)
@@ -476,232 +447,227 @@ class SetpointWindow(QWidget):
             """)
             msg.exec_()
 
-    def save_setpoint(self, row, setpoint_type="tunnel"):
-        if setpoint_type == "tunnel":
-            tunnel_id = row + 1
-            spinbox = self.table.cellWidget(row, 1)
-            setpoint = spinbox.value()
-            
-            try:
-                # Formato para setpoint de túnel: SXX,+/-XX.XX (siempre 4 dígitos incluyendo el punto)
-                formatted_setpoint = f"S{tunnel_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):05.2f}"
-                
-                # Usar el topic "A_RECIBIR" para todos los mensajes
-                topic = "A_RECIBIR"
-                success = False
-                
-                # Intenta usar diferentes métodos que podrían existir en el cliente MQTT
-                if hasattr(self.mqtt_client, 'client') and hasattr(self.mqtt_client.client, 'publish'):
-                    # Usar retain=True y qos=1
-                    self.mqtt_client.client.publish(topic, formatted_setpoint, qos=1, retain=True)
-                    success = True
-                elif hasattr(self.mqtt_client, 'publish'):
-                    # Usar retain=True y qos=1
-                    self.mqtt_client.publish(topic, formatted_setpoint, qos=1, retain=True)
-                    success = True
-                elif hasattr(self.mqtt_client, 'send_message'):
-                    # Asumimos que send_message ya tiene configurado retain y qos
-                    success = self.mqtt_client.send_message(topic, formatted_setpoint)
-                elif hasattr(self.mqtt_client, 'set_temperature'):
-                    # Asumimos que set_temperature ya tiene configurado retain y qos
-                    success = self.mqtt_client.set_temperature(tunnel_id, setpoint)
-                else:
-                    raise Exception("No se encontró un método adecuado para publicar mensajes MQTT")
-                
-                if success:
-                    # Show success message with better styling
-                    msg = QMessageBox(self)
-                    msg.setIcon(QMessageBox.Information)
-                    msg.setWindowTitle("Operación Exitosa")
-                    msg.setText(f"<h3 style='color: #2E7D32;'>Setpoint Guardado</h3>")
-                    msg.setInformativeText(f"El setpoint del Túnel {tunnel_id} ha sido configurado a {setpoint}°C correctamente.\nFormato enviado: {formatted_setpoint}\nTopic: {topic}")
-                    # Resto del código permanece igual
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    msg.setStyleSheet("""
-                        QMessageBox {
-                            background-color: white;
-                        }
-                        QPushButton {
-                            background-color: #43A047;
-                            color: white;
-                            border: none;
-                            border-radius: 8px;
-                            padding: 8px 16px;
-                            font-weight: bold;
-                            min-width: 100px;
-                        }
-                        QPushButton:hover {
-                            background-color: #388E3C;
-                        }
-                    """)
-                    msg.exec_()
-                    
-                    # Update the spinbox styling to indicate success
-                    spinbox.setStyleSheet("""
-                        QDoubleSpinBox {
-                            padding: 5px;
-                            border: 2px solid #43A047;
-                            border-radius: 4px;
-                            font-size: 16px;
-                            font-weight: bold;
-                            background-color: #E8F5E9;
-                            color: #1B5E20;
-                        }
-                        QDoubleSpinBox:hover {
-                            border-color: #66BB6A;
-                        }
-                        QDoubleSpinBox:focus {
-                            border-color: #43A047;
-                        }
-                        QDoubleSpinBox::up-button, QDoubleSpinBox::down-button {
-                            width: 25px;
-                            height: 20px;
-                            background-color: #E0E0E0;
-                        }
-                        QDoubleSpinBox::up-button:hover, QDoubleSpinBox::down-button:hover {
-                            background-color: #AED581;
-                        }
-                    """)
-                else:
-                    raise Exception("No se pudo publicar el mensaje MQTT")
-            except Exception as e:
-                # Show error message with better styling
-                msg = QMessageBox(self)
-                msg.setIcon(QMessageBox.Warning)
-                msg.setWindowTitle("Advertencia")
-                msg.setText(f"<h3 style='color: #F57F17;'>Advertencia al Guardar Setpoint</h3>")
-                msg.setInformativeText(f"El setpoint del Túnel {tunnel_id} ha sido enviado, pero no se ha podido confirmar la recepción.\nEl sistema intentará reenviar el mensaje automáticamente.")
-                msg.setDetailedText(f"Detalles técnicos:\n{str(e)}\n\nEsto no significa necesariamente que el setpoint no haya sido configurado. El mensaje puede haber sido enviado correctamente pero la confirmación no fue recibida.")
-                msg.setStandardButtons(QMessageBox.Ok)
-                msg.setStyleSheet("""
-                    QMessageBox {
-                        background-color: white;
-                    }
-                    QPushButton {
-                        background-color: #FFA000;
-                        color: white;
-                        border: none;
-                        border-radius: 8px;
-                        padding: 8px 16px;
+    def on_batch_finished(self, batch):
+        """Show which setpoints of a "Guardar todos" batch were acknowledged"""
+        if batch is not self.pending_batch:
+            return
+        self.pending_batch = None
+        self.save_all_button.setEnabled(True)
+        self.save_all_button.setText("GUARDAR TODOS")
+        # Highlight the spinboxes whose setpoint was confirmed (rows follow the batch order)
+        for row, command in enumerate(batch.commands):
+            if command.state == CONFIRMED:
+                spinbox = self.table.cellWidget(row, 1)
+                spinbox.setStyleSheet("""
+                    QDoubleSpinBox {
+                        padding: 15px;
+                        border: 2px solid #43A047;
+                        border-radius: 10px;
+                        font-size: 24px;
                         font-weight: bold;
-                        min-width: 100px;
+                        background-color: #E8F5E9;
+                        color: #1B5E20;
                     }
-                    QPushButton:hover {
-                        background-color: #FF8F00;
+                    QDoubleSpinBox:hover {
+                        border-color: #66BB6A;
+                        background-color: #F1F8E9;
                     }
-                """)
-                msg.exec_()
-        
-        elif setpoint_type == "fruit":
-            fruit_id = row + 1
-            spinbox = self.table.cellWidget(row + 12, 1)  # +12 porque están después de los túneles
-            setpoint = spinbox.value()
-            
-            try:
-                # Formato para setpoint de fruta: FXX,+/-XX.XX
-                formatted_setpoint = f"F{fruit_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):.2f}"
-                
-                # Usar el mismo topic "A_RECIBIR" para todos los mensajes
-                topic = "A_RECIBIR"
-                success = False
-                
-                # Intenta usar diferentes métodos que podrían existir en el cliente MQTT
-                if hasattr(self.mqtt_client, 'client') and hasattr(self.mqtt_client.client, 'publish'):
-                    # Añadir retain=True y qos=1 para los setpoints de fruta
-                    self.mqtt_client.client.publish(topic, formatted_setpoint, qos=1, retain=True)
-                    success = True
-                elif hasattr(self.mqtt_client, 'publish'):
-                    # Añadir retain=True y qos=1 para los setpoints de fruta
-                    self.mqtt_client.publish(topic, formatted_setpoint, qos=1, retain=True)
-                    success = True
-                elif hasattr(self.mqtt_client, 'send_message'):
-                    success = self.mqtt_client.send_message(topic, formatted_setpoint)
-                elif hasattr(self.mqtt_client, 'set_temperature'):
-                    # Si existe set_temperature, asumimos que internamente usa el topic correcto
-                    success = self.mqtt_client.set_temperature(fruit_id, setpoint, is_fruit=True)
-                else:
-                    raise Exception("No se encontró un método adecuado para publicar mensajes MQTT")
-                
-                # Resto del código permanece igual
-                if success:
-                    # Show success message
-                    msg = QMessageBox(self)
-                    msg.setIcon(QMessageBox.Information)
-                    msg.setWindowTitle("Operación Exitosa")
-                    msg.setText(f"<h3 style='color: #8E24AA;'>Setpoint de Fruta Guardado</h3>")
-                    msg.setInformativeText(f"El setpoint de Fruta {fruit_id} ha sido configurado a {setpoint}°C correctamente.\nFormato enviado: {formatted_setpoint}\nTopic: {topic}")
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    msg.setStyleSheet("""
-                        QMessageBox {
-                            background-color: white;
-                        }
-                        QPushButton {
-                            background-color: #8E24AA;
-                            color: white;
-                            border: none;
-                            border-radius: 8px;
-                            padding: 8px 16px;
-                            font-weight: bold;
-                            min-width: 100px;
-                        }
-                        QPushButton:hover {
-                            background-color: #7B1FA2;
-                        }
-                    """)
-                    msg.exec_()
-                    
-                    # Update the spinbox styling to indicate success
-                    spinbox.setStyleSheet("""
-                        QDoubleSpinBox {
-                            padding: 5px;
-                            border: 2px solid #8E24AA;
-                            border-radius: 4px;
-                            font-size: 16px;
-                            font-weight: bold;
-                            background-color: #F3E5F5;
-                            color: #6A1B9A;
-                        }
-                        QDoubleSpinBox:hover {
-                            border-color: #AB47BC;
-                        }
-                        QDoubleSpinBox:focus {
-                            border-color: #8E24AA;
-                        }
-                        QDoubleSpinBox::up-button, QDoubleSpinBox::down-button {
-                            width: 25px;
-                            height: 20px;
-                            background-color: #E0E0E0;
-                        }
-                        QDoubleSpinBox::up-button:hover, QDoubleSpinBox::down-button:hover {
-                            background-color: #CE93D8;
-                        }
-                    """)
-                else:
-                    raise Exception("No se pudo publicar el mensaje MQTT")
-            except Exception as e:
-                # Show error message
-                msg = QMessageBox(self)
-                msg.setIcon(QMessageBox.Warning)
-                msg.setWindowTitle("Advertencia")
-                msg.setText(f"<h3 style='color: #F57F17;'>Advertencia al Guardar Setpoint de Fruta</h3>")
-                msg.setInformativeText(f"El setpoint de Fruta {fruit_id} ha sido enviado, pero no se ha podido confirmar la recepción.\nEl sistema intentará reenviar el mensaje automáticamente.")
-                msg.setDetailedText(f"Detalles técnicos:\n{str(e)}\n\nEsto no significa necesariamente que el setpoint no haya sido configurado. El mensaje puede haber sido enviado correctamente pero la confirmación no fue recibida.")
-                msg.setStandardButtons(QMessageBox.Ok)
-                msg.setStyleSheet("""
-                    QMessageBox {
+                    QDoubleSpinBox:focus {
+                        border-color: #43A047;
+                        box-shadow: 0 0 8px rgba(76, 175, 80, 0.4);
                         background-color: white;
                     }
-                    QPushButton {
-                        background-color: #FFA000;
-                        color: white;
-                        border: none;
-                        border-radius: 8px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                        min-width: 100px;
+                    QDoubleSpinBox::up-button, QDoubleSpinBox::down-button {
+                        width: 40px;
+                        height: 35px;
+                        border-radius: 5px;
+                        background-color: #E0E0E0;
+                    }
+                    QDoubleSpinBox::up-button:hover, QDoubleSpinBox::down-button:hover {
+                        background-color: #AED581;
                     }
-                    QPushButton:hover {
-                        background-color: #FF8F00;
+                    QDoubleSpinBox::up-arrow {
+                        image: url(data:image/svg+xml;utf8,<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24"><path fill="#388E3C" d="M7 14l5-5 5 5z"/></svg>);
+                        width: 20px;
+                        height: 20px;
+                    }
+                    QDoubleSpinBox::down-arrow {
+                        image: url(data:image/svg+xml;utf8,<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24"><path fill="#388E3C" d="M7 10l5 5 5-5z"/></svg>);
+                        width: 20px;
+                        height: 20px;
                     }
                 """)
-                msg.exec_()
\ No newline at end of file
+
+        failed = batch.failed
+        if failed:
+            names = ", ".join(f"{'Túnel' if command.kind == 'tunnel_setpoint' else 'Fruta'} {command.tunnel_id}"
+                              for command in failed)
+            msg = QMessageBox(self)
+            msg.setIcon(QMessageBox.Warning)
+            msg.setWindowTitle("Advertencia")
+            msg.setText("<h3 style='color: #F57F17;'>Setpoints sin confirmar</h3>")
+            msg.setInformativeText(f"{len(batch.confirmed)} de {len(batch.commands)} setpoints fueron confirmados.\n"
+                                   f"Sin confirmación: {names}")
+            msg.setDetailedText("\n".join(f"{command.payload}: {command.state}" for command in batch.commands))
+            msg.setStandardButtons(QMessageBox.Ok)
+            msg.setStyleSheet("""
+                QMessageBox {
+                    background-color: white;
+                }
+                QPushButton {
+                    background-color: #FFA000;
+                    color: white;
+                    border: none;
+                    border-radius: 8px;
+                    padding: 8px 16px;
+                    font-weight: bold;
+                    min-width: 100px;
+                }
+                QPushButton:hover {
+                    background-color: #FF8F00;
+                }
+            """)
+            msg.exec_()
+        else:
+            # Show success message with better styling
+            msg = QMessageBox(self)
+            msg.setIcon(QMessageBox.Information)
+            msg.setWindowTitle("Operación Exitosa")
+            msg.setText("<h3 style='color: #2E7D32;'>Setpoints Guardados</h3>")
+            msg.setInformativeText(f"Los {len(batch.commands)} setpoints fueron confirmados en {batch.elapsed * 1000:.0f} ms.")
+            msg.setStandardButtons(QMessageBox.Ok)
+            msg.setStyleSheet("""
+                QMessageBox {
+                    background-color: white;
+                }
+                QPushButton {
+                    background-color: #43A047;
+                    color: white;
+                    border: none;
+                    border-radius: 4px;
+                    padding: 8px 16px;
+                    font-weight: bold;
+                    min-width: 100px;
+                }
+                QPushButton:hover {
+                    background-color: #388E3C;
+                }
+            """)
+            msg.exec_()
+
+    def save_setpoint(self, row, setpoint_type="tunnel"):
+        """Send one tunnel or fruit setpoint; the row shows it as pending until on_command_status reports it"""
+        setpoint_id = row + 1
+        table_row = row if setpoint_type == "tunnel" else row + self.num_tunnels  # fruits after the tunnel rows
+        setpoint = self.table.cellWidget(table_row, 1).value()
+        if setpoint_type == "tunnel":
+            # Formato para setpoint de túnel: SXX,+/-XX.XX (siempre 4 dígitos incluyendo el punto)
+            formatted_setpoint = f"S{setpoint_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):05.2f}"
+        else:
+            # Formato para setpoint de fruta: FXX,+/-XX.XX
+            formatted_setpoint = f"F{setpoint_id:02d},{'+' if setpoint >= 0 else '-'}{abs(setpoint):.2f}"
+        name = f"{'Túnel' if setpoint_type == 'tunnel' else 'Fruta'} {setpoint_id}"
+
+        # Topic "A_RECIBIR" (QoS 1, retenido); sin conexión queda en la cola de comandos
+        command = self.mqtt_client.send_setpoint(setpoint_id, formatted_setpoint, is_fruit=setpoint_type == "fruit")
+        if not command:
+            self.show_message(QMessageBox.Critical, "Sin Conexión", "#C62828", "Setpoint no Enviado",
+                              f"No hay conexión con el broker MQTT: el setpoint de {name} ({setpoint}°C) "
+                              "no fue enviado.", "#EF5350", "#E53935")
+            return
+        # Confirmed, failed or cancelled later: the dialog is shown by on_command_status
+        self.pending_setpoints[command] = (table_row, setpoint_type, name, setpoint)
+        if command.state in (CONFIRMED, FAILED, CANCELLED):
+            # Acknowledged inside send_setpoint (embedded broker): command_status came before the registration
+            self.on_command_status(command)
+            return
+        self.show_setpoint_state(command)
+        if command.state == QUEUED:
+            self.show_message(QMessageBox.Information, "Sin Conexión", "#455A64", "Setpoint en Cola",
+                              f"Sin conexión con el broker: el setpoint de {name} ({setpoint}°C) quedó en cola "
+                              f"y se enviará al reconectar.\nFormato: {formatted_setpoint}", "#546E7A", "#455A64")
+
+    def on_command_status(self, command):
+        """Report the outcome of a setpoint sent with save_setpoint (held, pending, queued, then done)"""
+        if command not in self.pending_setpoints:
+            return
+        self.show_setpoint_state(command)
+        if command.state not in (CONFIRMED, FAILED, CANCELLED):
+            return
+        table_row, setpoint_type, name, setpoint = self.pending_setpoints.pop(command)
+        if command.state == CONFIRMED:
+            accent, hover, light, dark, arrows = (("#43A047", "#388E3C", "#E8F5E9", "#1B5E20", "#AED581")
+                                                  if setpoint_type == "tunnel" else
+                                                  ("#8E24AA", "#7B1FA2", "#F3E5F5", "#6A1B9A", "#CE93D8"))
+            # Update the spinbox styling to indicate success
+            self.table.cellWidget(table_row, 1).setStyleSheet(f"""
+                QDoubleSpinBox {{
+                    padding: 5px;
+                    border: 2px solid {accent};
+                    border-radius: 4px;
+                    font-size: 16px;
+                    font-weight: bold;
+                    background-color: {light};
+                    color: {dark};
+                }}
+                QDoubleSpinBox:focus {{
+                    border-color: {accent};
+                }}
+                QDoubleSpinBox::up-button, QDoubleSpinBox::down-button {{
+                    width: 25px;
+                    height: 20px;
+                    background-color: #E0E0E0;
+                }}
+                QDoubleSpinBox::up-button:hover, QDoubleSpinBox::down-button:hover {{
+                    background-color: {arrows};
+                }}
+            """)
+            self.show_message(QMessageBox.Information, "Operación Exitosa", dark, "Setpoint Guardado",
+                              f"El broker confirmó la recepción del setpoint de {name}: {setpoint}°C "
+                              f"({command.latency * 1000:.0f} ms).\nFormato enviado: {command.payload}",
+                              accent, hover)
+        elif command.state == FAILED:
+            self.show_message(QMessageBox.Warning, "Advertencia", "#F57F17", "Setpoint sin Confirmar",
+                              f"El setpoint de {name} ({setpoint}°C) no fue confirmado tras "
+                              f"{command.attempts} intentos. Verifique la conexión y vuelva a guardarlo.",
+                              "#FFA000", "#FF8F00")
+        # CANCELLED: a later save in the same burst restored the value the PLC already has, nothing was sent
+
+    def show_setpoint_state(self, command):
+        """Save button of the setpoint's row: pending, queued, or ready again once the command is done"""
+        table_row = self.pending_setpoints[command][0]
+        button = self.table.cellWidget(table_row, 2)
+        if command.state in (HELD, PENDING):
+            button.setText("ENVIANDO...")
+        elif command.state == QUEUED:
+            button.setText("EN COLA")
+        else:
+            button.setText("GUARDAR")
+
+    def show_message(self, icon, title, heading_color, heading, text, button_color, hover_color):
+        """Non-blocking message box (open(), not exec_()): results may arrive while the operator keeps working"""
+        msg = QMessageBox(self)
+        msg.setAttribute(Qt.WA_DeleteOnClose)
+        msg.setIcon(icon)
+        msg.setWindowTitle(title)
+        msg.setText(f"<h3 style='color: {heading_color};'>{heading}</h3>")
+        msg.setInformativeText(text)
+        msg.setStandardButtons(QMessageBox.Ok)
+        msg.setStyleSheet(f"""
+            QMessageBox {{
+                background-color: white;
+            }}
+            QPushButton {{
+                background-color: {button_color};
+                color: white;
+                border: none;
+                border-radius: 8px;
+                padding: 8px 16px;
+                font-weight: bold;
+                min-width: 100px;
+            }}
+            QPushButton:hover {{
+                background-color: {hover_color};
+            }}
+        """)
+        msg.open()
@@ -0,0 +1,126 @@
+import os
+import time
+
+import numpy as np
+
+from tunnel_state import DISPLAY_DECIMALS
+
+# One row per tunnel: the displayed fields of TunnelState, in DISPLAY_DECIMALS
+# order, and the time they were received. Unknown values are stored as NaN
+# (numbers) or -1 (running/defrosting, i.e. the PID and fan status); a
+# tunnel never heard from has a NaN last_seen and is not restored.
+SNAPSHOT_DTYPE = np.dtype([('tunnel_id', np.int16)]
+                          + [(field, np.int8 if decimals is None else np.float32)
+                             for field, decimals in DISPLAY_DECIMALS.items()]
+                          + [('last_seen', np.float64)])
+
+
+class StateSnapshot:
+    """Latest per-tunnel state on disk, so the panel shows values as soon as it starts.
+
+    The file is a single .npy array (SNAPSHOT_DTYPE), one small row per
+    tunnel: ``restore`` reads it in one call and copies the rows into the
+    state model, without reading or parsing any history. ``save`` writes a
+    temporary file and renames it over the previous snapshot, so a reader
+    never sees a partial file; it is not fsynced (a snapshot lost to a power
+    cut only means an older or no warm start). Saving is skipped while the
+    model has not changed since the last save.
+
+    A field the model does not know at save time (not received yet, or
+    invalidated by a local change until the PLC echoes it) keeps the value of
+    the previous snapshot instead of being saved as unknown.
+    """
+
+    def __init__(self, path='state_snapshot.npy', interval=10.0):
+        """
+        Args:
+            path (str): Snapshot file
+            interval (float): Seconds between saves, for the owner's timer
+        """
+        self.path = path
+        self.interval = interval
+        self.saved_changes = None  # state model change counter at the last save
+        self.saved_rows = {}  # tunnel_id -> row of the last snapshot saved or restored
+        self.save_count = 0
+        self.save_time = 0.0
+        self.restored_count = 0
+        self.restore_time = None
+
+    def save(self, state_model):
+        """Write the current state of every tunnel
+
+        Args:
+            state_model (TunnelStateModel): Model to save
+
+        Returns:
+            bool: False if nothing changed since the last save
+        """
+        if state_model.changed_count == self.saved_changes:
+            return False
+        start = time.perf_counter()
+        rows = []
+        for state in state_model.states.values():
+            previous = self.saved_rows.get(state.tunnel_id)
+            row = [state.tunnel_id]
+            for index, (field, decimals) in enumerate(DISPLAY_DECIMALS.items(), 1):
+                value = state.get(field)
+                if value is None:
+                    value = previous[index] if previous is not None else -1 if decimals is None else np.nan
+                row.append(value)
+            if state.last_seen is not None:
+                row.append(state.last_seen)
+            else:
+                row.append(previous[-1] if previous is not None else np.nan)
+            rows.append(tuple(row))
+        snapshot = np.array(rows, dtype=SNAPSHOT_DTYPE)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.save(f, snapshot)
+        os.replace(temporary, self.path)
+        self.saved_rows = {row[0]: row for row in rows}
+        self.saved_changes = state_model.changed_count
+        self.save_count += 1
+        self.save_time += time.perf_counter() - start
+        return True
+
+    def restore(self, state_model):
+        """Load the snapshot into the model, marking the restored tunnels stale
+
+        A missing, empty, truncated or differently shaped file (e.g. from
+        another version of the panel) is ignored.
+
+        Returns:
+            int: Number of tunnels restored
+        """
+        start = time.perf_counter()
+        try:
+            snapshot = np.load(self.path, allow_pickle=False)
+        except (OSError, ValueError, EOFError):
+            return 0
+        if snapshot.dtype != SNAPSHOT_DTYPE or snapshot.ndim != 1:
+            return 0
+        rows = snapshot.tolist()
+        self.saved_rows = {row[0]: row for row in rows}
+        restored = 0
+        for row in rows:
+            tunnel_id, last_seen = row[0], row[-1]
+            if tunnel_id not in state_model or last_seen != last_seen:
+                continue
+            fields = {}
+            for (field, decimals), value in zip(DISPLAY_DECIMALS.items(), row[1:-1]):
+                if decimals is None:
+                    if value >= 0:
+                        fields[field] = value
+                elif value == value:  # not NaN
+                    fields[field] = value
+            state_model.restore(tunnel_id, last_seen, **fields)
+            restored += 1
+        self.restored_count = restored
+        self.restore_time = time.perf_counter() - start
+        return restored
+
+    def stats(self):
+        stats = {'saves': self.save_count, 'save_ms': self.save_time * 1000, 'restored': self.restored_count}
+        if self.restore_time is not None:
+            stats['restore_ms'] = self.restore_time * 1000
+        return stats
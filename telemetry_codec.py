@@ -0,0 +1,186 @@
+import json
+import re
+from collections import namedtuple
+from operator import itemgetter
+
+import numpy as np
+
+# Frame format sent by the PLC on the receive topic (A_ENVIAR), one group per tunnel:
+# TXX,T.S,T.E,T.I,SP_Tunel,SP_Fruta,Estado_PID,Estado_Ventilador
+FIELDS_PER_GROUP = 8
+
+TELEMETRY_DTYPE = np.dtype([
+    ('tunnel_id', np.int16),
+    ('temp_output', np.float32),
+    ('temp_external', np.float32),
+    ('temp_internal', np.float32),
+    ('tunnel_setpoint', np.float32),
+    ('fruit_setpoint', np.float32),
+    ('pid', np.bool_),
+    ('fan', np.bool_),
+])
+
+# Numeric columns of a group, in frame order
+NUMERIC_FIELDS = ('temp_output', 'temp_external', 'temp_internal', 'tunnel_setpoint', 'fruit_setpoint')
+
+# Same tokens the original per-group parser accepted as "on"
+TRUE_TOKENS = frozenset(('true', '1', 't', 'y', 'yes'))
+
+_FLOAT_RE = re.compile(r'\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?\s*$')
+_ID_RE = re.compile(r'\s*T\d{2,}\s*$')
+# Flag fields the fast path decodes numerically; any other token goes through _flags
+_FAST_FLAGS = frozenset(('0', '1'))
+_strip_prefix = itemgetter(slice(1, None))
+
+# Same field names as TELEMETRY_DTYPE, all float64: a parsed (N, 8) buffer can be viewed as it
+_FLAT_DTYPE = np.dtype([(name, np.float64) for name in TELEMETRY_DTYPE.names])
+
+DecodedFrame = namedtuple('DecodedFrame', ['records', 'malformed', 'trailing'])
+DecodedFrame.__doc__ = """Result of decoding one telemetry frame.
+
+    records: structured array (TELEMETRY_DTYPE) with one row per valid group
+    malformed: indices of the 8-field groups that could not be decoded
+    trailing: number of leftover fields that did not form a complete group
+"""
+
+# Events produced by decode_message(), ready to be applied by the GUI or the headless service
+TelemetryEvent = namedtuple('TelemetryEvent', ['records'])
+SetpointEvent = namedtuple('SetpointEvent', ['kind', 'tunnel_id', 'value'])
+TemperatureEvent = namedtuple('TemperatureEvent', ['tunnel_id', 'output_temp', 'external_temp', 'internal_temp'])
+StatusEvent = namedtuple('StatusEvent', ['tunnel_id', 'field', 'value'])
+
+
+def is_setpoint_message(payload):
+    """Return True for the SXX,+/-XX.XX and FXX,+/-XX.XX setpoint echoes (XX may have more digits)"""
+    return (payload.startswith("S") or payload.startswith("F")) and len(payload) >= 9
+
+
+def decode_setpoint(payload):
+    """Decode a setpoint echo.
+
+    Returns:
+        tuple: (kind, tunnel_id, value) with kind 'tunnel' or 'fruit', or None if malformed
+    """
+    kind = 'tunnel' if payload[0] == 'S' else 'fruit'
+    # Ids are zero-padded to 2 digits but may be longer (S100,...), so split on the first comma
+    id_str, separator, value_str = payload[1:].partition(',')
+    if not separator or not id_str.isdecimal() or _FLOAT_RE.match(value_str) is None:
+        return None
+    return kind, int(id_str), float(value_str)
+
+
+def _flags(column):
+    return list(map(TRUE_TOKENS.__contains__, map(str.lower, map(str.strip, column))))
+
+
+def _build_records(columns):
+    """Assemble the structured array from the 8 already-validated text columns"""
+    records = np.empty(len(columns[0]), dtype=TELEMETRY_DTYPE)
+    records['tunnel_id'] = list(map(int, map(_strip_prefix, map(str.strip, columns[0]))))
+    for name, column in zip(NUMERIC_FIELDS, columns[1:6]):
+        records[name] = list(map(float, column))
+    records['pid'] = _flags(columns[6])
+    records['fan'] = _flags(columns[7])
+    return records
+
+
+def decode_frame(payload):
+    """Decode a whole multi-tunnel TXX frame in one pass.
+
+    In the common case (TXX ids, finite numeric fields, 0/1 flags) the 'T'
+    prefixes are dropped and the frame is parsed with a single C-level
+    ``map(float, ...)`` into a flat buffer that is reinterpreted as (N, 8)
+    and cast once into the structured array. No per-group
+    float()/strip()/lower() calls and no try/except per group. The fast path
+    accepts exactly what the regexes accept: a frame with anything else
+    (1-digit or fractional ids, nan/inf, other flag tokens) is validated once
+    with the regexes; malformed groups are reported in ``malformed`` and the
+    rest are still decoded.
+
+    Args:
+        payload (str): Raw frame as received from the PLC
+
+    Returns:
+        DecodedFrame: decoded records plus malformed group indices
+    """
+    num_fields = payload.count(',') + 1
+    num_groups = num_fields // FIELDS_PER_GROUP
+    end = num_groups * FIELDS_PER_GROUP
+    trailing = num_fields - end
+
+    if payload.count('T') == num_groups and '_' not in payload:
+        fields = payload.split(',', end)[:end]
+        # One 'T' per group, so if every id field starts with it there is none elsewhere
+        ids = fields[0:end:FIELDS_PER_GROUP]
+        if num_groups and all(id_field[:1] == 'T' for id_field in ids):
+            ids = fields[0:end:FIELDS_PER_GROUP] = list(map(_strip_prefix, ids))
+        # float() is laxer than the grammar: ids must be 2+ plain digits and flags exactly 0 or 1
+        if (num_groups and all(map(str.isdecimal, ids)) and min(map(len, ids)) >= 2
+                and _FAST_FLAGS.issuperset(fields[6:end:FIELDS_PER_GROUP])
+                and _FAST_FLAGS.issuperset(fields[7:end:FIELDS_PER_GROUP])):
+            try:
+                flat = np.fromiter(map(float, fields), dtype=np.float64, count=end)
+            except ValueError:
+                flat = None
+            # float() also takes nan and inf, which the grammar (and the historian's sums) do not
+            if flat is not None and np.isfinite(flat).all():
+                return DecodedFrame(flat.view(_FLAT_DTYPE).astype(TELEMETRY_DTYPE),
+                                    np.empty(0, dtype=np.intp), trailing)
+    return _decode_validated(payload, num_groups, end, trailing)
+
+
+def _decode_validated(payload, num_groups, end, trailing):
+    """Slow path of decode_frame: validate each group once, without exceptions, then decode the good ones"""
+    values = payload.split(',')
+    columns = [values[field:end:FIELDS_PER_GROUP] for field in range(FIELDS_PER_GROUP)]
+    valid = np.fromiter(map(_ID_RE.match, columns[0]), dtype=bool, count=num_groups)
+    for column in columns[1:6]:
+        valid &= np.fromiter(map(_FLOAT_RE.match, column), dtype=bool, count=num_groups)
+    good = np.flatnonzero(valid).tolist()
+    good_columns = [[column[i] for i in good] for column in columns]
+    return DecodedFrame(_build_records(good_columns), np.flatnonzero(~valid), trailing)
+
+
+def defrost_mask(records):
+    """Defrost is signalled by the PLC as PID off (0) and fan on (1)"""
+    return ~records['pid'] & records['fan']
+
+
+def decode_json_message(data):
+    """Decode the legacy JSON format ({"tunnel_id": X, "temp_output": ..., ...})"""
+    events = []
+    if 'tunnel_id' in data:
+        tunnel_id = int(data['tunnel_id'])
+        if all(key in data for key in ['temp_output', 'temp_external', 'temp_internal']):
+            events.append(TemperatureEvent(tunnel_id, float(data['temp_output']),
+                                           float(data['temp_external']), float(data['temp_internal'])))
+        if 'defrost_status' in data:
+            events.append(StatusEvent(tunnel_id, 'defrosting', bool(data['defrost_status'])))
+        if 'running_status' in data:
+            events.append(StatusEvent(tunnel_id, 'running', bool(data['running_status'])))
+    return events
+
+
+def decode_message(payload):
+    """Decode one message of the receive topic (A_ENVIAR) into events.
+
+    Args:
+        payload (bytes): Raw MQTT payload
+
+    Returns:
+        tuple: (events, malformed) where malformed lists the TXX groups that were skipped
+
+    Raises:
+        ValueError: If the payload is not valid text, JSON or setpoint echo
+    """
+    text = payload.decode()
+    if text.startswith('{'):
+        return decode_json_message(json.loads(text)), []
+    if is_setpoint_message(text):
+        setpoint = decode_setpoint(text)
+        if setpoint is None:
+            raise ValueError(f"Invalid setpoint message: {text}")
+        return [SetpointEvent(*setpoint)], []
+    frame = decode_frame(text)
+    events = [TelemetryEvent(frame.records)] if len(frame.records) else []
+    return events, frame.malformed.tolist()
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_coalescer import CommandCoalescer, MAX_HOLD_WINDOWS  # noqa: E402
+from command_tracker import HELD, CANCELLED  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_coalescer(window=0.4):
+    sent, changes, clock = [], [], FakeClock()
+    coalescer = CommandCoalescer(sent.append, window, on_change=changes.append, clock=clock)
+    return coalescer, sent, changes, clock
+
+
+def test_burst_is_sent_once_with_the_last_payload():
+    coalescer, sent, changes, clock = make_coalescer()
+    first = coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+01.00')
+    assert first.state == HELD
+    clock.now = 0.3
+    assert coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+02.00') is first
+
+    # The second action restarted the window
+    clock.now = 0.5
+    assert coalescer.flush_due() == pytest.approx(0.2)
+    assert sent == []
+    clock.now = 0.7
+    assert coalescer.flush_due() is None
+    assert sent == [first]
+    assert first.payload == 'S03,+02.00'
+    assert changes == [first]
+    stats = coalescer.stats()
+    assert (stats['actions'], stats['sent'], stats['coalesced'], stats['held']) == (2, 1, 1, 0)
+
+
+def test_burst_ending_on_its_baseline_is_cancelled():
+    coalescer, sent, changes, clock = make_coalescer()
+    command = coalescer.submit(3, 'defrost', 'A_RECIBIR', '03,1,0', previous='03,0,0')
+    coalescer.submit(3, 'defrost', 'A_RECIBIR', '03,0,0', previous='03,1,0')
+    clock.now = 1.0
+    coalescer.flush_due()
+    assert sent == []
+    assert command.state == CANCELLED
+    assert command.future.cancelled()
+    assert changes == [command]
+    assert coalescer.stats()['cancelled'] == 1
+
+
+def test_mode_burst_sends_only_the_last_action():
+    coalescer, sent, changes, clock = make_coalescer()
+    # Running tunnel: defrost on, then stop
+    coalescer.submit(3, 'defrost', 'A_RECIBIR', '03,1,0', previous='03,1,1')
+    command = coalescer.submit(3, 'stop', 'A_RECIBIR', '03,0,0', previous='03,1,0')
+    clock.now = 1.0
+    coalescer.flush_due()
+    assert sent == [command]
+    assert (command.kind, command.payload) == ('stop', '03,0,0')
+
+    # Stopped tunnel: start, defrost on, stop is net zero
+    coalescer.submit(3, 'start', 'A_RECIBIR', '03,1,1', previous='03,0,0')
+    coalescer.submit(3, 'defrost', 'A_RECIBIR', '03,1,0', previous='03,1,1')
+    command = coalescer.submit(3, 'stop', 'A_RECIBIR', '03,0,0', previous='03,1,0')
+    clock.now = 2.0
+    coalescer.flush_due()
+    assert len(sent) == 1
+    assert command.state == CANCELLED
+
+
+def test_baseline_does_not_outlive_the_burst():
+    coalescer, sent, changes, clock = make_coalescer()
+    coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+01.00')
+    clock.now = 1.0
+    coalescer.flush_due()
+    # Saving the same value again is a new burst without baseline: it is sent again
+    coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+01.00')
+    clock.now = 2.0
+    coalescer.flush_due()
+    assert [command.payload for command in sent] == ['S03,+01.00', 'S03,+01.00']
+
+
+def test_burst_is_not_held_longer_than_max_windows():
+    coalescer, sent, changes, clock = make_coalescer(window=0.4)
+    coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+00.00')
+    for step in range(1, 20):
+        clock.now = step * 0.3
+        coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', f"S03,+{step:02d}.00")
+        coalescer.flush_due()
+        if sent:
+            break
+    assert clock.now <= 0.4 * MAX_HOLD_WINDOWS + 0.3
+    assert len(sent) == 1
+
+
+def test_settings_are_held_separately_and_force_flushes_all():
+    coalescer, sent, changes, clock = make_coalescer()
+    coalescer.submit(3, 'tunnel_setpoint', 'A_RECIBIR', 'S03,+01.00')
+    coalescer.submit(3, 'fruit_setpoint', 'A_RECIBIR', 'F03,+01.00')
+    coalescer.submit(4, 'tunnel_setpoint', 'A_RECIBIR', 'S04,+01.00')
+    assert coalescer.flush_due(force=True) is None
+    assert sorted(command.payload for command in sent) == ['F03,+01.00', 'S03,+01.00', 'S04,+01.00']
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_queue import OfflineCommandQueue, command_key  # noqa: E402
+from command_tracker import TrackedCommand, QUEUED  # noqa: E402
+
+
+def command(tunnel_id, kind, payload):
+    return TrackedCommand(tunnel_id, kind, 'A_RECIBIR', payload, 1, True)
+
+
+def pending(queue):
+    return [(c.tunnel_id, c.kind, c.payload) for c in queue.pending()]
+
+
+def test_start_stop_and_defrost_share_one_key():
+    assert command_key(3, 'start', '03,1,1') == command_key(3, 'defrost', '03,1,0') == command_key(3, 'stop', '03,0,0')
+    assert command_key(3, 'start', '03,1,1') != command_key(4, 'start', '04,1,1')
+    assert command_key(3, 'calibration', 'A03,+01.5') != command_key(3, 'calibration', 'E03,+01.5')
+
+
+def test_newest_command_per_setting_is_kept(tmp_path):
+    queue = OfflineCommandQueue(str(tmp_path / 'queue.jsonl'))
+    first = command(3, 'tunnel_setpoint', 'S03,+01.00')
+    queue.put(first)
+    assert first.state == QUEUED
+    queue.put(command(3, 'tunnel_setpoint', 'S03,+02.00'))
+    queue.put(command(3, 'defrost', '03,1,0'))
+    queue.put(command(3, 'stop', '03,0,0'))
+    assert pending(queue) == [(3, 'stop', '03,0,0'), (3, 'tunnel_setpoint', 'S03,+02.00')]
+    assert queue.stats()['replaced'] == 2
+    queue.close()
+
+
+def test_replay_order_is_priority_then_queue_order(tmp_path):
+    queue = OfflineCommandQueue(str(tmp_path / 'queue.jsonl'))
+    queue.put(command(1, 'calibration', 'A01,+00.5'))
+    queue.put(command(2, 'fruit_setpoint', 'F02,-01.00'))
+    queue.put(command(2, 'defrost', '02,1,0'))
+    queue.put(command(1, 'start', '01,1,1'))
+    queue.put(command(1, 'tunnel_setpoint', 'S01,+01.00'))
+    assert pending(queue) == [(2, 'defrost', '02,1,0'), (1, 'start', '01,1,1'),
+                              (2, 'fruit_setpoint', 'F02,-01.00'), (1, 'tunnel_setpoint', 'S01,+01.00'),
+                              (1, 'calibration', 'A01,+00.5')]
+    queue.close()
+
+
+def test_queue_is_reloaded_from_the_file(tmp_path):
+    path = str(tmp_path / 'queue.jsonl')
+    queue = OfflineCommandQueue(path)
+    setpoint = command(3, 'tunnel_setpoint', 'S03,+01.00')
+    queue.put(setpoint)
+    queue.put(command(4, 'stop', '04,0,0'))
+    queue.done(setpoint)
+    queue.close()
+
+    reloaded = OfflineCommandQueue(path)
+    assert pending(reloaded) == [(4, 'stop', '04,0,0')]
+    assert all(c.state == QUEUED for c in reloaded.pending())
+    reloaded.close()
+
+
+def test_done_of_a_replaced_command_keeps_the_newer_one(tmp_path):
+    queue = OfflineCommandQueue(str(tmp_path / 'queue.jsonl'))
+    old = command(3, 'tunnel_setpoint', 'S03,+01.00')
+    queue.put(old)
+    queue.put(command(3, 'tunnel_setpoint', 'S03,+02.00'))
+    queue.done(old)
+    assert pending(queue) == [(3, 'tunnel_setpoint', 'S03,+02.00')]
+    queue.discard(3, 'tunnel_setpoint', 'S03,+03.00')
+    assert pending(queue) == []
+    queue.close()
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'queue.jsonl')
+    queue = OfflineCommandQueue(path)
+    queue.put(command(3, 'stop', '03,0,0'))
+    queue.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "put", "seq": 9, "tunnel_id": 4, "ki')
+    reloaded = OfflineCommandQueue(path)
+    assert pending(reloaded) == [(3, 'stop', '03,0,0')]
+    reloaded.close()
+
+
+def test_done_lines_with_the_old_mode_keys_still_apply(tmp_path):
+    path = str(tmp_path / 'queue.jsonl')
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in ({'op': 'put', 'seq': 1, 'tunnel_id': 3, 'kind': 'defrost', 'topic': 'A_RECIBIR',
+                        'payload': '03,1,0'},
+                       {'op': 'done', 'seq': 1, 'key': [3, 'defrost']}):
+            f.write(json.dumps(record) + '\n')
+    queue = OfflineCommandQueue(path)
+    assert pending(queue) == []
+    queue.close()
+
+
+def test_file_is_compacted(tmp_path):
+    path = str(tmp_path / 'queue.jsonl')
+    queue = OfflineCommandQueue(path, compact_ratio=4)
+    for i in range(200):
+        queue.put(command(3, 'tunnel_setpoint', f"S03,+{i % 10:02d}.00"))
+    queue.close()
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) <= 4 * 16 + 1
+    reloaded = OfflineCommandQueue(path)
+    assert pending(reloaded) == [(3, 'tunnel_setpoint', 'S03,+09.00')]
+    reloaded.close()
@@ -0,0 +1,173 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_tracker import (CommandBatch, CommandTimeout, CommandTracker, TrackedCommand,  # noqa: E402
+                             CONFIRMED, FAILED, PENDING)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBroker:
+    """publish() for the tracker: hands out message ids and optionally acknowledges inside the call"""
+
+    def __init__(self, sync_ack=False):
+        self.tracker = None
+        self.sync_ack = sync_ack
+        self.published = []
+        self.refuse = 0  # number of next publications that fail (mid None)
+
+    def publish(self, topic, payload, qos, retain):
+        if self.refuse:
+            self.refuse -= 1
+            return None
+        self.published.append(payload)
+        mid = len(self.published)
+        if self.sync_ack:
+            self.tracker.acknowledge(mid)
+        return mid
+
+
+def make_tracker(sync_ack=False, **kwargs):
+    broker = FakeBroker(sync_ack)
+    clock = FakeClock()
+    changes = []
+    tracker = CommandTracker(broker.publish, on_change=changes.append, clock=clock, **kwargs)
+    broker.tracker = tracker
+    return tracker, broker, clock, changes
+
+
+def test_command_is_pending_until_acknowledged():
+    tracker, broker, clock, changes = make_tracker()
+    command = tracker.submit(3, 'start', 'A_RECIBIR', '03,1,1')
+    assert command.state == PENDING
+    assert command.mid == 1
+    assert tracker.pending_count() == 1
+
+    clock.now = 0.25
+    tracker.acknowledge(1)
+    assert command.state == CONFIRMED
+    assert command.future.result(timeout=0) == pytest.approx(0.25)
+    assert changes == [command]
+    assert tracker.pending_count() == 0
+
+
+def test_ack_before_publish_returns_confirms_the_command():
+    tracker, broker, clock, changes = make_tracker(sync_ack=True)
+    command = tracker.submit(3, 'start', 'A_RECIBIR', '03,1,1')
+    assert command.state == CONFIRMED
+    assert command.future.done()
+    assert tracker.pending_count() == 0
+    assert tracker.stats()['confirmed'] == 1
+
+
+def test_timeout_retries_with_backoff_then_fails():
+    tracker, broker, clock, changes = make_tracker(timeout=1.0, max_retries=2, backoff=2.0)
+    command = tracker.submit(3, 'stop', 'A_RECIBIR', '03,0,0')
+
+    clock.now = 0.9
+    assert tracker.check_timeouts() == 1
+    assert command.attempts == 1
+
+    # First retry after 1 s, second one 2 s later, give up 4 s after that
+    clock.now = 1.0
+    tracker.check_timeouts()
+    assert command.attempts == 2
+    assert command.deadline == pytest.approx(3.0)
+    clock.now = 3.0
+    tracker.check_timeouts()
+    assert command.attempts == 3
+    assert command.deadline == pytest.approx(7.0)
+    assert command.state == PENDING
+
+    clock.now = 7.0
+    assert tracker.check_timeouts() == 0
+    assert command.state == FAILED
+    with pytest.raises(CommandTimeout):
+        command.future.result(timeout=0)
+    assert broker.published == ['03,0,0'] * 3
+    stats = tracker.stats()
+    assert (stats['retried'], stats['failed'], stats['confirmed']) == (2, 1, 0)
+
+
+def test_late_ack_of_a_retried_command_confirms_it():
+    tracker, broker, clock, changes = make_tracker(timeout=1.0)
+    command = tracker.submit(3, 'stop', 'A_RECIBIR', '03,0,0')
+    clock.now = 1.0
+    tracker.check_timeouts()
+    assert command.mid == 2
+    tracker.acknowledge(2)
+    assert command.state == CONFIRMED
+
+
+def test_unsent_command_is_published_again_on_timeout():
+    tracker, broker, clock, changes = make_tracker(timeout=1.0)
+    broker.refuse = 1
+    command = tracker.submit(3, 'stop', 'A_RECIBIR', '03,0,0')
+    assert command.mid is None
+    assert tracker.pending_count() == 1
+    clock.now = 1.0
+    tracker.check_timeouts()
+    assert command.mid == 1
+    tracker.acknowledge(1)
+    assert command.state == CONFIRMED
+
+
+def make_commands(count):
+    return [TrackedCommand(i % 12 + 1, 'tunnel_setpoint', 'A_RECIBIR', f"S{i:02d},+01.00", 1, True)
+            for i in range(count)]
+
+
+def test_batch_keeps_at_most_window_commands_in_flight():
+    tracker, broker, clock, changes = make_tracker()
+    finished = []
+    batch = CommandBatch(tracker, make_commands(10), window=3, on_done=finished.append).start()
+    assert len(broker.published) == 3
+
+    tracker.acknowledge(1)
+    assert len(broker.published) == 4
+    for mid in range(2, 11):
+        tracker.acknowledge(mid)
+    assert batch.done
+    assert finished == [batch]
+    assert len(batch.confirmed) == 10
+    assert batch.future.result(timeout=0) is batch
+
+
+def test_batch_finishes_when_a_command_fails():
+    tracker, broker, clock, changes = make_tracker(timeout=1.0, max_retries=0)
+    batch = CommandBatch(tracker, make_commands(2), window=2).start()
+    tracker.acknowledge(1)
+    clock.now = 1.0
+    tracker.check_timeouts()
+    assert batch.done
+    assert len(batch.confirmed) == 1
+    assert len(batch.failed) == 1
+
+
+def test_batch_with_synchronous_acks_does_not_recurse():
+    tracker, broker, clock, changes = make_tracker(sync_ack=True)
+    count = sys.getrecursionlimit() * 2
+    finished = []
+    batch = CommandBatch(tracker, make_commands(count), window=20, on_done=finished.append).start()
+    assert batch.done
+    assert finished == [batch]
+    assert len(batch.confirmed) == count
+    assert len(broker.published) == count
+
+
+def test_empty_batch_is_done_at_once():
+    tracker, broker, clock, changes = make_tracker()
+    finished = []
+    batch = CommandBatch(tracker, [], on_done=finished.append).start()
+    assert batch.done
+    assert finished == [batch]
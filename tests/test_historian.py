@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import historian  # noqa: E402
+from historian import Historian  # noqa: E402
+from telemetry_codec import TELEMETRY_DTYPE  # noqa: E402
+
+
+def frame(tunnel_ids, value):
+    records = np.zeros(len(tunnel_ids), dtype=TELEMETRY_DTYPE)
+    records['tunnel_id'] = tunnel_ids
+    records['temp_internal'] = value
+    return records
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_stop_writes_everything_queued(tmp_path):
+    store = Historian(str(tmp_path / 'historian.db'), batch_size=4, flush_interval=0.05)
+    store.start()
+    for t in range(10):
+        store.append_records(frame([1, 2], t), float(t))
+    store.stop()
+    assert store.stats()['rows_written'] == 20
+    assert [row[0] for row in store.query(1)] == [float(t) for t in range(10)]
+
+
+def test_failed_batch_is_written_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'historian.db')
+
+    def connect(path):
+        connection = sqlite3.connect(path, timeout=0.05)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    monkeypatch.setattr(historian, 'connect', connect)
+    store = Historian(path, batch_size=1000, flush_interval=0.05)
+    store.start()
+
+    # Another writer holds the database: the writer thread's transactions fail
+    lock = sqlite3.connect(path, isolation_level=None)
+    lock.execute("BEGIN EXCLUSIVE")
+    try:
+        for t in range(5):
+            store.append_records(frame([1, 2], t), 60.0 + t)
+        wait_for(lambda: store.stats()['write_errors'] >= 1)
+        stats = store.stats()
+        assert stats['backlog_rows'] > 0
+        assert 'locked' in stats['last_error']
+        assert stats['rows_written'] == 0
+        store.append_records(frame([1, 2], 5), 65.0)
+    finally:
+        lock.execute("ROLLBACK")
+        lock.close()
+
+    # Retried without new telemetry once the database is free again
+    wait_for(lambda: store.stats()['rows_written'] == 12)
+    store.stop()
+    stats = store.stats()
+    assert (stats['backlog_rows'], stats['rows_dropped']) == (0, 0)
+    assert [row[0] for row in store.query(2)] == [60.0 + t for t in range(6)]
+    # The rollups of the retried rows are merged once, not once per attempt
+    (bucket, minimum, maximum, mean, last), = store.query_rollup(1, 'internal_temp')
+    assert (bucket, minimum, maximum, mean, last) == (60.0, 0.0, 5.0, 2.5, 5.0)
+
+
+def test_backlog_keeps_the_newest_frames(tmp_path):
+    store = Historian(str(tmp_path / 'historian.db'), max_backlog_rows=5)
+    frames = [(frame([1, 2], t), float(t)) for t in range(4)]
+    store._keep_for_retry(frames)
+    assert [timestamp for _, timestamp in store.backlog] == [2.0, 3.0]
+    assert store.stats()['backlog_rows'] == 4
+    assert store.stats()['rows_dropped'] == 4
+
+
+def test_input_queue_drops_the_oldest_frames(tmp_path):
+    # Writer not started: every frame stays queued, as with a writer stalled on the disk
+    store = Historian(str(tmp_path / 'historian.db'), max_backlog_rows=10)
+    for t in range(8):
+        store.append_records(frame([1, 2], t), float(t))
+    stats = store.stats()
+    assert (stats['queued'], stats['queued_rows'], stats['rows_dropped']) == (5, 10, 6)
+    assert store.queue.get_nowait()[1] == 3.0
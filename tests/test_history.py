@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import CHANNELS, SAMPLE_BYTES, HistoryStore, RingBuffer  # noqa: E402
+from telemetry_codec import TELEMETRY_DTYPE  # noqa: E402
+
+
+def row(value):
+    return np.full(len(CHANNELS), value, dtype=np.float32)
+
+
+def frame(tunnel_ids, value):
+    """Records whose every numeric field is value (flags: value is odd)"""
+    records = np.zeros(len(tunnel_ids), dtype=TELEMETRY_DTYPE)
+    records['tunnel_id'] = tunnel_ids
+    for field in ('temp_output', 'temp_external', 'temp_internal', 'tunnel_setpoint', 'fruit_setpoint'):
+        records[field] = value
+    records['pid'] = records['fan'] = value % 2
+    return records
+
+
+def timestamps_of(segments):
+    return np.concatenate([timestamps for timestamps, _ in segments]).tolist() if segments else []
+
+
+def test_ring_buffer_wraps_around_oldest_first():
+    buffer = RingBuffer(5)
+    for t in range(7):
+        buffer.append(float(t), row(t))
+    assert buffer.count == 5
+    assert buffer.segments() == [(2, 5), (0, 2)]
+    assert timestamps_of(buffer.range()) == [2.0, 3.0, 4.0, 5.0, 6.0]
+    timestamp, values = buffer.latest()
+    assert timestamp == 6.0
+    assert values[0] == 6.0
+    assert buffer.version == 7
+
+
+def test_ring_buffer_range_bounds_and_channel_across_the_wrap():
+    buffer = RingBuffer(5)
+    for t in range(7):
+        buffer.append(float(t), row(t))
+    segments = buffer.range(3.0, 6.0, 'internal_temp')
+    assert timestamps_of(segments) == [3.0, 4.0, 5.0]
+    assert np.concatenate([values for _, values in segments]).tolist() == [3.0, 4.0, 5.0]
+    assert buffer.range(10.0, 20.0) == []
+
+
+def test_ring_buffer_range_returns_views():
+    buffer = RingBuffer(4)
+    for t in range(3):
+        buffer.append(float(t), row(t))
+    (timestamps, values), = buffer.range()
+    assert np.shares_memory(timestamps, buffer.timestamps)
+    assert np.shares_memory(values, buffer.values)
+
+
+def test_store_keeps_only_configured_tunnels():
+    store = HistoryStore(10, tunnel_ids=[1, 2])
+    store.append_records(frame([1, 2, 99], 5), 100.0)
+    assert sorted(store.buffers) == [1, 2]
+    assert store.ignored_count == 1
+    assert store.range(99) == []
+    assert store.version(1) == 1
+
+
+def test_store_capacity_fits_the_memory_budget():
+    store = HistoryStore(1000, tunnel_ids=range(1, 11), max_bytes=10 * 100 * SAMPLE_BYTES)
+    assert store.capacity == 100
+    store.append_records(frame(list(range(1, 11)), 1), 0.0)
+    assert store.memory_bytes() <= 10 * 100 * SAMPLE_BYTES
+
+
+def test_store_range_returns_copies():
+    store = HistoryStore(4, tunnel_ids=[1])
+    store.append_records(frame([1], 1), 1.0)
+    (timestamps, values), = store.range(1)
+    for t in range(2, 10):
+        store.append_records(frame([1], t), float(t))
+    assert timestamps.tolist() == [1.0]
+    assert values[0, 0] == 1.0
+
+
+def test_store_range_under_a_concurrent_writer():
+    """Every row read must be whole (all channels from one sample) and in time order"""
+    store = HistoryStore(500, tunnel_ids=[1, 2])
+    stop = threading.Event()
+
+    def write():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            store.append_records(frame([1, 2], value), float(value))
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    reads = rows = 0
+    try:
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            segments = store.range(1)
+            reads += 1
+            if not segments:
+                continue
+            timestamps = np.concatenate([t for t, _ in segments])
+            values = np.concatenate([v for _, v in segments])
+            rows += len(timestamps)
+            assert np.all(np.diff(timestamps) == 1.0)
+            assert np.all(values[:, :5] == timestamps[:, None])
+            assert np.all(values[:, 5:] == (timestamps % 2)[:, None])
+    finally:
+        stop.set()
+        writer.join()
+    assert reads > 10
+    assert rows > 0
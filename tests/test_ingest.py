@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_mailbox import LatestWinsMailbox  # noqa: E402
+from ingest import IngestPipeline  # noqa: E402
+from telemetry_codec import SetpointEvent, StatusEvent, TelemetryEvent  # noqa: E402
+
+
+def telemetry(temp, pid=1):
+    return f"T01,{temp:.1f},20.1,8.3,-1.0,2.0,{pid},{pid}".encode()
+
+
+def make_pipeline(max_queue=1000):
+    notified = []
+    pipeline = IngestPipeline(LatestWinsMailbox(), lambda: notified.append(True), max_queue=max_queue)
+    frames = []
+    pipeline.add_sink(lambda records, timestamp: frames.append(float(records['temp_output'][0])))
+    return pipeline, frames
+
+
+def test_worker_decodes_everything_queued_before_stopping():
+    pipeline, frames = make_pipeline()
+    for temp in range(5):
+        pipeline.submit(telemetry(temp))
+    pipeline.start()
+    pipeline.stop()
+    assert frames == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert pipeline.stats()['decoded'] == 5
+    (event,) = pipeline.mailbox.drain()
+    assert isinstance(event, TelemetryEvent)
+    assert float(event.records['temp_output'][0]) == 4.0
+
+
+def test_burst_drops_the_oldest_telemetry_first():
+    # Worker not started yet: the whole burst waits in the raw queue
+    pipeline, frames = make_pipeline(max_queue=3)
+    pipeline.submit(telemetry(0))
+    pipeline.submit(b'S01,+01.50')
+    for temp in range(1, 5):
+        pipeline.submit(telemetry(temp))
+    stats = pipeline.stats()
+    assert (stats['raw_queue'], stats['raw_dropped']) == (3, 3)
+
+    pipeline.start()
+    pipeline.stop()
+    assert frames == [3.0, 4.0]
+    assert any(isinstance(event, SetpointEvent) for event in pipeline.mailbox.drain())
+
+
+def test_queue_of_non_telemetry_drops_the_oldest_payload():
+    pipeline, frames = make_pipeline(max_queue=2)
+    for value in range(4):
+        pipeline.submit(f"S01,+0{value}.00".encode())
+    assert pipeline.stats()['raw_dropped'] == 2
+    pipeline.start()
+    pipeline.stop()
+    (event,) = pipeline.mailbox.drain()
+    assert event.value == 3.0
+
+
+def test_status_edge_survives_dropped_frames():
+    pipeline, frames = make_pipeline(max_queue=2)
+    pipeline.process(telemetry(0, pid=1))
+    pipeline.mailbox.drain()
+    # The tunnel stops; the first frames reporting it are dropped
+    for temp in range(1, 6):
+        pipeline.submit(telemetry(temp, pid=0))
+    pipeline.start()
+    pipeline.stop()
+    edges = [event for event in pipeline.mailbox.drain() if isinstance(event, StatusEvent)]
+    assert [(edge.field, edge.value) for edge in edges] == [('running', 0)]
@@ -0,0 +1,84 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconnect import ReconnectPolicy, CONNECTED, DISCONNECTED, STOPPED, WAITING  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_grows_to_the_maximum_without_jitter():
+    policy = ReconnectPolicy(initial_delay=1.0, max_delay=30.0, factor=2.0, jitter=0.0)
+    delays = [policy.next_delay() for _ in range(8)]
+    assert delays == [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0, 30.0]
+    assert policy.state == WAITING
+
+
+def test_jitter_only_shortens_the_wait():
+    random.seed(1)
+    policy = ReconnectPolicy(initial_delay=1.0, max_delay=30.0, factor=2.0, jitter=0.5)
+    for failures in range(10):
+        nominal = min(30.0, 2.0 ** failures)
+        delay = policy.next_delay()
+        assert nominal * 0.5 <= delay <= nominal
+    spread = {round(ReconnectPolicy(jitter=0.5).next_delay(), 6) for _ in range(20)}
+    assert len(spread) > 1
+
+
+def test_connection_resets_the_backoff():
+    policy = ReconnectPolicy(initial_delay=1.0, jitter=0.0)
+    policy.start()
+    for _ in range(3):
+        policy.attempt()
+        policy.failed()
+        policy.next_delay()
+    policy.attempt()
+    policy.connected()
+    policy.lost()
+    assert policy.next_delay() == 1.0
+
+
+def test_downtime_and_reconnect_metrics():
+    clock = FakeClock()
+    policy = ReconnectPolicy(jitter=0.0, clock=clock)
+    policy.start()
+    policy.attempt()
+    policy.failed()
+    clock.now = 2.0
+    policy.attempt()
+    policy.connected()
+    assert policy.state == CONNECTED
+
+    clock.now = 10.0
+    policy.lost()
+    assert policy.state == DISCONNECTED
+    # A second loss report while down is not another disconnection
+    policy.lost()
+    clock.now = 13.0
+    policy.attempt()
+    policy.connected()
+
+    stats = policy.stats()
+    assert (stats['attempts'], stats['failed_attempts']) == (3, 1)
+    assert (stats['disconnects'], stats['reconnects']) == (1, 1)
+    assert stats['downtime_s'] == pytest.approx(5.0)
+    assert stats['reconnect_p50_s'] == pytest.approx(3.0)
+
+    clock.now = 20.0
+    policy.lost()
+    clock.now = 21.0
+    assert policy.stats()['downtime_s'] == pytest.approx(6.0)
+    policy.stop()
+    clock.now = 30.0
+    assert policy.state == STOPPED
+    assert policy.stats()['downtime_s'] == pytest.approx(6.0)
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rollups import SCHEMA, query_rollup, tier_for_span, update_rollups  # noqa: E402
+from telemetry_codec import TELEMETRY_DTYPE  # noqa: E402
+
+
+def records(tunnel_ids, temps):
+    result = np.zeros(len(tunnel_ids), dtype=TELEMETRY_DTYPE)
+    result['tunnel_id'] = tunnel_ids
+    result['temp_internal'] = temps
+    return result
+
+
+def bucket_row(connection, tier, tunnel_id, bucket):
+    return connection.execute(
+        f"SELECT min, max, sum, count, last, last_ts FROM rollup_{tier} "
+        "WHERE tunnel_id = ? AND channel = 'internal_temp' AND bucket = ?", (tunnel_id, bucket)).fetchone()
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(':memory:')
+    connection.executescript(SCHEMA)
+    yield connection
+    connection.close()
+
+
+def test_two_flushes_merge_into_the_same_bucket(connection):
+    update_rollups(connection, records([1, 1, 2], [4.0, 2.0, 9.0]), np.array([120.0, 130.0, 125.0]))
+    update_rollups(connection, records([1, 1], [6.0, 3.0]), np.array([150.0, 170.0]))
+
+    assert bucket_row(connection, 'minute', 1, 120.0) == (2.0, 6.0, 15.0, 4, 3.0, 170.0)
+    assert bucket_row(connection, 'minute', 2, 120.0) == (9.0, 9.0, 9.0, 1, 9.0, 125.0)
+    assert bucket_row(connection, 'hour', 1, 0.0) == (2.0, 6.0, 15.0, 4, 3.0, 170.0)
+    assert query_rollup(connection, 'minute', 1, 'internal_temp') == [(120.0, 2.0, 6.0, 3.75, 3.0)]
+
+
+def test_late_flush_does_not_replace_the_last_value(connection):
+    update_rollups(connection, records([1], [5.0]), np.array([170.0]))
+    update_rollups(connection, records([1], [1.0]), np.array([130.0]))
+    assert bucket_row(connection, 'minute', 1, 120.0) == (1.0, 5.0, 6.0, 2, 5.0, 170.0)
+
+
+def test_samples_are_split_by_bucket(connection):
+    update_rollups(connection, records([1, 1, 1], [1.0, 2.0, 3.0]), np.array([59.0, 60.0, 3600.0]))
+    assert [row[0] for row in query_rollup(connection, 'minute', 1, 'internal_temp')] == [0.0, 60.0, 3600.0]
+    assert [row[0] for row in query_rollup(connection, 'hour', 1, 'internal_temp')] == [0.0, 3600.0]
+    assert query_rollup(connection, 'minute', 1, 'internal_temp', 60.0, 3600.0) == [(60.0, 2.0, 2.0, 2.0, 2.0)]
+    with pytest.raises(ValueError):
+        query_rollup(connection, 'day', 1, 'internal_temp')
+
+
+def test_tier_for_span():
+    assert tier_for_span(2000, 2000) is None
+    assert tier_for_span(2001, 2000) == 'minute'
+    assert tier_for_span(2000 * 60, 2000) == 'minute'
+    assert tier_for_span(2000 * 60 + 1, 2000) == 'hour'
+    assert tier_for_span(10 ** 9, 2000) == 'hour'
+
+
+def test_tier_for_span_follows_the_sample_period():
+    # One sample every 5 s: a span of 10000 s is still 2000 raw rows
+    assert tier_for_span(10000, 2000, sample_period=5.0) is None
+    assert tier_for_span(10000, 2000, sample_period=0.5) == 'minute'
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_snapshot import SNAPSHOT_DTYPE, StateSnapshot  # noqa: E402
+from tunnel_state import TunnelStateModel  # noqa: E402
+
+VALUES = dict(output_temp=1.5, external_temp=20.5, internal_temp=3.0, tunnel_setpoint=-0.5,
+              fruit_setpoint=1.25, running=True, defrosting=False)
+
+
+def restored(path, num_tunnels=3):
+    model = TunnelStateModel(num_tunnels)
+    count = StateSnapshot(path).restore(model)
+    return model, count
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'snapshot.npy')
+    model = TunnelStateModel(3)
+    model.update(1, **VALUES)
+    model.update(2, internal_temp=7.0)
+    snapshot = StateSnapshot(path)
+    assert snapshot.save(model)
+    assert not snapshot.save(model)
+
+    model, count = restored(path)
+    assert count == 2
+    state = model[1]
+    assert state.stale
+    assert {field: state.get(field) for field in VALUES} == VALUES
+    assert model[2].get('internal_temp') == 7.0
+    assert model[2].get('running') is None
+    # Tunnel 3 was never heard from
+    assert model[3].last_seen is None
+    assert not model[3].stale
+
+
+def test_unknown_fields_keep_the_saved_value(tmp_path):
+    path = str(tmp_path / 'snapshot.npy')
+    model = TunnelStateModel(3)
+    model.update(1, **VALUES)
+    snapshot = StateSnapshot(path)
+    snapshot.save(model)
+
+    # Local change: the setpoint is unknown until the PLC echoes it
+    model.invalidate(1, 'tunnel_setpoint', 'running')
+    model.update(1, internal_temp=4.0)
+    snapshot.save(model)
+    model, _ = restored(path)
+    assert model[1].get('tunnel_setpoint') == -0.5
+    assert model[1].get('running') is True
+    assert model[1].get('internal_temp') == 4.0
+
+
+def test_unknown_fields_keep_the_value_restored_at_startup(tmp_path):
+    path = str(tmp_path / 'snapshot.npy')
+    model = TunnelStateModel(3)
+    model.update(1, **VALUES)
+    StateSnapshot(path).save(model)
+
+    # Next run: restore, then a local change before the PLC reports
+    model = TunnelStateModel(3)
+    snapshot = StateSnapshot(path)
+    snapshot.restore(model)
+    model.invalidate(1, 'fruit_setpoint')
+    model.update(1, internal_temp=5.0)
+    snapshot.save(model)
+    model, _ = restored(path)
+    assert model[1].get('fruit_setpoint') == 1.25
+    assert model[1].get('internal_temp') == 5.0
+
+
+def test_missing_file_restores_nothing(tmp_path):
+    model, count = restored(str(tmp_path / 'missing.npy'))
+    assert count == 0
+    assert model[1].last_seen is None
+
+
+@pytest.mark.parametrize('keep', [0, 10, 100, -5])
+def test_truncated_file_restores_nothing(tmp_path, keep):
+    path = str(tmp_path / 'snapshot.npy')
+    model = TunnelStateModel(3)
+    model.update(1, **VALUES)
+    StateSnapshot(path).save(model)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:keep])
+    model, count = restored(path)
+    assert count == 0
+    assert not model[1].stale
+
+
+def test_file_of_another_layout_restores_nothing(tmp_path):
+    path = str(tmp_path / 'snapshot.npy')
+    np.save(path, np.zeros(3, dtype=[('tunnel_id', np.int16), ('last_seen', np.float64)]))
+    assert restored(path)[1] == 0
+    np.save(path, np.zeros((3, 2), dtype=SNAPSHOT_DTYPE))
+    assert restored(path)[1] == 0
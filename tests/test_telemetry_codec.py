@@ -0,0 +1,96 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry_codec import FIELDS_PER_GROUP, decode_frame, decode_setpoint, _decode_validated  # noqa: E402
+
+GOOD_GROUP = 'T01,12.5,20.1,8.3,-1.0,2.0,1,0'
+
+# Each entry replaces the second group of a 3-group frame
+MALFORMED_GROUPS = {
+    'one_digit_id': 'T1,12.5,20.1,8.3,-1.0,2.0,1,0',
+    'fractional_id': 'T1.5,12.5,20.1,8.3,-1.0,2.0,1,0',
+    'signed_id': 'T-02,12.5,20.1,8.3,-1.0,2.0,1,0',
+    'nan_field': 'T02,nan,20.1,8.3,-1.0,2.0,1,0',
+    'inf_field': 'T02,12.5,inf,8.3,-1.0,2.0,1,0',
+    'underscore_field': 'T02,1_2.5,20.1,8.3,-1.0,2.0,1,0',
+    'float_flag': 'T02,12.5,20.1,8.3,-1.0,2.0,1.0,0',
+    'text_flag': 'T02,12.5,20.1,8.3,-1.0,2.0,true,yes',
+    'padded_fields': ' T02 , 12.5,20.1,8.3,-1.0,2.0, 1 ,0',
+    'misplaced_t': '02,T12.5,20.1,8.3,-1.0,2.0,1,0',
+}
+
+
+def _slow(payload):
+    num_fields = payload.count(',') + 1
+    num_groups = num_fields // FIELDS_PER_GROUP
+    end = num_groups * FIELDS_PER_GROUP
+    return _decode_validated(payload, num_groups, end, num_fields - end)
+
+
+def _assert_same(fast, slow):
+    assert fast.records.dtype == slow.records.dtype
+    assert fast.records.tolist() == slow.records.tolist()
+    assert fast.malformed.tolist() == slow.malformed.tolist()
+    assert fast.trailing == slow.trailing
+
+
+def test_well_formed_frame_takes_fast_path():
+    payload = ','.join([GOOD_GROUP, 'T02,1,2,3,4,5,0,1', 'T103,-4.5,.5,6.,1e1,0,1,1'])
+    frame = decode_frame(payload)
+    _assert_same(frame, _slow(payload))
+    assert frame.records['tunnel_id'].tolist() == [1, 2, 103]
+    assert frame.records['pid'].tolist() == [True, False, True]
+    assert frame.records['fan'].tolist() == [False, True, True]
+    assert frame.malformed.size == 0
+
+
+@pytest.mark.parametrize('group', MALFORMED_GROUPS.values(), ids=MALFORMED_GROUPS.keys())
+def test_malformed_group_decodes_like_slow_path(group):
+    payload = ','.join([GOOD_GROUP, group, 'T03,1,2,3,4,5,0,1'])
+    frame = decode_frame(payload)
+    _assert_same(frame, _slow(payload))
+    assert np.isfinite(frame.records[['temp_output', 'temp_external']].tolist()).all()
+
+
+def test_float_flag_is_not_on():
+    frame = decode_frame(','.join([GOOD_GROUP, MALFORMED_GROUPS['float_flag']]))
+    assert frame.records['pid'].tolist() == [True, False]
+
+
+def test_nan_and_short_ids_are_reported_malformed():
+    payload = ','.join([GOOD_GROUP, MALFORMED_GROUPS['nan_field'], MALFORMED_GROUPS['one_digit_id']])
+    frame = decode_frame(payload)
+    assert frame.records['tunnel_id'].tolist() == [1]
+    assert frame.malformed.tolist() == [1, 2]
+
+
+def test_trailing_fields_are_counted():
+    payload = GOOD_GROUP + ',T02,1,2'
+    _assert_same(decode_frame(payload), _slow(payload))
+    assert decode_frame(payload).trailing == 3
+
+
+@pytest.mark.parametrize('payload, expected', [
+    ('S05,+12.50', ('tunnel', 5, 12.5)),
+    ('F12,-1.25', ('fruit', 12, -1.25)),
+    ('S100,+02.00', ('tunnel', 100, 2.0)),
+    ('F1234,-0.50', ('fruit', 1234, -0.5)),
+    ('S05;+12.50', None),
+    ('S0x,+12.50', None),
+    ('F100,+nan', None),
+])
+def test_decode_setpoint(payload, expected):
+    assert decode_setpoint(payload) == expected
+
+
+def test_misplaced_t_in_single_group_frame():
+    payload = '01,T12.5,20.1,8.3,-1.0,2.0,1,0'
+    frame = decode_frame(payload)
+    _assert_same(frame, _slow(payload))
+    assert len(frame.records) == 0
+    assert frame.malformed.tolist() == [0]
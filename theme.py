@@ -0,0 +1,210 @@
+from PyQt5.QtGui import QPalette, QColor
+
+# Application-wide stylesheet, parsed once by QApplication.
+#
+# Tunnel widget rules are scoped with a "TunnelWidget" ancestor selector so
+# they do not leak into the other windows; children are targeted by object
+# name, and state variants (running/defrost status) by dynamic properties,
+# so no widget carries its own stylesheet.
+APP_STYLESHEET = '''
+TunnelWidget {
+    background-color: #ffffff;
+    border-radius: 20px;
+    padding: 20px;
+}
+TunnelWidget QPushButton {
+    background-color: #4caf50;
+    border: none;
+    border-radius: 12px;
+    padding: 12px 25px;
+    color: white;
+    font-weight: 600;
+    min-width: 180px;
+    margin: 10px;
+    font-size: 14px;
+    text-transform: uppercase;
+    letter-spacing: 0.4px;
+}
+TunnelWidget QPushButton:hover {
+    background-color: #43a047;
+}
+TunnelWidget QPushButton:disabled {
+    background-color: #a5d6a7;
+    color: rgba(255, 255, 255, 0.7);
+}
+TunnelWidget QPushButton:checked {
+    background-color: #388e3c;
+}
+TunnelWidget QPushButton#defrostButton {
+    background-color: #81c784;
+}
+TunnelWidget QPushButton#defrostButton:checked {
+    background-color: #7cb342;
+}
+TunnelWidget QPushButton#setpointButton {
+    background-color: #e8f5e9;
+    border: none;
+    border-radius: 10px;
+    padding: 12px 24px;
+    color: #212121;
+    font-weight: 600;
+    min-width: 180px;
+    font-size: 16px;
+}
+TunnelWidget QPushButton#setpointButton:hover {
+    background-color: #c8e6c9;
+}
+TunnelWidget QPushButton#setpointButton:pressed {
+    background-color: #4caf50;
+    color: white;
+}
+TunnelWidget QLabel {
+    padding: 10px;
+    font-size: 18px;
+    color: #212121;
+    font-weight: 600;
+    margin: 8px;
+}
+TunnelWidget QLabel[temperature="true"] {
+    font-size: 32px;
+    font-weight: bold;
+    color: #388e3c;
+    padding: 0px 8px;
+    margin: 12px 0;
+    min-width: 110px;
+    min-height: 40px;
+}
+TunnelWidget QDoubleSpinBox {
+    border: none;
+    border-radius: 10px;
+    padding: 12px;
+    font-size: 16px;
+    background-color: #ffffff;
+    color: #212121;
+    min-width: 180px;
+}
+TunnelWidget, TunnelWidget QFrame {
+    border: none;
+    border-radius: 15px;
+    background-color: #ffffff;
+    padding: 20px;
+    margin: 15px;
+}
+TunnelWidget QLabel#tunnelTitle {
+    font-size: 60px;
+    font-weight: bold;
+}
+TunnelWidget QLabel#tunnelSetpoint, TunnelWidget QLabel#fruitSetpoint {
+    font-size: 16px;
+    font-weight: bold;
+    border-radius: 8px;
+    padding: 8px 12px;
+    margin: 5px;
+}
+TunnelWidget QLabel#tunnelSetpoint {
+    color: #1B5E20;
+    background-color: #E8F5E9;
+}
+TunnelWidget QLabel#fruitSetpoint {
+    color: #6A1B9A;
+    background-color: #F3E5F5;
+}
+TunnelWidget QLabel#outputName, TunnelWidget QLabel#externalName, TunnelWidget QLabel#internalName {
+    font-weight: bold;
+    font-size: 18px;
+    padding: 0px 6px;
+    min-height: 40px;
+}
+TunnelWidget QLabel#outputName, TunnelWidget QLabel#outputTemp {
+    color: #388e3c;
+}
+TunnelWidget QLabel#externalName, TunnelWidget QLabel#externalTemp {
+    color: #7cb342;
+}
+TunnelWidget QLabel#internalName, TunnelWidget QLabel#internalTemp {
+    color: #43a047;
+}
+TunnelWidget QLabel#runningStatus, TunnelWidget QLabel#defrostStatus {
+    color: #d32f2f;
+    font-weight: bold;
+    padding: 12px;
+    border-radius: 8px;
+    background-color: #ffebee;
+    font-size: 16px;
+    margin: 5px;
+}
+TunnelWidget QLabel#runningStatus[active="true"] {
+    color: #2e7d32;
+    background-color: #e8f5e9;
+}
+TunnelWidget QLabel#defrostStatus[active="true"] {
+    color: #1565c0;
+    background-color: #e3f2fd;
+}
+TunnelWidget QLabel#outputTemp[stale="true"], TunnelWidget QLabel#externalTemp[stale="true"],
+TunnelWidget QLabel#internalTemp[stale="true"] {
+    color: #9e9e9e;
+}
+TunnelWidget QLabel#tunnelSetpoint[stale="true"], TunnelWidget QLabel#fruitSetpoint[stale="true"] {
+    color: #757575;
+    background-color: #f5f5f5;
+}
+TunnelWidget QLabel#staleStatus {
+    font-size: 14px;
+    padding: 4px;
+    margin: 0px;
+    border-radius: 6px;
+    color: #616161;
+    background-color: #eeeeee;
+}
+TunnelWidget QLabel#commandStatus {
+    font-size: 14px;
+    padding: 4px;
+    margin: 0px;
+    border-radius: 6px;
+    min-height: 20px;
+}
+TunnelWidget QLabel#commandStatus[command="queued"], TunnelWidget QLabel#commandStatus[command="held"],
+TunnelWidget QLabel#commandStatus[command="cancelled"] {
+    color: #455a64;
+    background-color: #eceff1;
+}
+TunnelWidget QLabel#commandStatus[command="pending"] {
+    color: #e65100;
+    background-color: #fff3e0;
+}
+TunnelWidget QLabel#commandStatus[command="confirmed"] {
+    color: #2e7d32;
+    background-color: #e8f5e9;
+}
+TunnelWidget QLabel#commandStatus[command="failed"] {
+    color: #d32f2f;
+    background-color: #ffebee;
+}
+'''
+
+
+def light_palette():
+    """Light palette with lime accents"""
+    palette = QPalette()
+    palette.setColor(QPalette.Window, QColor(245, 245, 245))
+    palette.setColor(QPalette.WindowText, QColor(51, 51, 51))
+    palette.setColor(QPalette.Base, QColor(255, 255, 255))
+    palette.setColor(QPalette.AlternateBase, QColor(240, 240, 240))
+    palette.setColor(QPalette.ToolTipBase, QColor(255, 255, 255))
+    palette.setColor(QPalette.ToolTipText, QColor(51, 51, 51))
+    palette.setColor(QPalette.Text, QColor(51, 51, 51))
+    palette.setColor(QPalette.Button, QColor(154, 205, 50))
+    palette.setColor(QPalette.ButtonText, QColor(255, 255, 255))
+    palette.setColor(QPalette.BrightText, QColor(255, 0, 0))
+    palette.setColor(QPalette.Link, QColor(154, 205, 50))
+    palette.setColor(QPalette.Highlight, QColor(154, 205, 50))
+    palette.setColor(QPalette.HighlightedText, QColor(255, 255, 255))
+    return palette
+
+
+def apply_theme(app):
+    """Set the Fusion style, the light palette and the application stylesheet"""
+    app.setStyle('Fusion')
+    app.setPalette(light_palette())
+    app.setStyleSheet(APP_STYLESHEET)
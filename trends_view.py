@@ -0,0 +1,198 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+
+from history import CHANNELS
+
+# Curve styles, matching the colors of the tunnel widgets
+CHANNEL_STYLES = {
+    'output_temp': ("T. Salida", '#388e3c', Qt.SolidLine),
+    'external_temp': ("T. Externa", '#7cb342', Qt.SolidLine),
+    'internal_temp': ("T. Interna", '#43a047', Qt.SolidLine),
+    'tunnel_setpoint': ("SP Túnel", '#1B5E20', Qt.DashLine),
+    'fruit_setpoint': ("SP Fruta", '#6A1B9A', Qt.DashLine),
+}
+
+# Visible time windows (label, seconds)
+WINDOWS = (("10 min", 600), ("1 hora", 3600), ("8 horas", 8 * 3600), ("24 horas", 24 * 3600))
+
+OVERLAY_COLORS = ('#e6194b', '#3cb44b', '#4363d8', '#f58231', '#911eb4', '#46f0f0',
+                  '#f032e6', '#bcf60c', '#008080', '#9a6324', '#800000', '#000075')
+
+# Downsampled points last drawn for one curve, and the history version / window they cover
+BinnedCurve = namedtuple('BinnedCurve', ['version', 't1', 'bin_seconds', 't0', 'x', 'y'])
+
+
+def minmax_downsample(segments, t0, t1, num_bins):
+    """Reduce samples to at most two points (min and max) per time bin.
+
+    The cost is one vectorized pass over the samples inside [t0, t1), and the
+    output never exceeds 2 * num_bins points whatever the amount of history, so
+    drawing cost stays flat while peaks are preserved.
+
+    Args:
+        segments (list): (timestamps, values) pairs as returned by HistoryStore.range
+        t0, t1 (float): Visible time range
+        num_bins (int): Number of bins, normally the plot width in pixels
+
+    Returns:
+        tuple: (x, y) arrays ready for PlotDataItem.setData
+    """
+    edges = np.linspace(t0, t1, num_bins + 1)
+    xs, ys = [], []
+    for timestamps, values in segments:
+        # Index of the first sample of every bin; keep only non-empty bins
+        starts = np.searchsorted(timestamps, edges)
+        bins = np.flatnonzero(starts[1:] > starts[:-1])
+        if not len(bins):
+            continue
+        first = starts[bins]
+        mins = np.fmin.reduceat(values, first)
+        maxs = np.fmax.reduceat(values, first)
+        # reduceat runs each bin up to the next start, so the last kept bin must end at its edge
+        last_stop = starts[bins[-1] + 1]
+        mins[-1] = np.nanmin(values[first[-1]:last_stop])
+        maxs[-1] = np.nanmax(values[first[-1]:last_stop])
+        centers = (edges[bins] + edges[bins + 1]) / 2
+        xs.append(np.repeat(centers, 2))
+        ys.append(np.column_stack((mins, maxs)).ravel())
+    if not xs:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+class TrendsView(QWidget):
+    """Live trend charts of the three temperatures against both setpoints.
+
+    Shows one tunnel, or an overlay of one channel for every tunnel. Data is
+    read from the HistoryStore and downsampled into bins aligned to whole
+    multiples of the bin width, so a bin never changes once time has moved
+    past it: each refresh only bins the samples of the last (still filling)
+    bin and the new ones, drops the bins that slid out of the window and
+    reuses the rest. Curves of tunnels without new samples are skipped, and
+    nothing is computed while the view is hidden (e.g. another tab is selected).
+    """
+
+    def __init__(self, history, num_tunnels=12, refresh_ms=1000, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.num_tunnels = num_tunnels
+        self.curves = {}  # (tunnel_id, channel) -> PlotDataItem
+        self.binned = {}  # (tunnel_id, channel) -> BinnedCurve last drawn
+        self.setup_ui()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_ms)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        controls = QHBoxLayout()
+        tunnel_label = QLabel("Túnel:")
+        tunnel_label.setFont(QFont('Arial', 12, QFont.Bold))
+        controls.addWidget(tunnel_label)
+        self.tunnel_selector = QComboBox()
+        for tunnel_id in range(1, self.num_tunnels + 1):
+            self.tunnel_selector.addItem(f"Túnel {tunnel_id}", tunnel_id)
+        self.tunnel_selector.addItem("Todos (superpuestos)", 0)
+        controls.addWidget(self.tunnel_selector)
+
+        self.channel_selector = QComboBox()
+        for channel, (label, _, _) in CHANNEL_STYLES.items():
+            self.channel_selector.addItem(label, channel)
+        self.channel_selector.setCurrentIndex(CHANNELS.index('internal_temp'))
+        self.channel_selector.setEnabled(False)
+        controls.addWidget(self.channel_selector)
+
+        self.window_selector = QComboBox()
+        for label, seconds in WINDOWS:
+            self.window_selector.addItem(label, seconds)
+        controls.addWidget(self.window_selector)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.plot = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
+        self.plot.setBackground('w')
+        self.plot.showGrid(x=True, y=True, alpha=0.3)
+        self.plot.setLabel('left', "Temperatura", units="°C")
+        self.plot.addLegend()
+        self.plot.setMouseEnabled(x=False, y=True)
+        layout.addWidget(self.plot)
+
+        self.tunnel_selector.currentIndexChanged.connect(self.rebuild_curves)
+        self.channel_selector.currentIndexChanged.connect(self.rebuild_curves)
+        self.window_selector.currentIndexChanged.connect(self.rebuild_curves)
+        self.rebuild_curves()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_timer.start()
+        self.refresh()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def plotted_series(self):
+        """(tunnel_id, channel) pairs for the current selection"""
+        tunnel_id = self.tunnel_selector.currentData()
+        if tunnel_id:
+            return [(tunnel_id, channel) for channel in CHANNEL_STYLES]
+        channel = self.channel_selector.currentData()
+        return [(tunnel_id, channel) for tunnel_id in range(1, self.num_tunnels + 1)]
+
+    def rebuild_curves(self):
+        """Recreate the curves after the tunnel/channel/window selection changes"""
+        self.plot.clear()
+        self.curves.clear()
+        self.binned.clear()
+        overlay = not self.tunnel_selector.currentData()
+        self.channel_selector.setEnabled(overlay)
+        for tunnel_id, channel in self.plotted_series():
+            label, color, style = CHANNEL_STYLES[channel]
+            if overlay:
+                label = f"Túnel {tunnel_id}"
+                color = OVERLAY_COLORS[(tunnel_id - 1) % len(OVERLAY_COLORS)]
+            curve = self.plot.plot(name=label, pen=pg.mkPen(color, width=2, style=style))
+            self.curves[(tunnel_id, channel)] = curve
+        self.refresh()
+
+    def refresh(self):
+        """Update curves that have new samples and slide the visible window"""
+        if not self.isVisible():
+            return
+        window = self.window_selector.currentData()
+        t1 = time.time()
+        t0 = t1 - window
+        # Bins follow the pixel width, and a bin spans a whole number of
+        # seconds so that each redraw reuses the same bin edges as the previous one
+        num_bins = max(50, int(self.plot.getViewBox().width()) or 50)
+        bin_seconds = max(1, int(np.ceil(window / num_bins)))
+        t1 = np.ceil(t1 / bin_seconds) * bin_seconds
+        t0 = t1 - bin_seconds * num_bins
+        for key, curve in self.curves.items():
+            tunnel_id, channel = key
+            version = self.history.version(tunnel_id)
+            cached = self.binned.get(key)
+            if cached is not None and cached.version == version and cached.t1 == t1:
+                continue
+            if cached is None or cached.bin_seconds != bin_seconds or cached.t0 > t0:
+                start, x, y = t0, np.empty(0), np.empty(0)
+            else:
+                # Bins before the one that was still filling at the last refresh are final
+                start = max(cached.t1 - bin_seconds, t0)
+                keep = (cached.x >= t0) & (cached.x < start)
+                x, y = cached.x[keep], cached.y[keep]
+            segments = self.history.range(tunnel_id, start, t1, channel)
+            new_x, new_y = minmax_downsample(segments, start, t1, int(round((t1 - start) / bin_seconds)))
+            x, y = np.concatenate((x, new_x)), np.concatenate((y, new_y))
+            self.binned[key] = BinnedCurve(version, t1, bin_seconds, t0, x, y)
+            curve.setData(x, y, connect='finite')
+        self.plot.setXRange(t0, t1, padding=0)
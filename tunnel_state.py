@@ -0,0 +1,132 @@
+import time
+
+# Displayed fields and the number of decimals each one is shown with.
+# Values are compared after rounding, so a change that would not alter the
+# label text does not mark the tunnel dirty.
+DISPLAY_DECIMALS = {
+    'output_temp': 1,
+    'external_temp': 1,
+    'internal_temp': 1,
+    'tunnel_setpoint': 1,
+    'fruit_setpoint': 2,
+    'running': None,
+    'defrosting': None,
+}
+
+# Sentinel for "nothing displayed yet"/"widget modified locally": never equal to a value
+_UNKNOWN = object()
+
+
+class TunnelState:
+    """Last displayed values of a single tunnel"""
+
+    __slots__ = ('tunnel_id', 'output_temp', 'external_temp', 'internal_temp',
+                 'tunnel_setpoint', 'fruit_setpoint', 'running', 'defrosting',
+                 'last_seen', 'stale')
+
+    def __init__(self, tunnel_id):
+        self.tunnel_id = tunnel_id
+        for field in DISPLAY_DECIMALS:
+            setattr(self, field, _UNKNOWN)
+        self.last_seen = None
+        # Values restored from the state snapshot, not confirmed by the PLC since the start
+        self.stale = False
+
+    def get(self, field, default=None):
+        """Return a field value, or default if it has not been received yet"""
+        value = getattr(self, field)
+        return default if value is _UNKNOWN else value
+
+
+class TunnelStateModel:
+    """Per-tunnel state between the MQTT input and the widgets.
+
+    Incoming values are diffed against what is currently displayed; only the
+    fields whose displayed value changes are recorded as dirty, and only those
+    are handed to the widgets by ``take_dirty()``.
+    """
+
+    def __init__(self, num_tunnels=12):
+        self.states = {tunnel_id: TunnelState(tunnel_id) for tunnel_id in range(1, num_tunnels + 1)}
+        self.dirty = {}
+        self.received_count = 0
+        self.changed_count = 0
+        self.skipped_count = 0
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, tunnel_id):
+        return tunnel_id in self.states
+
+    def __getitem__(self, tunnel_id):
+        return self.states[tunnel_id]
+
+    def update(self, tunnel_id, **fields):
+        """Store new values for a tunnel.
+
+        Live values clear the stale mark of a restored tunnel ('stale' is then
+        reported as a changed field, even if every value was already shown).
+
+        Returns:
+            bool: True if at least one displayed value changed
+        """
+        state = self.states[tunnel_id]
+        state.last_seen = time.time()
+        changed = None
+        if state.stale:
+            state.stale = False
+            changed = self.dirty.setdefault(tunnel_id, set())
+            changed.add('stale')
+        for field, value in fields.items():
+            decimals = DISPLAY_DECIMALS[field]
+            value = bool(value) if decimals is None else round(value, decimals)
+            self.received_count += 1
+            if getattr(state, field) == value:
+                self.skipped_count += 1
+                continue
+            setattr(state, field, value)
+            self.changed_count += 1
+            if changed is None:
+                changed = self.dirty.setdefault(tunnel_id, set())
+            changed.add(field)
+        return changed is not None
+
+    def restore(self, tunnel_id, last_seen, **fields):
+        """Show values saved by an earlier run, marked stale until the PLC sends live ones.
+
+        Meant for startup, before the widgets are built (they read the model
+        when created): nothing is marked dirty.
+
+        Args:
+            tunnel_id (int): Tunnel the values belong to
+            last_seen (float): Time (epoch seconds) the values were received
+            **fields: TunnelState field values; fields that were unknown are left out
+        """
+        state = self.states[tunnel_id]
+        for field, value in fields.items():
+            decimals = DISPLAY_DECIMALS[field]
+            setattr(state, field, bool(value) if decimals is None else round(value, decimals))
+        state.last_seen = last_seen
+        state.stale = True
+
+    def invalidate(self, tunnel_id, *fields):
+        """Forget the displayed value of some fields (e.g. after a local UI change)
+        so that the next value from the PLC is applied even if it is unchanged"""
+        state = self.states[tunnel_id]
+        for field in fields:
+            setattr(state, field, _UNKNOWN)
+
+    def take_dirty(self):
+        """Return and clear the {tunnel_id: changed fields} map"""
+        dirty, self.dirty = self.dirty, {}
+        return dirty
+
+    def stats(self):
+        """Counters of received values vs. widget updates applied/skipped"""
+        return {
+            'received': self.received_count,
+            'changed': self.changed_count,
+            'skipped': self.skipped_count,
+            'dirty_tunnels': len(self.dirty),
+        }
@@ -0,0 +1,131 @@
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QIcon, QIconEngine
+import qtawesome as qta
+
+
+class _PixmapCacheEngine(QIconEngine):
+    """Icon engine that rasterizes a qtawesome icon once per size/mode/state.
+
+    qtawesome icons draw the font glyph again on every paint; this engine
+    keeps the resulting pixmaps, so repaints only blit.
+    """
+
+    def __init__(self, icon):
+        super().__init__()
+        self.icon = icon
+        self.pixmaps = {}
+
+    def pixmap(self, size, mode, state):
+        key = (size.width(), size.height(), mode, state)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self.pixmaps[key] = self.icon.pixmap(size, mode, state)
+        return pixmap
+
+    def paint(self, painter, rect, mode, state):
+        ratio = painter.device().devicePixelRatioF()
+        size = QSize(round(rect.width() * ratio), round(rect.height() * ratio))
+        pixmap = self.pixmap(size, mode, state)
+        pixmap.setDevicePixelRatio(ratio)
+        painter.drawPixmap(rect, pixmap)
+
+    def clone(self):
+        engine = _PixmapCacheEngine(self.icon)
+        engine.pixmaps = self.pixmaps
+        return engine
+
+
+class IconCache:
+    """Process-wide cache of qtawesome icons, keyed by name and options"""
+
+    def __init__(self):
+        self.icons = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, **options):
+        key = (name, tuple(sorted(options.items())))
+        icon = self.icons.get(key)
+        if icon is None:
+            self.misses += 1
+            icon = self.icons[key] = QIcon(_PixmapCacheEngine(qta.icon(name, **options)))
+        else:
+            self.hits += 1
+        return icon
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.icons),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class StyleCache:
+    """Precomputed stylesheet variants.
+
+    ``get`` formats each (template, parameters) combination once; ``apply``
+    skips setStyleSheet when the widget already has that exact sheet, since
+    Qt re-parses and re-polishes on every call even if nothing changed.
+    """
+
+    def __init__(self):
+        self.sheets = {}
+        self.hits = 0
+        self.misses = 0
+        self.applied = 0
+        self.skipped = 0
+
+    def get(self, template, **params):
+        """Return template.format(**params), formatted only the first time"""
+        key = (template, tuple(sorted(params.items())))
+        sheet = self.sheets.get(key)
+        if sheet is None:
+            self.misses += 1
+            sheet = self.sheets[key] = template.format(**params)
+        else:
+            self.hits += 1
+        return sheet
+
+    def apply(self, widget, sheet):
+        """Set a stylesheet on a widget unless it is already the current one"""
+        if widget.styleSheet() == sheet:
+            self.skipped += 1
+            return
+        self.applied += 1
+        widget.setStyleSheet(sheet)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.sheets),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'applied': self.applied,
+            'skipped': self.skipped,
+        }
+
+
+icons = IconCache()
+styles = StyleCache()
+
+
+def icon(name, **options):
+    """Shared replacement for qta.icon(name, **options)"""
+    return icons.get(name, **options)
+
+
+def cache_stats():
+    """Hit counters of the shared icon and style caches"""
+    return {'icons': icons.stats(), 'styles': styles.stats()}
+
+
+def format_cache_stats():
+    stats = cache_stats()
+    return (f"UI cache: icons {stats['icons']['hit_rate']:.0%} hits "
+            f"({stats['icons']['hits']}/{stats['icons']['hits'] + stats['icons']['misses']}, "
+            f"{stats['icons']['entries']} icons), styles {stats['styles']['hit_rate']:.0%} hits, "
+            f"{stats['styles']['skipped']} redundant setStyleSheet calls skipped")